@@ -4,7 +4,7 @@ from sqlalchemy import engine_from_config
 from sqlalchemy import pool
 
 from alembic import context
-from app.database import Base
+from app.database import Base, SQLALCHEMY_DATABASE_URL
 from app.UserRepository import UserDB
 from app.ShanyraqRepository import AdsDB
 from app.CommentRepository import CommentDB
@@ -19,6 +19,9 @@ config = context.config
 if config.config_file_name is not None:
     fileConfig(config.config_file_name)
 
+# DATABASE_URL from the environment wins over alembic.ini
+config.set_main_option("sqlalchemy.url", SQLALCHEMY_DATABASE_URL)
+
 # add your model's MetaData object here
 # for 'autogenerate' support
 # from myapp import mymodel
@@ -20,17 +20,21 @@ depends_on: Union[str, Sequence[str], None] = None
 
 def upgrade() -> None:
     # ### commands auto generated by Alembic - please adjust! ###
-    op.alter_column('comments', 'created_at',
-               existing_type=sa.DATETIME(),
-               nullable=True,
-               existing_server_default=sa.text('(CURRENT_TIMESTAMP)'))
+    # SQLite can't ALTER COLUMN ... DROP/SET NOT NULL; batch mode recreates the table
+    with op.batch_alter_table('comments') as batch_op:
+        batch_op.alter_column('created_at',
+                              existing_type=sa.DATETIME(),
+                              nullable=True,
+                              existing_server_default=sa.text('(CURRENT_TIMESTAMP)'))
     # ### end Alembic commands ###
 
 
 def downgrade() -> None:
     # ### commands auto generated by Alembic - please adjust! ###
-    op.alter_column('comments', 'created_at',
-               existing_type=sa.DATETIME(),
-               nullable=False,
-               existing_server_default=sa.text('(CURRENT_TIMESTAMP)'))
+    # SQLite can't ALTER COLUMN ... DROP/SET NOT NULL; batch mode recreates the table
+    with op.batch_alter_table('comments') as batch_op:
+        batch_op.alter_column('created_at',
+                              existing_type=sa.DATETIME(),
+                              nullable=False,
+                              existing_server_default=sa.text('(CURRENT_TIMESTAMP)'))
     # ### end Alembic commands ###
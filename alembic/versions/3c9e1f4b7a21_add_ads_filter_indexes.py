@@ -0,0 +1,30 @@
+"""add ads filter indexes
+
+Revision ID: 3c9e1f4b7a21
+Revises: 2680246e7a22
+Create Date: 2026-10-18 10:12:31.402117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c9e1f4b7a21'
+down_revision: Union[str, None] = '2680246e7a22'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_ads_type_rooms_count_price_id', 'ads', ['type', 'rooms_count', 'price', 'id'], unique=False)
+    op.create_index('ix_ads_rooms_count_price_id', 'ads', ['rooms_count', 'price', 'id'], unique=False)
+    op.create_index('ix_ads_price_id', 'ads', ['price', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_ads_price_id', table_name='ads')
+    op.drop_index('ix_ads_rooms_count_price_id', table_name='ads')
+    op.drop_index('ix_ads_type_rooms_count_price_id', table_name='ads')
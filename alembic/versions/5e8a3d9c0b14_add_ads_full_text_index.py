@@ -0,0 +1,55 @@
+"""add ads full-text index
+
+Revision ID: 5e8a3d9c0b14
+Revises: b71d02e5c4f8
+Create Date: 2026-10-18 13:26:07.551904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e8a3d9c0b14'
+down_revision: Union[str, None] = 'b71d02e5c4f8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute(
+            "CREATE INDEX ix_ads_fts ON ads USING gin ("
+            "to_tsvector('simple', coalesce(address, '') || ' ' || coalesce(description, '')))"
+        )
+        return
+    op.execute(
+        "CREATE VIRTUAL TABLE ads_fts USING fts5("
+        "address, description, content='ads', content_rowid='id', tokenize='unicode61 remove_diacritics 2')"
+    )
+    op.execute(
+        "CREATE TRIGGER ads_fts_ai AFTER INSERT ON ads BEGIN "
+        "INSERT INTO ads_fts(rowid, address, description) VALUES (new.id, new.address, new.description); END"
+    )
+    op.execute(
+        "CREATE TRIGGER ads_fts_ad AFTER DELETE ON ads BEGIN "
+        "INSERT INTO ads_fts(ads_fts, rowid, address, description) VALUES ('delete', old.id, old.address, old.description); END"
+    )
+    op.execute(
+        "CREATE TRIGGER ads_fts_au AFTER UPDATE OF address, description ON ads BEGIN "
+        "INSERT INTO ads_fts(ads_fts, rowid, address, description) VALUES ('delete', old.id, old.address, old.description); "
+        "INSERT INTO ads_fts(rowid, address, description) VALUES (new.id, new.address, new.description); END"
+    )
+    op.execute("INSERT INTO ads_fts(ads_fts) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("DROP INDEX ix_ads_fts")
+        return
+    op.execute("DROP TRIGGER ads_fts_au")
+    op.execute("DROP TRIGGER ads_fts_ad")
+    op.execute("DROP TRIGGER ads_fts_ai")
+    op.execute("DROP TABLE ads_fts")
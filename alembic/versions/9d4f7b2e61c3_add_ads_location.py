@@ -0,0 +1,54 @@
+"""add ads location
+
+Revision ID: 9d4f7b2e61c3
+Revises: 5e8a3d9c0b14
+Create Date: 2026-10-18 14:48:19.260315
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d4f7b2e61c3'
+down_revision: Union[str, None] = '5e8a3d9c0b14'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('ads', sa.Column('lat', sa.Float(), nullable=True))
+    op.add_column('ads', sa.Column('lon', sa.Float(), nullable=True))
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("CREATE INDEX ix_ads_location ON ads USING gist (point(lon, lat))")
+        return
+    op.execute("CREATE VIRTUAL TABLE ads_rtree USING rtree(id, min_lat, max_lat, min_lon, max_lon)")
+    op.execute(
+        "CREATE TRIGGER ads_rtree_ai AFTER INSERT ON ads "
+        "WHEN new.lat IS NOT NULL AND new.lon IS NOT NULL BEGIN "
+        "INSERT INTO ads_rtree VALUES (new.id, new.lat, new.lat, new.lon, new.lon); END"
+    )
+    op.execute(
+        "CREATE TRIGGER ads_rtree_ad AFTER DELETE ON ads BEGIN "
+        "DELETE FROM ads_rtree WHERE id = old.id; END"
+    )
+    op.execute(
+        "CREATE TRIGGER ads_rtree_au AFTER UPDATE OF lat, lon ON ads BEGIN "
+        "DELETE FROM ads_rtree WHERE id = old.id; "
+        "INSERT INTO ads_rtree SELECT new.id, new.lat, new.lat, new.lon, new.lon "
+        "WHERE new.lat IS NOT NULL AND new.lon IS NOT NULL; END"
+    )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("DROP INDEX ix_ads_location")
+    else:
+        op.execute("DROP TRIGGER ads_rtree_au")
+        op.execute("DROP TRIGGER ads_rtree_ad")
+        op.execute("DROP TRIGGER ads_rtree_ai")
+        op.execute("DROP TABLE ads_rtree")
+    op.drop_column('ads', 'lon')
+    op.drop_column('ads', 'lat')
@@ -0,0 +1,43 @@
+"""add ads price_per_sqm and sort indexes
+
+Revision ID: a6d2e8c4f913
+Revises: f1a9c3e7b285
+Create Date: 2026-10-18 20:41:03.127655
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a6d2e8c4f913'
+down_revision: Union[str, None] = 'f1a9c3e7b285'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+PRICE_PER_SQM = "CASE WHEN area > 0 THEN price / area END"
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name == 'sqlite':
+        # SQLite can only add VIRTUAL generated columns to an existing table;
+        # the values are still stored in the index below
+        op.execute(f"ALTER TABLE ads ADD COLUMN price_per_sqm FLOAT GENERATED ALWAYS AS ({PRICE_PER_SQM}) VIRTUAL")
+    else:
+        op.add_column('ads', sa.Column('price_per_sqm', sa.Float(), sa.Computed(PRICE_PER_SQM, persisted=True)))
+    op.create_index('ix_ads_area_id', 'ads', ['area', 'id'], unique=False)
+    op.create_index('ix_ads_price_per_sqm_id', 'ads', ['price_per_sqm', 'id'], unique=False)
+    op.create_index('ix_ads_type_price_per_sqm_id', 'ads', ['type', 'price_per_sqm', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_ads_type_price_per_sqm_id', table_name='ads')
+    op.drop_index('ix_ads_price_per_sqm_id', table_name='ads')
+    op.drop_index('ix_ads_area_id', table_name='ads')
+    if op.get_bind().dialect.name == 'sqlite':
+        # native DROP COLUMN; a batch rebuild of ads would drop its FTS and R*Tree triggers
+        op.execute("ALTER TABLE ads DROP COLUMN price_per_sqm")
+    else:
+        op.drop_column('ads', 'price_per_sqm')
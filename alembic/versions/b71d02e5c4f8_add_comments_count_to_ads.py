@@ -0,0 +1,31 @@
+"""add comments_count to ads
+
+Revision ID: b71d02e5c4f8
+Revises: 3c9e1f4b7a21
+Create Date: 2026-10-18 11:04:52.918340
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b71d02e5c4f8'
+down_revision: Union[str, None] = '3c9e1f4b7a21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('ads', sa.Column('comments_count', sa.Integer(), server_default='0', nullable=False))
+    op.execute(
+        "UPDATE ads SET comments_count = "
+        "(SELECT COUNT(comments.id) FROM comments WHERE comments.shanyrak_id = ads.id)"
+    )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('ads') as batch_op:
+        batch_op.drop_column('comments_count')
@@ -0,0 +1,26 @@
+"""add comments thread index
+
+Revision ID: c2a6e8f1d937
+Revises: 9d4f7b2e61c3
+Create Date: 2026-10-18 16:02:44.187615
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c2a6e8f1d937'
+down_revision: Union[str, None] = '9d4f7b2e61c3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_comments_shanyrak_id_created_at_id', 'comments', ['shanyrak_id', 'created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_comments_shanyrak_id_created_at_id', table_name='comments')
@@ -0,0 +1,31 @@
+"""add favorites unique index
+
+Revision ID: d8b3f5a0e2c6
+Revises: c2a6e8f1d937
+Create Date: 2026-10-18 17:11:38.604921
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd8b3f5a0e2c6'
+down_revision: Union[str, None] = 'c2a6e8f1d937'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # keep the oldest row of every duplicated (user_id, shanyrak_id) pair
+    op.execute(
+        "DELETE FROM favorites WHERE id NOT IN "
+        "(SELECT MIN(id) FROM favorites GROUP BY user_id, shanyrak_id)"
+    )
+    op.create_index('ux_favorites_user_id_shanyrak_id', 'favorites', ['user_id', 'shanyrak_id'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ux_favorites_user_id_shanyrak_id', table_name='favorites')
@@ -0,0 +1,38 @@
+"""add ads updated_at and comments_version
+
+Revision ID: e4c7a9b1d052
+Revises: d8b3f5a0e2c6
+Create Date: 2026-10-18 18:02:11.274519
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4c7a9b1d052'
+down_revision: Union[str, None] = 'd8b3f5a0e2c6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('ads', sa.Column('updated_at', sa.DateTime(), nullable=True))
+    op.add_column('ads', sa.Column('comments_version', sa.Integer(), server_default='0', nullable=False))
+    # stored as naive UTC, like the application writes it
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("UPDATE ads SET updated_at = timezone('utc', now())")
+    else:
+        op.execute("UPDATE ads SET updated_at = CURRENT_TIMESTAMP")
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == 'sqlite':
+        # native DROP COLUMN (SQLite 3.35+); a batch rebuild of ads would drop its FTS and R*Tree triggers
+        op.execute("ALTER TABLE ads DROP COLUMN comments_version")
+        op.execute("ALTER TABLE ads DROP COLUMN updated_at")
+    else:
+        op.drop_column('ads', 'comments_version')
+        op.drop_column('ads', 'updated_at')
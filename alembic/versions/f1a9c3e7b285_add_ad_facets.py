@@ -0,0 +1,44 @@
+"""add ad_facets aggregate
+
+Revision ID: f1a9c3e7b285
+Revises: e4c7a9b1d052
+Create Date: 2026-10-18 19:26:40.511832
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1a9c3e7b285'
+down_revision: Union[str, None] = 'e4c7a9b1d052'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# same edges as app.ShanyraqRepository.PRICE_BUCKETS at the time of this revision
+PRICE_BUCKETS = (0, 50000, 100000, 200000, 300000, 500000, 1000000, 5000000, 10000000, 25000000, 50000000, 100000000)
+
+
+def upgrade() -> None:
+    op.create_table(
+        'ad_facets',
+        sa.Column('type', sa.String(), nullable=False),
+        sa.Column('rooms_count', sa.Integer(), nullable=False),
+        sa.Column('price_bucket', sa.Integer(), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('type', 'rooms_count', 'price_bucket'),
+    )
+    bucket = "CASE " + " ".join(
+        f"WHEN price >= {edge} THEN {i}" for i, edge in reversed(list(enumerate(PRICE_BUCKETS)))
+    ) + " ELSE -1 END"
+    op.execute(
+        "INSERT INTO ad_facets (type, rooms_count, price_bucket, count) "
+        f"SELECT COALESCE(type, ''), COALESCE(rooms_count, -1), {bucket}, COUNT(*) FROM ads "
+        f"GROUP BY COALESCE(type, ''), COALESCE(rooms_count, -1), {bucket}"
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('ad_facets')
@@ -1,12 +1,16 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Index, select, update, tuple_
 from fastapi import HTTPException
 from sqlalchemy.sql import func
-from datetime import datetime, timezone
-from sqlalchemy.orm import relationship, Session
+from datetime import datetime
+from sqlalchemy.orm import relationship
+from sqlalchemy.ext.asyncio import AsyncSession
 from .database import Base
 from pydantic import BaseModel
 import pytz
-from .ShanyraqRepository import AdsDB
+from .ShanyraqRepository import AdsDB, ad_detail_cache
+from .tools import encode_cursor, decode_cursor
+from .batcher import write_batcher
+from typing import List, Optional
 
 local_timezone = pytz.timezone("Asia/Almaty")
 
@@ -21,63 +25,123 @@ class CommentDB(Base):
     author = relationship("UserDB", back_populates="comments")
     shanyrak = relationship("AdsDB", back_populates="comments")
 
+    __table_args__ = (
+        Index("ix_comments_shanyrak_id_created_at_id", "shanyrak_id", "created_at", "id"),
+    )
+
 class CommentRequest(BaseModel):
     content: str
 
+class CommentItem(BaseModel):
+    id: int
+    content: str
+    created_at: datetime
+    author_id: Optional[int] = None
+
+class CommentsPage(BaseModel):
+    next_cursor: Optional[str] = None
+    comments: List[CommentItem]
+
 class CommentRepository:
     def __init__(self):
         pass
 
-    def add_comment(self, db: Session, user_id: int, shanyrak_id: int, content: str):
-        comment = CommentDB(author_id=user_id, shanyrak_id=shanyrak_id, content=content)
-        db.add(comment)
-        db.commit()
-        db.refresh(comment)
+    async def add_comment(self, db: AsyncSession, user_id: int, shanyrak_id: int, content: str):
+        async def write(session: AsyncSession):
+            comment = CommentDB(author_id=user_id, shanyrak_id=shanyrak_id, content=content)
+            session.add(comment)
+            await session.execute(update(AdsDB).where(AdsDB.id == shanyrak_id).values(comments_count=AdsDB.comments_count + 1, comments_version=AdsDB.comments_version + 1))
+            await session.flush()
+            return comment
+
+        comment = await write_batcher.run(db, write)
+        await ad_detail_cache.delete(shanyrak_id)
         return comment
 
-    def get_comment_by_id(self, db: Session, comment_id: int):
-        return db.query(CommentDB).filter(CommentDB.id == comment_id).first()
+    async def get_comment_by_id(self, db: AsyncSession, comment_id: int):
+        return await db.get(CommentDB, comment_id)
     
-    def get_all_comments(self, db: Session, shanyrak_id: int):
-        comments = db.query(CommentDB).filter(CommentDB.shanyrak_id==shanyrak_id).all()
+    async def get_all_comments(
+        self,
+        db: AsyncSession,
+        shanyrak_id: int,
+        limit: Optional[int] = None,
+        before: Optional[str] = None,
+        after: Optional[str] = None,
+        order: str = "asc"
+    ):
+        query = select(CommentDB.id, CommentDB.content, CommentDB.created_at, CommentDB.author_id).where(CommentDB.shanyrak_id == shanyrak_id)
+        # keyset over (created_at, id), served by ix_comments_shanyrak_id_created_at_id
+        position = tuple_(CommentDB.created_at, CommentDB.id)
+        if before:
+            query = query.where(position < self._decode_position(before))
+        if after:
+            query = query.where(position > self._decode_position(after))
+        if order == "desc":
+            query = query.order_by(CommentDB.created_at.desc(), CommentDB.id.desc())
+        else:
+            query = query.order_by(CommentDB.created_at, CommentDB.id)
+        if limit:
+            query = query.limit(limit)
+        comments = (await db.execute(query)).all()
+        next_cursor = None
+        if limit and len(comments) == limit:
+            last = comments[-1]
+            next_cursor = encode_cursor([last.created_at.isoformat(), last.id])
         return {
-            "comments": [
-                {
-                    "id": comment.id,
-                    "content": comment.content,
-                    "created_at": comment.created_at,
-                    "author_id": comment.author_id
-                }
-                for comment in comments
-            ]
+            "next_cursor": next_cursor,
+            "comments": [comment._asdict() for comment in comments]
         }
     
-    def get_total_comments(self, db: Session, shanyrak_id):
-        comments = db.query(CommentDB).filter(CommentDB.shanyrak_id==shanyrak_id).all()
-        total = 0
-        for comment in comments:
-            total += 1
-        return total
-
-    def update_comment(self, db: Session, comment_id: int, user_id: int, **kwargs):
-        db_comment = db.query(CommentDB).filter(CommentDB.id == comment_id).first()
-        if not db_comment:
-            return None
-        if db_comment.author_id != user_id:
-            raise HTTPException(status_code=403, detail="Forbidden")
-        for key, value in kwargs.items():
-            setattr(db_comment, key, value)
-        db.commit()
-        db.refresh(db_comment)
+    @staticmethod
+    def _decode_position(cursor: str):
+        value = decode_cursor(cursor)
+        if not isinstance(value, list) or len(value) != 2 or not isinstance(value[1], int):
+            raise ValueError("Invalid cursor")
+        return datetime.fromisoformat(value[0]), value[1]
+
+    async def get_total_comments(self, db: AsyncSession, shanyrak_id):
+        total = await db.scalar(select(AdsDB.comments_count).where(AdsDB.id == shanyrak_id))
+        return total or 0
+
+    async def rebuild_comments_count(self, db: AsyncSession):
+        actual = select(func.count(CommentDB.id)).where(CommentDB.shanyrak_id == AdsDB.id).scalar_subquery()
+        result = await db.execute(update(AdsDB).values(comments_count=actual))
+        await db.commit()
+        return result.rowcount
+
+    async def update_comment(self, db: AsyncSession, comment_id: int, user_id: int, **kwargs):
+        async def write(session: AsyncSession):
+            db_comment = await session.get(CommentDB, comment_id)
+            if not db_comment:
+                return None
+            if db_comment.author_id != user_id:
+                raise HTTPException(status_code=403, detail="Forbidden")
+            for key, value in kwargs.items():
+                setattr(db_comment, key, value)
+            await session.execute(update(AdsDB).where(AdsDB.id == db_comment.shanyrak_id).values(comments_version=AdsDB.comments_version + 1))
+            await session.flush()
+            return db_comment
+
+        db_comment = await write_batcher.run(db, write)
+        if db_comment is not None:
+            await ad_detail_cache.delete(db_comment.shanyrak_id)
         return db_comment
     
-    def delete_comment(self, db: Session, comment_id: int, user_id: int):
-        db_comment = db.query(CommentDB).filter(CommentDB.id == comment_id).first()
-        db_sanyraq = db.query(AdsDB).filter(AdsDB.id == db_comment.shanyrak_id).first()
-        if db_comment is None:
-            return None
-        if db_comment.author_id != user_id and db_sanyraq.user_id != user_id:
-            raise HTTPException(status_code=403, detail="Forbidden")
-        db.delete(db_comment)
-        db.commit()
-        return db_comment
\ No newline at end of file
+    async def delete_comment(self, db: AsyncSession, comment_id: int, user_id: int):
+        async def write(session: AsyncSession):
+            db_comment = await session.get(CommentDB, comment_id)
+            if db_comment is None:
+                return None
+            db_sanyraq = await session.get(AdsDB, db_comment.shanyrak_id)
+            if db_comment.author_id != user_id and db_sanyraq.user_id != user_id:
+                raise HTTPException(status_code=403, detail="Forbidden")
+            await session.delete(db_comment)
+            await session.execute(update(AdsDB).where(AdsDB.id == db_comment.shanyrak_id).values(comments_count=AdsDB.comments_count - 1, comments_version=AdsDB.comments_version + 1))
+            await session.flush()
+            return db_comment
+
+        db_comment = await write_batcher.run(db, write)
+        if db_comment is not None:
+            await ad_detail_cache.delete(db_comment.shanyrak_id)
+        return db_comment
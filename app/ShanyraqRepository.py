@@ -1,10 +1,36 @@
-from pydantic import BaseModel, field_validator, EmailStr
+from pydantic import BaseModel, Field, field_validator, EmailStr, ValidationError
 from fastapi import HTTPException
 import re
 from .database import Base
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, and_
-from sqlalchemy.orm import Session, relationship
-from typing import Optional, Dict
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Index, DDL, Computed, event, select, insert, delete, case, func, table, column, literal_column, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import relationship
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional, Dict, List
+from .tools import encode_cursor, decode_cursor, iter_csv_records, utcnow
+from .cache import LRUCache, TTLCache
+from .adindex import ad_index
+import time
+from bisect import bisect_right
+from collections import Counter
+from datetime import datetime
+import os
+import math
+import csv
+import io
+import json
+
+# how long a cached total is trusted for count=exact; adjustments made by this
+# process keep it exact, the ttl bounds drift caused by writes from other workers
+COUNT_CACHE_TTL = 30
+COUNT_CACHE_SIZE = 1024
+
+# GetAd payloads keyed by ad id; invalidated by ad and comment writes
+ad_detail_cache = TTLCache(
+    maxsize=int(os.getenv("AD_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("AD_CACHE_TTL", "300")),
+)
 
 class AdsDB(Base):
     __tablename__ = "ads"
@@ -15,12 +41,140 @@ class AdsDB(Base):
     area = Column(Float)
     rooms_count = Column(Integer)
     description = Column(String)
+    comments_count = Column(Integer, nullable=False, default=0, server_default="0")
+    lat = Column(Float, nullable=True)
+    lon = Column(Float, nullable=True)
+    # bumped on every UPDATE of the row, including comment counter changes
+    updated_at = Column(DateTime, nullable=True, default=utcnow, onupdate=utcnow)
+    comments_version = Column(Integer, nullable=False, default=0, server_default="0")
+    # NULL when area is 0; computed by the database, so bulk inserts get it too
+    price_per_sqm = Column(Float, Computed("CASE WHEN area > 0 THEN price / area END", persisted=True))
 
     user_id = Column(Integer, ForeignKey("users.id"))
     user = relationship("UserDB", back_populates="ads")
     comments = relationship("CommentDB", back_populates="shanyrak", cascade="all, delete")
     favorited_by = relationship("FavoriteDB", back_populates="ad", cascade="all, delete")
 
+    __table_args__ = (
+        Index("ix_ads_type_rooms_count_price_id", "type", "rooms_count", "price", "id"),
+        Index("ix_ads_rooms_count_price_id", "rooms_count", "price", "id"),
+        Index("ix_ads_price_id", "price", "id"),
+        Index("ix_ads_area_id", "area", "id"),
+        Index("ix_ads_price_per_sqm_id", "price_per_sqm", "id"),
+        Index("ix_ads_type_price_per_sqm_id", "type", "price_per_sqm", "id"),
+    )
+
+# full-text index over address + description: an external-content FTS5 table kept
+# in sync by triggers on SQLite, an expression GIN index on Postgres
+ADS_FTS_SQLITE_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS ads_fts USING fts5("
+    "address, description, content='ads', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS ads_fts_ai AFTER INSERT ON ads BEGIN "
+    "INSERT INTO ads_fts(rowid, address, description) VALUES (new.id, new.address, new.description); END",
+    "CREATE TRIGGER IF NOT EXISTS ads_fts_ad AFTER DELETE ON ads BEGIN "
+    "INSERT INTO ads_fts(ads_fts, rowid, address, description) VALUES ('delete', old.id, old.address, old.description); END",
+    "CREATE TRIGGER IF NOT EXISTS ads_fts_au AFTER UPDATE OF address, description ON ads BEGIN "
+    "INSERT INTO ads_fts(ads_fts, rowid, address, description) VALUES ('delete', old.id, old.address, old.description); "
+    "INSERT INTO ads_fts(rowid, address, description) VALUES (new.id, new.address, new.description); END",
+]
+ADS_FTS_POSTGRES_DDL = [
+    "CREATE INDEX IF NOT EXISTS ix_ads_fts ON ads USING gin ("
+    "to_tsvector('simple', coalesce(address, '') || ' ' || coalesce(description, '')))",
+]
+for statement in ADS_FTS_SQLITE_DDL:
+    event.listen(AdsDB.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+for statement in ADS_FTS_POSTGRES_DDL:
+    event.listen(AdsDB.__table__, "after_create", DDL(statement).execute_if(dialect="postgresql"))
+
+ads_fts = table("ads_fts", column("rowid"), column("rank"))
+
+# spatial index over (lat, lon): an R*Tree on SQLite, a GiST index on point(lon, lat) on Postgres
+ADS_RTREE_SQLITE_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS ads_rtree USING rtree(id, min_lat, max_lat, min_lon, max_lon)",
+    "CREATE TRIGGER IF NOT EXISTS ads_rtree_ai AFTER INSERT ON ads "
+    "WHEN new.lat IS NOT NULL AND new.lon IS NOT NULL BEGIN "
+    "INSERT INTO ads_rtree VALUES (new.id, new.lat, new.lat, new.lon, new.lon); END",
+    "CREATE TRIGGER IF NOT EXISTS ads_rtree_ad AFTER DELETE ON ads BEGIN "
+    "DELETE FROM ads_rtree WHERE id = old.id; END",
+    "CREATE TRIGGER IF NOT EXISTS ads_rtree_au AFTER UPDATE OF lat, lon ON ads BEGIN "
+    "DELETE FROM ads_rtree WHERE id = old.id; "
+    "INSERT INTO ads_rtree SELECT new.id, new.lat, new.lat, new.lon, new.lon "
+    "WHERE new.lat IS NOT NULL AND new.lon IS NOT NULL; END",
+]
+ADS_RTREE_POSTGRES_DDL = [
+    "CREATE INDEX IF NOT EXISTS ix_ads_location ON ads USING gist (point(lon, lat))",
+]
+for statement in ADS_RTREE_SQLITE_DDL:
+    event.listen(AdsDB.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+for statement in ADS_RTREE_POSTGRES_DDL:
+    event.listen(AdsDB.__table__, "after_create", DDL(statement).execute_if(dialect="postgresql"))
+
+ads_rtree = table("ads_rtree", column("id"), column("min_lat"), column("max_lat"), column("min_lon"), column("max_lon"))
+
+# lower edges of the price histogram; changing them needs rebuild_facets()
+PRICE_BUCKETS = (0, 50_000, 100_000, 200_000, 300_000, 500_000, 1_000_000, 5_000_000, 10_000_000, 25_000_000, 50_000_000, 100_000_000)
+ROOMS_FACET_MAX = 5
+
+# ad counts per (type, rooms_count, price bucket); NULLs are stored as "" / -1
+# so the composite key stays usable as an upsert target
+class AdFacetDB(Base):
+    __tablename__ = "ad_facets"
+    type = Column(String, primary_key=True)
+    rooms_count = Column(Integer, primary_key=True)
+    price_bucket = Column(Integer, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+
+def price_bucket(price) -> int:
+    if price is None or price < PRICE_BUCKETS[0]:
+        return -1
+    return bisect_right(PRICE_BUCKETS, price) - 1
+
+
+def facet_key(ad_type, rooms_count, price):
+    return (ad_type if ad_type is not None else "", rooms_count if rooms_count is not None else -1, price_bucket(price))
+
+
+def price_bucket_expr(price):
+    return case(*[(price >= edge, i) for i, edge in reversed(list(enumerate(PRICE_BUCKETS)))], else_=-1)
+
+
+def facet_columns():
+    return (
+        func.coalesce(AdsDB.type, "").label("facet_type"),
+        func.coalesce(AdsDB.rooms_count, -1).label("facet_rooms_count"),
+        price_bucket_expr(AdsDB.price).label("facet_price_bucket"),
+    )
+
+
+def facet_rebuild_statements():
+    key = facet_columns()
+    grouped = select(*key, func.count()).group_by(*key)
+    return [
+        delete(AdFacetDB),
+        insert(AdFacetDB).from_select(["type", "rooms_count", "price_bucket", "count"], grouped),
+    ]
+
+METERS_PER_DEGREE = 111_320
+MAX_RADIUS = 100_000
+
+AD_IMPORT_FIELDS = ("type", "price", "address", "area", "rooms_count", "description", "lat", "lon")
+AD_EXPORT_COLUMNS = ("id",) + AD_IMPORT_FIELDS + ("user_id", "comments_count")
+EXPORT_BATCH_SIZE = 1000
+MAX_AD_BATCH = 100
+MAX_SEARCH_LIMIT = 100
+AD_LIST_COLUMNS = (AdsDB.id.label("_id"), AdsDB.type, AdsDB.price, AdsDB.address, AdsDB.area, AdsDB.rooms_count, AdsDB.price_per_sqm)
+# sort parameter -> (column, descending); ties are broken by id in the same direction
+# so the (column, id) indexes serve both the order and the keyset seek
+AD_SORTS = {
+    "price": (AdsDB.price, False),
+    "-price": (AdsDB.price, True),
+    "area": (AdsDB.area, False),
+    "-area": (AdsDB.area, True),
+    "price_per_sqm": (AdsDB.price_per_sqm, False),
+}
+AD_IMPORT_NUMBERS = {"price": int, "rooms_count": int, "area": float, "lat": float, "lon": float}
+
 class AdRequest(BaseModel):
     type: str
     price: int
@@ -28,6 +182,8 @@ class AdRequest(BaseModel):
     area: float
     rooms_count: int
     description: str
+    lat: Optional[float] = None
+    lon: Optional[float] = None
 
     @field_validator("price", mode="before")
     def price_validator(cls, value):
@@ -47,6 +203,18 @@ class AdRequest(BaseModel):
             raise ValueError("Rooms count must be positive")
         return value
 
+    @field_validator("lat")
+    def lat_validator(cls, value):
+        if value is not None and not -90 <= value <= 90:
+            raise ValueError("Latitude must be between -90 and 90")
+        return value
+
+    @field_validator("lon")
+    def lon_validator(cls, value):
+        if value is not None and not -180 <= value <= 180:
+            raise ValueError("Longitude must be between -180 and 180")
+        return value
+
 class AdUpdateRequest(BaseModel):
     type: Optional[str] = None
     price: Optional[int] = None
@@ -54,6 +222,8 @@ class AdUpdateRequest(BaseModel):
     area: Optional[float] = None
     rooms_count: Optional[int] = None
     description: Optional[str] = None
+    lat: Optional[float] = None
+    lon: Optional[float] = None
 
     @field_validator("price", mode="before")
     def price_validator(cls, value):
@@ -73,6 +243,18 @@ class AdUpdateRequest(BaseModel):
             raise ValueError("Rooms count must be positive")
         return value
 
+    @field_validator("lat")
+    def lat_validator(cls, value):
+        if value is not None and not -90 <= value <= 90:
+            raise ValueError("Latitude must be between -90 and 90")
+        return value
+
+    @field_validator("lon")
+    def lon_validator(cls, value):
+        if value is not None and not -180 <= value <= 180:
+            raise ValueError("Longitude must be between -180 and 180")
+        return value
+
 class AdResponse(BaseModel):
     id: int
 
@@ -86,53 +268,402 @@ class GetAd(BaseModel):
     description: str
     user_id: Optional[int] = None
     total_comments: int
+    lat: Optional[float] = None
+    lon: Optional[float] = None
+    updated_at: Optional[datetime] = None
+
+class AdBatchRequest(BaseModel):
+    ids: List[int]
+
+    @field_validator("ids")
+    def ids_validator(cls, value):
+        if not value:
+            raise ValueError("ids must not be empty")
+        if len(value) > MAX_AD_BATCH:
+            raise ValueError(f"At most {MAX_AD_BATCH} ids per request")
+        return value
+
+class AdBatchResponse(BaseModel):
+    shanyraks: List[GetAd]
+    missing: List[int]
+
+class AdListItem(BaseModel):
+    id: int = Field(alias="_id")
+    type: str
+    price: int
+    address: str
+    area: float
+    rooms_count: int
+    price_per_sqm: Optional[float] = None
+
+class AdSearchResponse(BaseModel):
+    total: Optional[int] = None
+    next_cursor: Optional[str] = None
+    objects: List[AdListItem]
+
+class PriceFacet(BaseModel):
+    min: int
+    max: Optional[int] = None
+    count: int
+
+class AdFacetsResponse(BaseModel):
+    total: int
+    type: Dict[str, int]
+    rooms_count: Dict[str, int]
+    price: List[PriceFacet]
+    source: str
 
 
 class AdRepository():
     def __init__(self):
-        pass
+        self.count_cache = LRUCache(maxsize=COUNT_CACHE_SIZE)
+
+    @staticmethod
+    def _count_key(ad_type=None, rooms_count=None, price_from=None, price_until=None, *extra):
+        # extra holds filters that can't be evaluated in Python (q, bbox, near)
+        extra = tuple(extra) if any(value is not None for value in extra) else None
+        return (ad_type or None, rooms_count or None, price_from or None, price_until or None, extra)
+
+    @staticmethod
+    def _matches(key, ad_type, rooms_count, price):
+        key_type, key_rooms, key_from, key_until, key_extra = key
+        if key_type is not None and ad_type != key_type:
+            return False
+        if key_rooms is not None and rooms_count != key_rooms:
+            return False
+        if key_from is not None and (price is None or price < key_from):
+            return False
+        if key_until is not None and (price is None or price > key_until):
+            return False
+        return True
+
+    @staticmethod
+    async def _apply_facets(db: AsyncSession, deltas: Counter):
+        rows = [
+            {"type": key[0], "rooms_count": key[1], "price_bucket": key[2], "count": delta}
+            for key, delta in deltas.items() if delta
+        ]
+        if not rows:
+            return
+        insert_ = postgresql.insert if db.bind.dialect.name == "postgresql" else sqlite.insert
+        stmt = insert_(AdFacetDB).values(rows)
+        await db.execute(stmt.on_conflict_do_update(
+            index_elements=["type", "rooms_count", "price_bucket"],
+            set_={"count": AdFacetDB.count + stmt.excluded["count"]},
+        ))
 
-    def get_ad_by_id(self, db: Session, ad_id: int):
-        return db.query(AdsDB).filter(AdsDB.id == ad_id).first()
+    async def rebuild_facets(self, db: AsyncSession):
+        for stmt in facet_rebuild_statements():
+            result = await db.execute(stmt)
+        await db.commit()
+        return result.rowcount
+
+    async def get_facets(
+        self,
+        db: AsyncSession,
+        ad_type: Optional[str] = None,
+        rooms_count: Optional[int] = None,
+        price_from: Optional[int] = None,
+        price_until: Optional[int] = None,
+        q: Optional[str] = None,
+        bbox: Optional[str] = None,
+        near: Optional[str] = None,
+        radius: Optional[float] = None
+    ):
+        if price_from or price_until or q or bbox or near:
+            # price bounds don't line up with the buckets, and text/geo filters
+            # aren't in the aggregate: one grouped query over the matching ads
+            query, _ = self.build_search_query(
+                db.bind.dialect.name, ad_type, rooms_count, price_from, price_until, q, bbox, near, radius
+            )
+            key = facet_columns()
+            rows = (await db.execute(
+                query.with_only_columns(*key, func.count(), maintain_column_froms=True).group_by(*key)
+            )).all()
+            source = "query"
+        else:
+            query = select(AdFacetDB.type, AdFacetDB.rooms_count, AdFacetDB.price_bucket, AdFacetDB.count).where(AdFacetDB.count > 0)
+            if ad_type:
+                query = query.where(AdFacetDB.type == ad_type)
+            if rooms_count:
+                query = query.where(AdFacetDB.rooms_count == rooms_count)
+            rows = (await db.execute(query)).all()
+            source = "aggregate"
+
+        types, rooms, prices = Counter(), Counter(), Counter()
+        total = 0
+        for facet_type, facet_rooms, bucket, count in rows:
+            total += count
+            if facet_type != "":
+                types[facet_type] += count
+            if facet_rooms >= 0:
+                rooms[str(facet_rooms) if facet_rooms < ROOMS_FACET_MAX else f"{ROOMS_FACET_MAX}+"] += count
+            if bucket >= 0:
+                prices[bucket] += count
+        return {
+            "total": total,
+            "type": dict(types.most_common()),
+            "rooms_count": dict(sorted(rooms.items())),
+            "price": [
+                {"min": PRICE_BUCKETS[i], "max": PRICE_BUCKETS[i + 1] if i + 1 < len(PRICE_BUCKETS) else None, "count": prices[i]}
+                for i in sorted(prices)
+            ],
+            "source": source,
+        }
+
+    def _adjust_counts(self, delta: int, ad_type, rooms_count, price):
+        for key, (total, stored_at) in self.count_cache.items():
+            if not self._matches(key, ad_type, rooms_count, price):
+                continue
+            if key[4] is not None:
+                # text and geo matches can't be evaluated here, recount on next use
+                self.count_cache.pop(key)
+            else:
+                self.count_cache.set(key, (total + delta, stored_at))
+
+    @staticmethod
+    def _text_search(query, dialect: str, q: str):
+        terms = re.findall(r"\w+", q)
+        if not terms:
+            return query, None
+        if dialect == "postgresql":
+            document = func.to_tsvector("simple", func.coalesce(AdsDB.address, "") + " " + func.coalesce(AdsDB.description, ""))
+            tsquery = func.to_tsquery("simple", " & ".join(f"{term}:*" for term in terms))
+            return query.where(document.op("@@")(tsquery)), func.ts_rank(document, tsquery).desc()
+        # every term as a quoted prefix query, fts5 rank is bm25
+        match = " ".join(f'"{term}"*' for term in terms)
+        matched = select(ads_fts.c.rowid, ads_fts.c.rank).where(literal_column("ads_fts").op("MATCH")(match)).subquery()
+        return query.join(matched, matched.c.rowid == AdsDB.id), matched.c.rank
+
+    @staticmethod
+    def _parse_floats(value: str, count: int, name: str):
+        try:
+            numbers = [float(part) for part in value.split(",")]
+        except ValueError:
+            numbers = []
+        if len(numbers) != count or not all(math.isfinite(number) for number in numbers):
+            raise ValueError(f"Invalid {name}")
+        return numbers
+
+    @staticmethod
+    def _geo_search(query, dialect: str, south: float, west: float, north: float, east: float):
+        if dialect == "postgresql":
+            location = func.point(AdsDB.lon, AdsDB.lat)
+            box = func.box(func.point(west, south), func.point(east, north))
+            return query.where(location.op("<@")(box))
+        # the r-tree yields the candidates, exact bounds are rechecked on ads since
+        # the r-tree stores coordinates as 32-bit floats
+        candidates = select(ads_rtree.c.id).where(
+            ads_rtree.c.max_lat >= south, ads_rtree.c.min_lat <= north,
+            ads_rtree.c.max_lon >= west, ads_rtree.c.min_lon <= east,
+        ).subquery()
+        return query.join(candidates, candidates.c.id == AdsDB.id).where(
+            AdsDB.lat.between(south, north), AdsDB.lon.between(west, east)
+        )
+
+    async def get_ad_by_id(self, db: AsyncSession, ad_id: int):
+        return await db.get(AdsDB, ad_id)
+
+    async def get_ad_detail(self, db: AsyncSession, ad_id: int, updated_at: Optional[datetime] = None):
+        # updated_at, when known, is the row's current version: an entry cached
+        # before another worker's write doesn't match it and is reloaded
+        cached = await ad_detail_cache.get(ad_id)
+        if cached is not None and (updated_at is None or cached["updated_at"] == updated_at):
+            return GetAd(**cached)
+        ad = await self.get_ad_by_id(db, ad_id)
+        if ad is None:
+            return None
+        detail = self._to_detail(ad)
+        # replica rows may predate a write that just invalidated the entry
+        if not db.info.get("replica"):
+            await ad_detail_cache.set(ad_id, detail.model_dump())
+        return detail
+
+    @staticmethod
+    def _to_detail(ad: AdsDB):
+        return GetAd(
+            id=ad.id,
+            type=ad.type,
+            price=ad.price,
+            address=ad.address,
+            area=ad.area,
+            rooms_count=ad.rooms_count,
+            description=ad.description,
+            user_id=ad.user_id,
+            total_comments=ad.comments_count,
+            lat=ad.lat,
+            lon=ad.lon,
+            updated_at=ad.updated_at
+        )
+
+    async def get_ad_version(self, db: AsyncSession, ad_id: int):
+        # (updated_at, comments_version) straight off the primary key, for conditional GETs
+        return (await db.execute(
+            select(AdsDB.updated_at, AdsDB.comments_version).where(AdsDB.id == ad_id)
+        )).first()
+
+    async def get_ad_details(self, db: AsyncSession, ad_ids: List[int]):
+        # cache hits first, then one IN (...) query for the rest; order follows ad_ids
+        details = {}
+        for ad_id in dict.fromkeys(ad_ids):
+            cached = await ad_detail_cache.get(ad_id)
+            if cached is not None:
+                details[ad_id] = GetAd(**cached)
+        pending = [ad_id for ad_id in dict.fromkeys(ad_ids) if ad_id not in details]
+        if pending:
+            for ad in (await db.scalars(select(AdsDB).where(AdsDB.id.in_(pending)))).all():
+                detail = self._to_detail(ad)
+                if not db.info.get("replica"):
+                    await ad_detail_cache.set(ad.id, detail.model_dump())
+                details[ad.id] = detail
+        found = [details[ad_id] for ad_id in ad_ids if ad_id in details]
+        missing = [ad_id for ad_id in dict.fromkeys(ad_ids) if ad_id not in details]
+        return found, missing
     
-    def create_ad(self, db: Session, ad: AdRequest, user_id: int):
-        db_ad = AdsDB(type=ad.type, price=ad.price, address=ad.address, area=ad.area, rooms_count=ad.rooms_count, description=ad.description, user_id=user_id)
+    async def create_ad(self, db: AsyncSession, ad: AdRequest, user_id: int):
+        db_ad = AdsDB(type=ad.type, price=ad.price, address=ad.address, area=ad.area, rooms_count=ad.rooms_count, description=ad.description, lat=ad.lat, lon=ad.lon, user_id=user_id)
         db.add(db_ad)
-        db.commit()
-        db.refresh(db_ad)
+        await self._apply_facets(db, Counter([facet_key(ad.type, ad.rooms_count, ad.price)]))
+        await db.commit()
+        await db.refresh(db_ad)
+        self._adjust_counts(1, db_ad.type, db_ad.rooms_count, db_ad.price)
+        self._index_ad(db_ad)
         return db_ad  
+
+    async def bulk_create_ads(self, db: AsyncSession, ads, user_id: int):
+        rows = [{**ad.model_dump(include=set(AD_IMPORT_FIELDS)), "user_id": user_id} for ad in ads]
+        # ordered RETURNING makes SQLite fall back to one INSERT per row; it hands out
+        # rowids as max(rowid) + 1 under the write lock, so sorting restores line order
+        ordered = db.bind.dialect.name != "sqlite"
+        result = await db.execute(insert(AdsDB).returning(AdsDB.id, sort_by_parameter_order=ordered), rows)
+        ids = sorted(result.scalars()) if not ordered else list(result.scalars())
+        await self._apply_facets(db, Counter(facet_key(row["type"], row["rooms_count"], row["price"]) for row in rows))
+        await db.commit()
+        # per-key adjustment is O(rows * keys) here, recounting is cheaper
+        self.count_cache.clear()
+        if ad_index is not None and ad_index.ready:
+            ad_index.add_many(
+                (ad_id, row["type"], row["rooms_count"], row["price"], row["area"]) for ad_id, row in zip(ids, rows)
+            )
+        return ids
+
+    @staticmethod
+    def _parse_import_row(fmt: str, record, header):
+        if fmt == "csv":
+            if len(record) != len(header):
+                raise ValueError(f"expected {len(header)} columns, got {len(record)}")
+            row = {}
+            for name, value in zip(header, record):
+                # id, user_id and comments_count from an export are not importable;
+                # an empty cell is a missing number but an empty string otherwise
+                if name not in AD_IMPORT_FIELDS or (value == "" and name in AD_IMPORT_NUMBERS):
+                    continue
+                row[name] = AD_IMPORT_NUMBERS[name](value) if name in AD_IMPORT_NUMBERS else value
+        else:
+            row = json.loads(record)
+            if not isinstance(row, dict):
+                raise ValueError("expected a JSON object")
+        return AdRequest(**row)
+
+    async def import_ads(self, db: AsyncSession, lines, fmt: str, user_id: int, batch_size: int = 1000):
+        ids, errors = [], []
+        batch, batch_records = [], []
+        header = None
+
+        async def flush():
+            try:
+                ids.extend(await self.bulk_create_ads(db, batch, user_id))
+            except SQLAlchemyError as e:
+                await db.rollback()
+                errors.extend({"record": number, "error": str(e.orig if hasattr(e, "orig") else e)} for number in batch_records)
+            batch.clear()
+            batch_records.clear()
+
+        # errors point at data records (1-based, CSV header not counted), since a
+        # quoted CSV field can span several lines
+        records = iter_csv_records(lines) if fmt == "csv" else (line async for line in lines if line.strip())
+        record_number = 0
+        async for record in records:
+            if fmt == "csv" and header is None:
+                header = [name.strip() for name in record]
+                unknown = set(header) - set(AD_EXPORT_COLUMNS)
+                if unknown:
+                    raise ValueError(f"Unknown CSV columns: {', '.join(sorted(unknown))}")
+                continue
+            record_number += 1
+            try:
+                batch.append(self._parse_import_row(fmt, record, header))
+                batch_records.append(record_number)
+            except ValidationError as e:
+                errors.append({"record": record_number, "error": e.errors(include_url=False, include_context=False)})
+            except (ValueError, TypeError, KeyError) as e:
+                errors.append({"record": record_number, "error": str(e)})
+            if len(batch) >= batch_size:
+                await flush()
+        if batch:
+            await flush()
+        return {"created": len(ids), "ids": ids, "errors": errors}
     
-    def update_ad(self, db: Session, ad_id: int, us_id: int, **kwargs):
-        db_ad = db.query(AdsDB).filter(AdsDB.id == ad_id).first()
+    async def update_ad(self, db: AsyncSession, ad_id: int, us_id: int, **kwargs):
+        db_ad = await db.get(AdsDB, ad_id)
         if not db_ad:
             return None
         if db_ad.user_id != us_id:
             raise HTTPException(status_code=403, detail="Forbidden")
+        old = (db_ad.type, db_ad.rooms_count, db_ad.price)
         for key, value in kwargs.items():
             setattr(db_ad, key, value) 
-        db.commit()
-        db.refresh(db_ad)
+        facets = Counter({facet_key(db_ad.type, db_ad.rooms_count, db_ad.price): 1})
+        facets[facet_key(*old)] -= 1
+        await self._apply_facets(db, facets)
+        await db.commit()
+        await db.refresh(db_ad)
+        await ad_detail_cache.delete(ad_id)
+        self._adjust_counts(-1, *old)
+        self._adjust_counts(1, db_ad.type, db_ad.rooms_count, db_ad.price)
+        self._index_ad(db_ad)
         return db_ad
     
-    def delete_ad(self, db: Session, ad_id: int, us_id: int):
-        db_ad = db.query(AdsDB).filter(AdsDB.id == ad_id).first()
+    async def delete_ad(self, db: AsyncSession, ad_id: int, us_id: int):
+        db_ad = await db.get(AdsDB, ad_id)
         if db_ad is None:
             return None
         if db_ad.user_id != us_id:
             raise HTTPException(status_code=403, detail="Forbidden")
-        db.delete(db_ad)
-        db.commit()
+        old = (db_ad.type, db_ad.rooms_count, db_ad.price)
+        await db.delete(db_ad)
+        await self._apply_facets(db, Counter({facet_key(*old): -1}))
+        await db.commit()
+        await ad_detail_cache.delete(ad_id)
+        self._adjust_counts(-1, *old)
+        if ad_index is not None and ad_index.ready:
+            ad_index.remove(ad_id)
         return db_ad
     
-    def search_shanyrak(
+    async def count_ads(self, db: AsyncSession, query, key, mode: str = "exact"):
+        if mode == "none":
+            return None
+        cached = self.count_cache.get(key)
+        now = time.monotonic()
+        if cached is not None:
+            total, stored_at = cached
+            if mode == "approx" or now - stored_at < COUNT_CACHE_TTL:
+                return total
+        total = await db.scalar(query.with_only_columns(func.count(), maintain_column_froms=True))
+        self.count_cache.set(key, (total, now))
+        return total
+
+    def build_search_query(
         self,
-        db: Session,
-        limit: int,
-        offset: int,
+        dialect: str,
         ad_type: Optional[str] = None,
         rooms_count: Optional[int] = None,
         price_from: Optional[int] = None,
-        price_until: Optional[int] = None
+        price_until: Optional[int] = None,
+        q: Optional[str] = None,
+        bbox: Optional[str] = None,
+        near: Optional[str] = None,
+        radius: Optional[float] = None
     ):
         filters = []
         if ad_type:
@@ -144,23 +675,159 @@ class AdRepository():
         if price_until:
             filters.append(AdsDB.price <= price_until)
 
-        query = db.query(AdsDB).filter(and_(*filters))
+        query = select(AdsDB).where(*filters)
+        order_by = [AdsDB.id.desc()]
+        if q:
+            query, rank = self._text_search(query, dialect, q)
+            if rank is not None:
+                order_by.insert(0, rank)
+        if bbox:
+            west, south, east, north = self._parse_floats(bbox, 4, "bbox")
+            query = self._geo_search(query, dialect, south, west, north, east)
+        if radius and not near:
+            raise ValueError("radius requires near")
+        if near:
+            lat, lon = self._parse_floats(near, 2, "near")
+            radius = min(radius or 1000, MAX_RADIUS)
+            dlat = radius / METERS_PER_DEGREE
+            scale = max(math.cos(math.radians(lat)), 1e-6)
+            dlon = dlat / scale
+            query = self._geo_search(query, dialect, lat - dlat, lon - dlon, lat + dlat, lon + dlon)
+            # equirectangular distance, accurate to well under 1% at city scale
+            query = query.where(
+                (AdsDB.lat - lat) * (AdsDB.lat - lat) + ((AdsDB.lon - lon) * scale) * ((AdsDB.lon - lon) * scale) <= dlat * dlat
+            )
+        return query, order_by
+
+    async def search_shanyrak(
+        self,
+        db: AsyncSession,
+        limit: int,
+        offset: int,
+        ad_type: Optional[str] = None,
+        rooms_count: Optional[int] = None,
+        price_from: Optional[int] = None,
+        price_until: Optional[int] = None,
+        cursor: Optional[str] = None,
+        count: str = "exact",
+        q: Optional[str] = None,
+        bbox: Optional[str] = None,
+        near: Optional[str] = None,
+        radius: Optional[float] = None,
+        sort: str = "newest"
+    ):
+        if sort != "newest" and sort not in AD_SORTS:
+            raise ValueError(f"Unknown sort: {sort}")
+        if ad_index is not None and ad_index.ready and sort == "newest" and not (q or bbox or near):
+            return await self._search_index(db, limit, offset, ad_type, rooms_count, price_from, price_until, cursor, count)
+
+        query, order_by = self.build_search_query(
+            db.bind.dialect.name, ad_type, rooms_count, price_from, price_until, q, bbox, near, radius
+        )
+        sort_column, descending = AD_SORTS.get(sort, (None, True))
+        extra = ()
+        if sort_column is not None:
+            # ads without the sort key (no area means no per-m² price) drop out of
+            # the sorted listing: NULLs have no place in the (column, id) keyset
+            query = query.where(sort_column.isnot(None))
+            extra = (sort_column.key,)
+            order_by = [sort_column.desc(), AdsDB.id.desc()] if descending else [sort_column, AdsDB.id]
 
-        total = query.count()
+        key = self._count_key(ad_type, rooms_count, price_from, price_until, q, bbox, near, radius if near else None, *extra)
+        total = await self.count_ads(db, query, key, count)
 
-        ads = query.order_by(AdsDB.id.desc()).offset(offset).limit(limit).all()
+        # relevance order has no stable keyset (bm25 moves as the corpus changes),
+        # so q without sort pages by offset only
+        ranked = len(order_by) > 1 and sort_column is None
+        if cursor and ranked:
+            raise ValueError("Cursor pagination is not supported together with q")
+        if cursor and sort_column is not None:
+            # keyset over (sort column, id): deep pages seek instead of skipping rows
+            position = tuple_(sort_column, AdsDB.id)
+            last = self._decode_sort_position(cursor)
+            query = query.where(position < last if descending else position > last)
+            offset = 0
+        elif cursor:
+            # keyset pagination: seek past the last seen id instead of skipping rows
+            last_id = decode_cursor(cursor)
+            if not isinstance(last_id, int):
+                raise ValueError("Invalid cursor")
+            query = query.where(AdsDB.id < last_id)
+            offset = 0
+
+        query = query.with_only_columns(*AD_LIST_COLUMNS, maintain_column_froms=True)
+        ads = (await db.execute(query.order_by(*order_by).offset(offset).limit(limit))).all()
+        next_cursor = None
+        if len(ads) == limit and not ranked:
+            last = ads[-1]
+            next_cursor = encode_cursor(last._id if sort_column is None else [last._mapping[sort_column.key], last._id])
 
         return {
             "total": total,
-            "objects": [
-                {
-                    "_id": ad.id,
-                    "type": ad.type,
-                    "price": ad.price,
-                    "address": ad.address,
-                    "area": ad.area,
-                    "rooms_count": ad.rooms_count
-                }
-                for ad in ads
-            ]
-        }
\ No newline at end of file
+            "next_cursor": next_cursor,
+            "objects": [ad._asdict() for ad in ads]
+        }
+
+    @staticmethod
+    def _decode_sort_position(cursor: str):
+        value = decode_cursor(cursor)
+        if (not isinstance(value, list) or len(value) != 2 or not isinstance(value[1], int)
+                or isinstance(value[0], bool) or not isinstance(value[0], (int, float))):
+            raise ValueError("Invalid cursor")
+        return tuple(value)
+
+    async def _search_index(self, db: AsyncSession, limit, offset, ad_type, rooms_count, price_from, price_until, cursor, count):
+        before_id = None
+        if cursor:
+            before_id = decode_cursor(cursor)
+            if not isinstance(before_id, int):
+                raise ValueError("Invalid cursor")
+            offset = 0
+        page_ids, total = ad_index.search(
+            limit, offset, ad_type, rooms_count, price_from, price_until, before_id, with_total=count != "none"
+        )
+        # only the page is read from the database, then put back in index order
+        ads = {}
+        if page_ids:
+            rows = (await db.execute(select(*AD_LIST_COLUMNS).where(AdsDB.id.in_(page_ids)))).all()
+            ads = {row._id: row._asdict() for row in rows}
+        objects = [ads[ad_id] for ad_id in page_ids if ad_id in ads]
+        return {
+            "total": total,
+            "next_cursor": encode_cursor(page_ids[-1]) if len(page_ids) == limit else None,
+            "objects": objects
+        }
+
+    async def load_ad_index(self, db: AsyncSession):
+        columns = (AdsDB.id, AdsDB.type, AdsDB.rooms_count, AdsDB.price, AdsDB.area)
+        result = await db.stream(select(*columns).order_by(AdsDB.id).execution_options(yield_per=10000))
+        rows = []
+        async for partition in result.partitions():
+            rows.extend(tuple(row) for row in partition)
+        ad_index.load(rows)
+        return ad_index.size
+
+    @staticmethod
+    def _index_ad(db_ad):
+        if ad_index is not None and ad_index.ready:
+            ad_index.upsert(db_ad.id, db_ad.type, db_ad.rooms_count, db_ad.price, db_ad.area)
+
+    async def export_ads(self, db: AsyncSession, query, fmt: str = "ndjson"):
+        columns = [getattr(AdsDB, name) for name in AD_EXPORT_COLUMNS]
+        query = query.with_only_columns(*columns, maintain_column_froms=True).order_by(AdsDB.id)
+        # rows are pulled from the driver cursor yield_per at a time, so memory stays
+        # flat no matter how many ads match
+        result = await db.stream(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        if fmt == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(AD_EXPORT_COLUMNS)
+            yield buffer.getvalue()
+        async for rows in result.partitions():
+            if fmt == "csv":
+                buffer.seek(0)
+                buffer.truncate()
+                writer.writerows(rows)
+                yield buffer.getvalue()
+            else:
+                yield "".join(json.dumps(dict(zip(AD_EXPORT_COLUMNS, row)), ensure_ascii=False) + "\n" for row in rows)
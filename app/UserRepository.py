@@ -1,9 +1,21 @@
-from pydantic import BaseModel, field_validator, EmailStr
+from pydantic import BaseModel, Field, field_validator, EmailStr
 import re
 from .database import Base
-from sqlalchemy import Column, Integer, String, ForeignKey
-from sqlalchemy.orm import Session, relationship
-from typing import Optional
+from sqlalchemy import Column, Integer, String, ForeignKey, Index, select, delete, literal
+from sqlalchemy.orm import relationship
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.dialects import postgresql, sqlite
+from typing import Optional, List
+from .cache import TTLCache
+from .ShanyraqRepository import AdsDB
+from .batcher import write_batcher
+import os
+
+# UserResponse payloads keyed by user id; invalidated by update_user
+user_cache = TTLCache(
+    maxsize=int(os.getenv("USER_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("USER_CACHE_TTL", "300")),
+)
 
 class UserDB(Base):
     __tablename__ = "users"
@@ -27,6 +39,30 @@ class FavoriteDB(Base):
     user = relationship("UserDB", back_populates="favorites")
     ad = relationship("AdsDB", back_populates="favorited_by")
 
+    __table_args__ = (
+        Index("ux_favorites_user_id_shanyrak_id", "user_id", "shanyrak_id", unique=True),
+    )
+
+class FavoriteItem(BaseModel):
+    id: int = Field(alias="_id")
+    address: str
+
+class FavoritesResponse(BaseModel):
+    shanyraks: List[FavoriteItem]
+
+MAX_FAVORITES_BATCH = 500
+
+class FavoritesBatchRequest(BaseModel):
+    ids: List[int]
+
+    @field_validator("ids")
+    def ids_validator(cls, value):
+        if not value:
+            raise ValueError("ids must not be empty")
+        if len(value) > MAX_FAVORITES_BATCH:
+            raise ValueError(f"At most {MAX_FAVORITES_BATCH} ids per request")
+        return value
+
 
 class UserUpdate(BaseModel):
     phone: Optional[str] = None
@@ -91,21 +127,32 @@ class UsersRepository:
     def __init__(self):
         pass
 
-    def create_user(self, db: Session, user: UserRequest):
+    async def create_user(self, db: AsyncSession, user: UserRequest):
         db_user = UserDB(username=user.username, phone=user.phone, password=user.password, name=user.name, city=user.city)
         db.add(db_user)
-        db.commit()
-        db.refresh(db_user)
+        await db.commit()
+        await db.refresh(db_user)
         return db_user
 
-    def get_user_by_username(self, db: Session, username: str):
-        return db.query(UserDB).filter(UserDB.username == username).first()
+    async def get_user_by_username(self, db: AsyncSession, username: str):
+        return await db.scalar(select(UserDB).where(UserDB.username == username))
     
-    def get_user_by_id(self, db: Session, user_id: int):
-        return db.query(UserDB).filter(UserDB.id == user_id).first()
+    async def get_user_by_id(self, db: AsyncSession, user_id: int):
+        return await db.get(UserDB, user_id)
+
+    async def get_user_profile(self, db: AsyncSession, user_id: int):
+        cached = await user_cache.get(user_id)
+        if cached is not None:
+            return UserResponse(**cached)
+        user = await self.get_user_by_id(db, user_id)
+        if user is None:
+            return None
+        profile = UserResponse(id=user.id, username=user.username, phone=user.phone, name=user.name, city=user.city)
+        await user_cache.set(user_id, profile.model_dump())
+        return profile
     
-    def update_user(self, db: Session, user_id: int, phone: Optional[str] = None, name: Optional[str] = None, city: Optional[str] = None):
-        db_user = db.query(UserDB).filter(UserDB.id == user_id).first()
+    async def update_user(self, db: AsyncSession, user_id: int, phone: Optional[str] = None, name: Optional[str] = None, city: Optional[str] = None):
+        db_user = await db.get(UserDB, user_id)
         if db_user is None:
             return None
 
@@ -116,34 +163,57 @@ class UsersRepository:
             db_user.name = validated_data.name
         if validated_data.city is not None:
             db_user.city = validated_data.city
-        db.commit()
-        db.refresh(db_user)
+        await db.commit()
+        await db.refresh(db_user)
+        await user_cache.delete(user_id)
         return db_user
     
-    def add_favorite(self, db: Session, user_id: int, ad_id: int):
-        favorite = db.query(FavoriteDB).filter(FavoriteDB.user_id == user_id, FavoriteDB.shanyrak_id == ad_id).first()
-        if favorite:
-            return
-        new_favorite = FavoriteDB(user_id=user_id, shanyrak_id=ad_id)
-        db.add(new_favorite)
-        db.commit()
-
-    def get_favorites(self, db: Session, user_id: int):
-        favorites = db.query(FavoriteDB).filter(FavoriteDB.user_id == user_id).all()
-        return {
-            "shanyraks": [
-                {"_id": fav.shanyrak_id, "address": fav.ad.address}
-                for fav in favorites if fav.ad
-            ]
-        }
+    @staticmethod
+    def _insert_favorites(dialect: str):
+        insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        return insert(FavoriteDB.__table__)
+
+    async def add_favorite(self, db: AsyncSession, user_id: int, ad_id: int):
+        stmt = self._insert_favorites(db.bind.dialect.name).values(user_id=user_id, shanyrak_id=ad_id)
+        stmt = stmt.on_conflict_do_nothing(index_elements=["user_id", "shanyrak_id"])
+
+        async def write(session: AsyncSession):
+            await session.execute(stmt)
+
+        await write_batcher.run(db, write)
+
+    async def add_favorites(self, db: AsyncSession, user_id: int, ad_ids: List[int]):
+        # ids that don't match an ad are skipped by the select, duplicates by the unique index
+        existing = select(literal(user_id), AdsDB.id).where(AdsDB.id.in_(set(ad_ids)))
+        stmt = self._insert_favorites(db.bind.dialect.name).from_select(["user_id", "shanyrak_id"], existing)
+        result = await db.execute(stmt.on_conflict_do_nothing(index_elements=["user_id", "shanyrak_id"]))
+        await db.commit()
+        return result.rowcount
+
+    async def get_favorites(self, db: AsyncSession, user_id: int):
+        favorites = (await db.execute(
+            select(FavoriteDB.shanyrak_id.label("_id"), AdsDB.address)
+            .join(AdsDB, AdsDB.id == FavoriteDB.shanyrak_id)
+            .where(FavoriteDB.user_id == user_id)
+            .order_by(FavoriteDB.id)
+        )).all()
+        return {"shanyraks": [favorite._asdict() for favorite in favorites]}
     
-    def delete_favorite(self, db: Session, user_id: int, ad_id: int):
-        favorite = db.query(FavoriteDB).filter(FavoriteDB.user_id == user_id, FavoriteDB.shanyrak_id == ad_id).first()
-        if favorite:
-            db.delete(favorite)
-            db.commit()
-            return True
-        return False
+    async def delete_favorite(self, db: AsyncSession, user_id: int, ad_id: int):
+        async def write(session: AsyncSession):
+            result = await session.execute(
+                delete(FavoriteDB).where(FavoriteDB.user_id == user_id, FavoriteDB.shanyrak_id == ad_id)
+            )
+            return result.rowcount > 0
+
+        return await write_batcher.run(db, write)
+
+    async def delete_favorites(self, db: AsyncSession, user_id: int, ad_ids: List[int]):
+        result = await db.execute(
+            delete(FavoriteDB).where(FavoriteDB.user_id == user_id, FavoriteDB.shanyrak_id.in_(set(ad_ids)))
+        )
+        await db.commit()
+        return result.rowcount
 
 
         
@@ -0,0 +1,198 @@
+import os
+
+from .cache import LRUCache
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# off by default; each worker process holds its own copy, so only writes made
+# through this process are seen until the next restart
+AD_INDEX = os.environ.get("AD_INDEX", "0") == "1" and np is not None
+# rows scanned by the first step when walking the filter mask from the newest
+# id down; each further step scans four times as many
+AD_INDEX_CHUNK = int(os.environ.get("AD_INDEX_CHUNK", "4096"))
+# NULL rooms_count / type; int32 keeps the equality masks cheap
+MISSING = -2**31
+
+
+class AdIndex:
+    """In-memory columnar copy of the searchable ad columns.
+
+    Rows are kept sorted by id. price and area are float64 with NaN for NULL
+    so range comparisons drop them the way SQL does; rooms_count and the
+    dictionary-encoded type are int32 with MISSING for NULL. Deletes leave a
+    tombstone in `alive`. search() answers the type / rooms_count / price
+    filters with vectorized masks and returns the page ids newest first plus
+    the total; callers load the page rows.
+    """
+
+    def __init__(self):
+        self.ready = False
+        self.size = 0
+        self.deleted = 0
+        self.types = {}
+        # totals per filter combination, dropped on every write
+        self.totals = LRUCache(maxsize=4096)
+        self._alloc(0)
+
+    def _alloc(self, capacity: int):
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.type = np.full(capacity, MISSING, dtype=np.int32)
+        self.rooms = np.full(capacity, MISSING, dtype=np.int32)
+        self.price = np.full(capacity, np.nan)
+        self.area = np.full(capacity, np.nan)
+
+    def _columns(self):
+        return ("ids", "alive", "type", "rooms", "price", "area")
+
+    def _grow(self, needed: int):
+        capacity = len(self.ids)
+        if needed <= capacity:
+            return
+        capacity = max(needed, capacity * 2, 1024)
+        for name in self._columns():
+            old = getattr(self, name)
+            fill = {"ids": 0, "alive": False, "type": MISSING, "rooms": MISSING}.get(name, np.nan)
+            new = np.full(capacity, fill, dtype=old.dtype)
+            new[:self.size] = old[:self.size]
+            setattr(self, name, new)
+
+    def _type_code(self, ad_type, add: bool = True):
+        if ad_type is None:
+            return MISSING
+        code = self.types.get(ad_type)
+        if code is None and add:
+            code = self.types[ad_type] = len(self.types)
+        return code
+
+    @staticmethod
+    def _rooms(value):
+        return MISSING if value is None else value
+
+    @staticmethod
+    def _number(value):
+        return np.nan if value is None else value
+
+    def load(self, rows):
+        """Replaces the contents with (id, type, rooms_count, price, area) rows sorted by id."""
+        self.types = {}
+        self.size = 0
+        self.deleted = 0
+        self.totals.clear()
+        self._alloc(0)
+        self.add_many(rows)
+        self.ready = True
+
+    def add_many(self, rows):
+        rows = list(rows)
+        if not rows:
+            return
+        rows.sort(key=lambda row: row[0])
+        self.totals.clear()
+        if self.size and rows[0][0] <= self.ids[self.size - 1]:
+            # ids committed out of order (concurrent Postgres inserts): place one by one
+            for row in rows:
+                self.upsert(*row)
+            return
+        start = self.size
+        self._grow(start + len(rows))
+        self.size = start + len(rows)
+        ids, types, rooms, prices, areas = zip(*rows)
+        self.ids[start:self.size] = ids
+        self.alive[start:self.size] = True
+        self.type[start:self.size] = [self._type_code(value) for value in types]
+        self.rooms[start:self.size] = [self._rooms(value) for value in rooms]
+        self.price[start:self.size] = [self._number(value) for value in prices]
+        self.area[start:self.size] = [self._number(value) for value in areas]
+
+    def _position(self, ad_id: int):
+        pos = int(np.searchsorted(self.ids[:self.size], ad_id))
+        found = pos < self.size and self.ids[pos] == ad_id
+        return pos, found
+
+    def upsert(self, ad_id: int, ad_type, rooms_count, price, area):
+        self.totals.clear()
+        pos, found = self._position(ad_id)
+        if not found:
+            self._grow(self.size + 1)
+            if pos < self.size:
+                for name in self._columns():
+                    column = getattr(self, name)
+                    column[pos + 1:self.size + 1] = column[pos:self.size]
+            self.size += 1
+            self.ids[pos] = ad_id
+        elif not self.alive[pos]:
+            self.deleted -= 1
+        self.alive[pos] = True
+        self.type[pos] = self._type_code(ad_type)
+        self.rooms[pos] = self._rooms(rooms_count)
+        self.price[pos] = self._number(price)
+        self.area[pos] = self._number(area)
+
+    def remove(self, ad_id: int):
+        pos, found = self._position(ad_id)
+        if found and self.alive[pos]:
+            self.totals.clear()
+            self.alive[pos] = False
+            self.deleted += 1
+
+    def _mask(self, start: int, end: int, ad_type, rooms_count, price_from, price_until):
+        # same truthiness rules as AdRepository.build_search_query; the
+        # comparisons write into one scratch buffer instead of allocating
+        mask = self.alive[start:end].copy()
+        scratch = np.empty(end - start, dtype=bool)
+        if ad_type:
+            code = self._type_code(ad_type, add=False)
+            if code is None:
+                mask[:] = False
+                return mask
+            mask &= np.equal(self.type[start:end], code, out=scratch)
+        if rooms_count:
+            if not MISSING < rooms_count < 2**31:
+                mask[:] = False
+                return mask
+            mask &= np.equal(self.rooms[start:end], rooms_count, out=scratch)
+        if price_from:
+            mask &= np.greater_equal(self.price[start:end], price_from, out=scratch)
+        if price_until:
+            mask &= np.less_equal(self.price[start:end], price_until, out=scratch)
+        return mask
+
+    def count(self, ad_type=None, rooms_count=None, price_from=None, price_until=None):
+        key = (ad_type, rooms_count, price_from, price_until)
+        total = self.totals.get(key)
+        if total is None:
+            total = int(np.count_nonzero(self._mask(0, self.size, *key)))
+            self.totals.set(key, total)
+        return total
+
+    def search(self, limit: int, offset: int = 0, ad_type=None, rooms_count=None, price_from=None, price_until=None,
+               before_id=None, with_total: bool = True):
+        total = self.count(ad_type, rooms_count, price_from, price_until) if with_total else None
+        end = self.size if before_id is None else int(np.searchsorted(self.ids[:self.size], before_id))
+        # walk down from the newest id in growing chunks until the page is
+        # filled, so a page of a common filter only touches the newest rows
+        need = offset + limit
+        chunk = AD_INDEX_CHUNK
+        found = []
+        while end > 0 and need > 0:
+            start = max(0, end - chunk)
+            positions = np.flatnonzero(self._mask(start, end, ad_type, rooms_count, price_from, price_until))[::-1]
+            found.append(positions[:need] + start)
+            need -= min(need, len(positions))
+            end = start
+            chunk *= 4
+        if not found:
+            return [], total
+        positions = np.concatenate(found)[offset:offset + limit]
+        return self.ids[positions].tolist(), total
+
+    def stats(self):
+        return {"enabled": self.ready, "rows": self.size - self.deleted, "tombstones": self.deleted,
+                "bytes": sum(getattr(self, name).nbytes for name in self._columns())}
+
+
+ad_index = AdIndex() if np is not None else None
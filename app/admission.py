@@ -0,0 +1,150 @@
+import asyncio
+import math
+import os
+import time
+
+from starlette.datastructures import Headers
+from starlette.routing import Match
+
+from .cache import LRUCache
+from .metrics import ADMISSION_IN_FLIGHT, REJECTED
+from .tools import bearer_user_id
+
+# token bucket per user (or per IP for anonymous callers): cost units refilled
+# per second, and the bucket size. RATE_LIMIT_RPS=0 turns rate limiting off
+RATE_LIMIT_RPS = float(os.getenv("RATE_LIMIT_RPS", "0"))
+RATE_LIMIT_BURST = float(os.getenv("RATE_LIMIT_BURST", "60"))
+# use the first X-Forwarded-For hop as the client address (behind a trusted proxy only)
+RATE_LIMIT_TRUST_FORWARDED = os.getenv("RATE_LIMIT_TRUST_FORWARDED", "false").lower() in ("1", "true", "yes")
+# cost units of database work allowed in flight at once; 0 turns shedding off.
+# A request over the limit waits up to ADMISSION_QUEUE_MS for room, then gets a 503
+ADMISSION_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "0"))
+ADMISSION_QUEUE_MS = float(os.getenv("ADMISSION_QUEUE_MS", "50"))
+ADMISSION_RETRY_AFTER = int(os.getenv("ADMISSION_RETRY_AFTER", "1"))
+
+# cost units per route; anything not listed costs 1
+ROUTE_COSTS = {
+    ("GET", "/shanyraks/"): 4,
+    ("GET", "/shanyraks/facets"): 3,
+    ("GET", "/shanyraks/batch"): 2,
+    ("POST", "/shanyraks/batch"): 2,
+    ("GET", "/shanyraks/export"): 20,
+    ("POST", "/shanyraks/bulk"): 20,
+    ("POST", "/auth/users/login"): 2,
+}
+# no database work behind these, and monitoring must keep working under load
+EXEMPT_PATHS = {"/", "/metrics", "/cache/stats", "/docs", "/docs/oauth2-redirect", "/redoc", "/openapi.json"}
+
+
+class TokenBuckets:
+    def __init__(self, rate: float, burst: float, maxsize: int = 100_000):
+        self.rate = rate
+        self.burst = burst
+        # key -> [tokens, monotonic time of the last refill]
+        self.buckets = LRUCache(maxsize=maxsize)
+
+    def take(self, key, cost: float) -> float:
+        """Takes cost tokens and returns 0, or returns the seconds until they are available."""
+        now = time.monotonic()
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = [self.burst, now]
+            self.buckets.set(key, bucket)
+        bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+        bucket[1] = now
+        # a request costing more than the whole bucket still gets through on a full one
+        cost = min(cost, self.burst)
+        if bucket[0] >= cost:
+            bucket[0] -= cost
+            return 0
+        return (cost - bucket[0]) / self.rate
+
+
+class AdmissionMiddleware:
+    """Pure ASGI middleware: per-caller token buckets weighted by route cost,
+    then a cap on the total cost of requests in flight. Buckets and the
+    in-flight count are per process."""
+
+    def __init__(self, app, routes, rate: float = RATE_LIMIT_RPS, burst: float = RATE_LIMIT_BURST,
+                 max_in_flight: int = ADMISSION_MAX_IN_FLIGHT, queue_ms: float = ADMISSION_QUEUE_MS):
+        self.app = app
+        self.routes = routes
+        self.buckets = TokenBuckets(rate, burst) if rate > 0 else None
+        self.max_in_flight = max_in_flight
+        self.queue_timeout = queue_ms / 1000
+        self.in_flight = 0
+        self.released = None
+
+    def _route(self, scope):
+        for route in self.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return route
+        return None
+
+    @staticmethod
+    def _caller(scope, headers):
+        user_id = bearer_user_id(headers.get("authorization"))
+        if user_id is not None:
+            return ("user", user_id)
+        if RATE_LIMIT_TRUST_FORWARDED and "x-forwarded-for" in headers:
+            return ("ip", headers["x-forwarded-for"].split(",")[0].strip())
+        return ("ip", scope["client"][0] if scope.get("client") else None)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in EXEMPT_PATHS or (self.buckets is None and self.max_in_flight <= 0):
+            return await self.app(scope, receive, send)
+        route = self._route(scope)
+        if route is None:
+            return await self.app(scope, receive, send)
+        labels = (scope["method"], route.path)
+        cost = ROUTE_COSTS.get(labels, 1)
+        # the router never sees a rejected request, so set the route it would have
+        # matched: MetricsMiddleware then labels a 429/503 with the route, not "unmatched"
+        scope["route"] = route
+
+        if self.buckets is not None:
+            wait = self.buckets.take(self._caller(scope, Headers(scope=scope)), cost)
+            if wait:
+                REJECTED.inc(labels + ("rate_limited",))
+                return await self._reject(send, 429, "Too many requests", math.ceil(wait))
+
+        if self.max_in_flight <= 0:
+            return await self.app(scope, receive, send)
+        if not await self._admit(cost):
+            REJECTED.inc(labels + ("overloaded",))
+            return await self._reject(send, 503, "Server busy", ADMISSION_RETRY_AFTER)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.in_flight -= cost
+            ADMISSION_IN_FLIGHT.set(self.in_flight)
+            self.released.set()
+
+    async def _admit(self, cost: int) -> bool:
+        if self.released is None:
+            self.released = asyncio.Event()
+        deadline = time.monotonic() + self.queue_timeout
+        # an idle server admits anything, so an expensive request can't starve
+        while self.in_flight and self.in_flight + cost > self.max_in_flight:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                return False
+            self.released.clear()
+            try:
+                await asyncio.wait_for(self.released.wait(), timeout)
+            except asyncio.TimeoutError:
+                return False
+        self.in_flight += cost
+        ADMISSION_IN_FLIGHT.set(self.in_flight)
+        return True
+
+    @staticmethod
+    async def _reject(send, status: int, detail: str, retry_after: int):
+        body = ('{"detail":"%s"}' % detail).encode()
+        await send({"type": "http.response.start", "status": status, "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(max(retry_after, 1)).encode()),
+        ]})
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,158 @@
+import asyncio
+import contextvars
+import logging
+import os
+import time
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from .database import AsyncSessionLocal
+from .metrics import WRITE_BATCH_SIZE, WRITE_QUEUE_WAIT, WRITE_BATCH_RETRIES
+
+logger = logging.getLogger(__name__)
+
+# off by default: every write commits in its own request session
+WRITE_BATCHING = os.getenv("WRITE_BATCHING", "false").lower() in ("1", "true", "yes")
+WRITE_BATCH_MAX_OPS = int(os.getenv("WRITE_BATCH_MAX_OPS", "64"))
+WRITE_BATCH_MAX_DELAY_MS = float(os.getenv("WRITE_BATCH_MAX_DELAY_MS", "5"))
+
+# queued by close() behind the pending writes
+_STOP = object()
+
+
+class WriteBatcher:
+    """Group commit for small writes.
+
+    A write is an async callable taking a session; it must do its checks before
+    writing and must not commit. With batching on, writes from concurrent
+    requests are queued and a single worker runs them in one transaction per
+    batch (up to max_ops writes, or whatever arrived within max_delay of the
+    first one). Callers are resumed only after their batch has committed.
+    """
+
+    def __init__(self, session_factory=AsyncSessionLocal, enabled: bool = WRITE_BATCHING,
+                 max_ops: int = WRITE_BATCH_MAX_OPS, max_delay_ms: float = WRITE_BATCH_MAX_DELAY_MS):
+        self.session_factory = session_factory
+        self.enabled = enabled
+        self.max_ops = max_ops
+        self.max_delay = max_delay_ms / 1000
+        self.loop = None
+        self.queue = None
+        self.worker = None
+
+    async def run(self, db, write):
+        if not self.enabled:
+            result = await write(db)
+            await db.commit()
+            return result
+        # end the request's read transaction first: a request parked on the queue
+        # must not hold a pool connection the worker needs to drain it
+        await db.commit()
+        return await self.submit(write)
+
+    async def submit(self, write):
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop or self.worker is None or self.worker.done():
+            self.loop = loop
+            self.queue = asyncio.Queue()
+            # fresh context: the worker's SQL must not be billed to whichever request started it
+            self.worker = loop.create_task(self._work(), context=contextvars.Context())
+        future = loop.create_future()
+        self.queue.put_nowait((write, future, time.perf_counter()))
+        return await future
+
+    async def close(self):
+        worker = self.worker
+        if worker is None:
+            return
+        if not worker.done():
+            # the marker queues behind every pending write: the worker commits
+            # them, resolves their callers and returns. Cancelling it instead
+            # could interrupt a flush and leave its callers waiting forever
+            self.queue.put_nowait(_STOP)
+            await worker
+        if self.worker is worker:
+            self.worker = None
+
+    async def _work(self):
+        stopping = False
+        while True:
+            # after close() the worker keeps going until the queue is empty, so
+            # writes queued behind the marker still land
+            if stopping and self.queue.empty():
+                return
+            item = await self.queue.get()
+            if item is _STOP:
+                stopping = True
+                continue
+            batch = [item]
+            deadline = self.loop.time() + self.max_delay
+            while len(batch) < self.max_ops:
+                if not self.queue.empty():
+                    item = self.queue.get_nowait()
+                else:
+                    timeout = deadline - self.loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self.queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            try:
+                await self._flush(batch)
+            except Exception as e:
+                logger.exception("write batch of %d failed", len(batch))
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    async def _flush(self, batch):
+        started = time.perf_counter()
+        for _, _, queued_at in batch:
+            WRITE_QUEUE_WAIT.observe(started - queued_at)
+        WRITE_BATCH_SIZE.observe(len(batch))
+
+        outcomes = []
+        async with self.session_factory() as db:
+            try:
+                for write, future, _ in batch:
+                    try:
+                        outcomes.append((future, await write(db), None))
+                    except SQLAlchemyError:
+                        raise
+                    except Exception as e:
+                        # checks like 403/404 fail before anything is written
+                        outcomes.append((future, None, e))
+                await db.commit()
+            except SQLAlchemyError:
+                await db.rollback()
+                outcomes = None
+        if outcomes is None:
+            # one bad write must not sink its neighbours: replay each on its own
+            WRITE_BATCH_RETRIES.inc()
+            outcomes = [await self._run_alone(write, future) for write, future, _ in batch]
+
+        for future, result, error in outcomes:
+            if future.done():
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    async def _run_alone(self, write, future):
+        async with self.session_factory() as db:
+            try:
+                result = await write(db)
+                await db.commit()
+                return future, result, None
+            except Exception as e:
+                await db.rollback()
+                return future, None, e
+
+
+write_batcher = WriteBatcher()
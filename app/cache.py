@@ -0,0 +1,96 @@
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+import time
+
+
+class LRUCache:
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self.evictions = 0
+        self._data = OrderedDict()
+
+    def get(self, key: Hashable, default: Optional[Any] = None):
+        if key not in self._data:
+            return default
+        self._data.move_to_end(key)
+        return self._data[key]
+
+    def set(self, key: Hashable, value: Any):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key: Hashable, default: Optional[Any] = None):
+        return self._data.pop(key, default)
+
+    def items(self):
+        return list(self._data.items())
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class CacheBackend(ABC):
+    """Interface for the read-through caches; a shared backend (Redis, memcached)
+    implements these coroutines and is passed in place of TTLCache."""
+
+    @abstractmethod
+    async def get(self, key: Hashable):
+        ...
+
+    @abstractmethod
+    async def set(self, key: Hashable, value: Any):
+        ...
+
+    @abstractmethod
+    async def delete(self, key: Hashable):
+        ...
+
+    @abstractmethod
+    def stats(self) -> dict:
+        ...
+
+
+class TTLCache(CacheBackend):
+    def __init__(self, maxsize: int = 10000, ttl: float = 60):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self._entries = LRUCache(maxsize=maxsize)
+
+    async def get(self, key: Hashable):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        value, expires_at = entry
+        if expires_at <= time.monotonic():
+            self._entries.pop(key)
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self.hits += 1
+        return value
+
+    async def set(self, key: Hashable, value: Any):
+        self._entries.set(key, (value, time.monotonic() + self.ttl))
+
+    async def delete(self, key: Hashable):
+        self._entries.pop(key)
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "maxsize": self._entries.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self._entries.evictions,
+            "expirations": self.expirations,
+        }
@@ -1,10 +1,99 @@
-from sqlalchemy import create_engine
+import logging
+import os
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from .slowlog import instrument_slow_queries
+
+logger = logging.getLogger(__name__)
+
+SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./sanyraq.db")
+
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+
+# applied to every new SQLite connection; WAL lets readers run alongside the writer
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    "cache_size": int(os.getenv("SQLITE_CACHE_SIZE", "-65536")),
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    "temp_store": os.getenv("SQLITE_TEMP_STORE", "MEMORY"),
+}
+
+POOL_SETTINGS = {
+    "pool_size": int(os.getenv("DB_POOL_SIZE", "10")),
+    "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "20")),
+    "pool_timeout": int(os.getenv("DB_POOL_TIMEOUT", "30")),
+    "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+    "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes"),
+}
+
+
+def async_url(url: str) -> str:
+    parsed = make_url(url)
+    driver = ASYNC_DRIVERS.get(parsed.get_backend_name())
+    if driver is None or "+" in parsed.drivername:
+        return url
+    return parsed.set(drivername=driver).render_as_string(hide_password=False)
+
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./sanyraq.db"
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+
+def engine_options(url: str) -> dict:
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite":
+        options = {"connect_args": {"check_same_thread": False}}
+        if parsed.database and parsed.database != ":memory:":
+            options.update(POOL_SETTINGS, pool_pre_ping=False)
+        return options
+    return dict(POOL_SETTINGS)
+
+
+def make_engine(url: str = SQLALCHEMY_DATABASE_URL, is_async: bool = False):
+    if is_async:
+        url = async_url(url)
+        new_engine = create_async_engine(url, **engine_options(url))
+        sync_engine = new_engine.sync_engine
+    else:
+        new_engine = create_engine(url, **engine_options(url))
+        sync_engine = new_engine
+    if sync_engine.dialect.name == "sqlite":
+        event.listen(sync_engine, "connect", _set_sqlite_pragmas)
+    instrument_slow_queries(sync_engine)
+    return new_engine
+
+
+def log_engine_config(sync_engine):
+    url = sync_engine.url.render_as_string(hide_password=True)
+    if sync_engine.dialect.name == "sqlite":
+        with sync_engine.connect() as conn:
+            effective = {name: conn.exec_driver_sql(f"PRAGMA {name}").scalar() for name in SQLITE_PRAGMAS}
+        logger.info("database %s, sqlite pragmas %s", url, effective)
+    else:
+        logger.info("database %s, pool %s", url, POOL_SETTINGS)
+
+
+# the sync engine is kept for create_all, alembic and maintenance scripts
+engine = make_engine(SQLALCHEMY_DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-Base = declarative_base()
\ No newline at end of file
+# derived from DATABASE_URL unless a separate async driver URL is given
+async_engine = make_engine(os.getenv("ASYNC_DATABASE_URL", SQLALCHEMY_DATABASE_URL), is_async=True)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+# optional read replica for GET routes (see app.replica); reads use the primary when unset
+READ_DATABASE_URL = os.getenv("READ_DATABASE_URL")
+read_engine = make_engine(READ_DATABASE_URL, is_async=True) if READ_DATABASE_URL else None
+# info["replica"] lets repositories tell replica sessions apart
+ReadSessionLocal = async_sessionmaker(read_engine, autoflush=False, expire_on_commit=False, info={"replica": True}) if read_engine else None
+
+Base = declarative_base()
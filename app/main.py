@@ -1,45 +1,116 @@
 from fastapi import FastAPI, Form, Request, HTTPException, Response, Depends, Query
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse
 from fastapi.security import OAuth2PasswordBearer
-from .database import Base, engine, SessionLocal
-from sqlalchemy.orm import Session
-from .UserRepository import UserDB, UserRequest, UserResponse, UsersRepository, UserUpdate
-from .ShanyraqRepository import AdsDB, AdRequest, AdResponse, AdRepository, GetAd, AdUpdateRequest
-from .CommentRepository import CommentRepository, CommentRequest
-from .tools import create_jwt, decode_jwt
-from typing import Optional
+from .database import Base, engine, async_engine, read_engine, AsyncSessionLocal, log_engine_config
+from sqlalchemy.ext.asyncio import AsyncSession
+from .UserRepository import UserDB, UserRequest, UserResponse, UsersRepository, UserUpdate, FavoritesBatchRequest, FavoritesResponse, user_cache
+from .ShanyraqRepository import AdsDB, AdRequest, AdResponse, AdRepository, GetAd, AdUpdateRequest, AdBatchRequest, AdBatchResponse, AdSearchResponse, AdFacetsResponse, MAX_AD_BATCH, MAX_SEARCH_LIMIT, ad_detail_cache
+from .CommentRepository import CommentRepository, CommentRequest, CommentsPage
+from .tools import create_jwt, decode_jwt_cached, bearer_user_id, iter_lines, make_etag, http_date, is_not_modified
+from .responses import fast_json
+from .metrics import MetricsMiddleware, instrument_engine, render_metrics
+from .batcher import write_batcher
+from .adindex import AD_INDEX, ad_index
+from .replica import read_router
+from .admission import AdmissionMiddleware
+from sqlalchemy.exc import InterfaceError, OperationalError
+import jwt
+from typing import Optional, Literal
+import hashlib
+import logging
+import os
+
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"), format="%(levelname)s [%(name)s] %(message)s")
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI()
+# added first so it runs inside MetricsMiddleware: a 429/503 is counted in
+# http_requests_total under its route, with the reason in http_requests_rejected_total
+app.add_middleware(AdmissionMiddleware, routes=app.router.routes)
+app.add_middleware(MetricsMiddleware)
 user_repo = UsersRepository()
 ads_repo = AdRepository()
 com_repo = CommentRepository()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/users/login")
 Base.metadata.create_all(bind=engine)
+log_engine_config(engine)
+instrument_engine(engine)
+instrument_engine(async_engine.sync_engine)
+if read_engine is not None:
+    instrument_engine(read_engine.sync_engine)
 
 
-def get_db():
-    db = SessionLocal()
-    try:
+@app.on_event("startup")
+async def load_ad_index():
+    if not AD_INDEX:
+        return
+    async with AsyncSessionLocal() as db:
+        rows = await ads_repo.load_ad_index(db)
+    logger.info("ad index loaded: %d ads, %d bytes", rows, ad_index.stats()["bytes"])
+
+
+@app.on_event("shutdown")
+async def flush_write_batcher():
+    await write_batcher.close()
+
+
+def request_user_id(request: Request) -> Optional[int]:
+    # the token is optional on public reads; it only routes a user's reads after their own writes
+    return bearer_user_id(request.headers.get("authorization"))
+
+async def get_db(request: Request):
+    if request.method not in ("GET", "HEAD"):
+        read_router.note_write(request_user_id(request))
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
+
+async def get_read_db(request: Request):
+    sessions = await read_router.sessions(request_user_id(request))
+    async with sessions() as db:
+        try:
+            yield db
+        except (OperationalError, InterfaceError) as e:
+            if db.info.get("replica"):
+                read_router.replica_failed(e)
+            raise
+
+async def get_current_user_id(token: str = Depends(oauth2_scheme)) -> int:
+    try:
+        return decode_jwt_cached(token)
+    except jwt.InvalidTokenError:
+        raise HTTPException(status_code=401, detail="Invalid token", headers={"WWW-Authenticate": "Bearer"})
+
+def validators(etag: str, last_modified) -> dict:
+    # no-cache: clients may store the body but must revalidate before reusing it
+    return {"ETag": etag, "Last-Modified": http_date(last_modified), "Cache-Control": "no-cache"}
+
+def ad_validators(ad_id: int, updated_at) -> dict:
+    # updated_at moves on every change to the ad, its comment count included
+    return validators(make_etag(ad_id, updated_at.strftime("%Y%m%d%H%M%S%f")), updated_at)
+
+async def get_current_user(user_id: int = Depends(get_current_user_id), db: AsyncSession = Depends(get_db)) -> UserResponse:
+    user = await user_repo.get_user_profile(db, user_id)
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return user
 
 @app.get("/", tags=["User"])
-def read_root():
+async def read_root():
     return Response("Sanyraq Project", status_code=200)
 
 # Регистрация ------------------------------
 @app.post("/auth/users", responses={400: {"description": "Username already exists"}}, tags=["User"])
-def create_user(input: UserRequest, db: Session = Depends(get_db)):
-    if user_repo.get_user_by_username(db, input.username):
+async def create_user(input: UserRequest, db: AsyncSession = Depends(get_db)):
+    if await user_repo.get_user_by_username(db, input.username):
         raise HTTPException(status_code=400, detail="Username already exists")
-    user = user_repo.create_user(db, UserRequest(username=input.username, phone=input.phone, password=input.password, name=input.name, city=input.city))
+    user = await user_repo.create_user(db, UserRequest(username=input.username, phone=input.phone, password=input.password, name=input.name, city=input.city))
     return Response("OK", status_code=200)
 
 # Авторизация ------------------------------
 @app.post("/auth/users/login", responses={400: {"description": "Invalid username or password"}}, tags=["User"])
-def login_user(username: str = Form(...), password: str = Form(...), db: Session = Depends(get_db)):
-    user = user_repo.get_user_by_username(db, username)
+async def login_user(username: str = Form(...), password: str = Form(...), db: AsyncSession = Depends(get_db)):
+    user = await user_repo.get_user_by_username(db, username)
 
     if user is None or user.password != password:
         raise HTTPException(status_code=400, detail="Invalid username or password")
@@ -48,151 +119,282 @@ def login_user(username: str = Form(...), password: str = Form(...), db: Session
 
 # Изменение данных пользователя -------------
 @app.patch("/auth/users/me", responses={404: {"description": "User not found"}}, tags=["User"])
-def update_user(update_user: UserUpdate, token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    user_id = decode_jwt(token)
-    user = user_repo.get_user_by_id(db, user_id)
-    if user is None:
-        raise HTTPException(status_code=404, detail="User not found")
-    user = user_repo.update_user(db, user_id, phone=update_user.phone, name=update_user.name, city=update_user.city)
+async def update_user(update_user: UserUpdate, current_user: UserResponse = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    user = await user_repo.update_user(db, current_user.id, phone=update_user.phone, name=update_user.name, city=update_user.city)
     return Response("OK", status_code=200)
 
 # Получение данных пользователя -------------
 @app.get("/auth/users/me", response_model=UserResponse, responses={404: {"description": "User not found"}}, tags=["User"])
-def get_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    user_id = decode_jwt(token)
-    user = user_repo.get_user_by_id(db, user_id)
-    if user is None:
-        raise HTTPException(status_code=404, detail="User not found")
-    return user
+async def get_user(current_user: UserResponse = Depends(get_current_user)):
+    return current_user
 
 # Создание объявления -----------------------
 @app.post("/shanyraks/", response_model=AdResponse, tags=["Ad"])
-def create_shanyrak(input: AdRequest, token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    user_id = decode_jwt(token)
-    ad = ads_repo.create_ad(db, input, user_id)
+async def create_shanyrak(input: AdRequest, user_id: int = Depends(get_current_user_id), db: AsyncSession = Depends(get_db)):
+    ad = await ads_repo.create_ad(db, input, user_id)
     return ad
 
+# Выгрузка объявлений (NDJSON / CSV) ---------
+@app.get("/shanyraks/export", responses={400: {"description": "Invalid filter"}}, tags=["Ad"])
+async def export_shanyraks(
+    request: Request,
+    format: Literal["ndjson", "csv"] = "ndjson",
+    ad_type: Optional[str] = None,
+    rooms_count: Optional[int] = None,
+    price_from: Optional[int] = None,
+    price_until: Optional[int] = None,
+    q: Optional[str] = None,
+    bbox: Optional[str] = Query(None, description="min_lon,min_lat,max_lon,max_lat"),
+    near: Optional[str] = Query(None, description="lat,lon"),
+    radius: Optional[float] = Query(None, gt=0, description="meters around near, 1000 by default")
+):
+    try:
+        query, _ = ads_repo.build_search_query(
+            async_engine.dialect.name, ad_type, rooms_count, price_from, price_until, q, bbox, near, radius
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # the request-scoped session is closed before the body is sent, so the
+    # stream owns its own session
+    sessions = await read_router.sessions(request_user_id(request))
+
+    async def stream():
+        async with sessions() as db:
+            async for chunk in ads_repo.export_ads(db, query, format):
+                yield chunk
+
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    headers = {"Content-Disposition": f'attachment; filename="shanyraks.{format}"'}
+    return StreamingResponse(stream(), media_type=media_type, headers=headers)
+
+# Массовая загрузка объявлений (NDJSON / CSV) -
+@app.post("/shanyraks/bulk", responses={400: {"description": "Invalid CSV header"}}, tags=["Ad"])
+async def bulk_create_shanyraks(request: Request, batch_size: int = Query(1000, ge=1, le=10000), user_id: int = Depends(get_current_user_id), db: AsyncSession = Depends(get_db)):
+    content_type = request.headers.get("content-type", "")
+    fmt = "csv" if "csv" in content_type else "ndjson"
+    try:
+        return await ads_repo.import_ads(db, iter_lines(request.stream()), fmt, user_id, batch_size)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# Фасеты поиска (распределения по фильтрам) -
+@app.get("/shanyraks/facets", response_model=AdFacetsResponse, responses={400: {"description": "Invalid filter"}}, tags=["Ad"])
+async def get_shanyraks_facets(
+    db: AsyncSession = Depends(get_read_db),
+    ad_type: Optional[str] = None,
+    rooms_count: Optional[int] = None,
+    price_from: Optional[int] = None,
+    price_until: Optional[int] = None,
+    q: Optional[str] = None,
+    bbox: Optional[str] = Query(None, description="min_lon,min_lat,max_lon,max_lat"),
+    near: Optional[str] = Query(None, description="lat,lon"),
+    radius: Optional[float] = Query(None, gt=0, description="meters around near, 1000 by default")
+):
+    try:
+        return fast_json(await ads_repo.get_facets(db, ad_type, rooms_count, price_from, price_until, q, bbox, near, radius))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# Пакетное получение объявлений -------------
+@app.get("/shanyraks/batch", response_model=AdBatchResponse, responses={400: {"description": "Invalid ids"}}, tags=["Ad"])
+async def get_shanyraks_batch(ids: str = Query(..., description="Comma-separated ad ids"), db: AsyncSession = Depends(get_read_db)):
+    try:
+        input = AdBatchRequest(ids=[int(x) for x in ids.split(",") if x.strip()])
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"ids must be 1 to {MAX_AD_BATCH} comma-separated integers")
+    found, missing = await ads_repo.get_ad_details(db, input.ids)
+    return AdBatchResponse(shanyraks=found, missing=missing)
+
+@app.post("/shanyraks/batch", response_model=AdBatchResponse, tags=["Ad"])
+async def post_shanyraks_batch(input: AdBatchRequest, db: AsyncSession = Depends(get_read_db)):
+    found, missing = await ads_repo.get_ad_details(db, input.ids)
+    return AdBatchResponse(shanyraks=found, missing=missing)
+
 # Получение объявления + Получение объявления - количество комментариев 
-@app.get("/shanyraks/{id}/", response_model=GetAd, responses={404: {"description": "Ad not found"}}, tags=["Ad"])
-def get_shanyrak(id: int, db: Session = Depends(get_db)):
-    ad = ads_repo.get_ad_by_id(db, id)
+@app.get("/shanyraks/{id}/", response_model=GetAd, responses={304: {"description": "Not modified"}, 404: {"description": "Ad not found"}}, tags=["Ad"])
+async def get_shanyrak(id: int, request: Request, response: Response, db: AsyncSession = Depends(get_read_db)):
+    updated_at = None
+    if "if-none-match" in request.headers or "if-modified-since" in request.headers:
+        version = await ads_repo.get_ad_version(db, id)
+        if version is None:
+            raise HTTPException(status_code=404, detail="Ad not found")
+        updated_at = version.updated_at
+        if updated_at is not None:
+            headers = ad_validators(id, updated_at)
+            if is_not_modified(request.headers, headers["ETag"], updated_at):
+                return Response(status_code=304, headers=headers)
+    # the validators below come from the body actually served, and a cached body
+    # older than the version just checked is not served
+    ad = await ads_repo.get_ad_detail(db, id, updated_at)
     if ad is None:
         raise HTTPException(status_code=404, detail="Ad not found")
-    total_comments = com_repo.get_total_comments(db, id)
-
-    return GetAd(
-        id=ad.id,
-        type=ad.type,
-        price=ad.price,
-        address=ad.address,
-        area=ad.area,
-        rooms_count=ad.rooms_count,
-        description=ad.description,
-        user_id=ad.user_id,
-        total_comments=total_comments
-    )
+    if ad.updated_at is not None:
+        response.headers.update(ad_validators(id, ad.updated_at))
+    return ad
 
 # Изменение объявления ----------------------
 @app.patch("/shanyraks/{id}", responses={404: {"description": "Ad not found"}},tags=["Ad"])
-def update_shanyrak(id: int, ad: AdUpdateRequest, token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    user_id = decode_jwt(token)
-    updated_shanyrak = ads_repo.update_ad(db, id, user_id, **ad.model_dump(exclude_unset=True))
+async def update_shanyrak(id: int, ad: AdUpdateRequest, user_id: int = Depends(get_current_user_id), db: AsyncSession = Depends(get_db)):
+    updated_shanyrak = await ads_repo.update_ad(db, id, user_id, **ad.model_dump(exclude_unset=True))
     if not updated_shanyrak:
         raise HTTPException(status_code=404, detail="Ad not found")
     return Response("OK", status_code=200)
 
 # Удаление объявления -----------------------
 @app.delete("/shanyraks/{id}", responses={404: {"description": "Ad not found"}}, tags=["Ad"])
-def delete_shanyrak(id: int, token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    user_id = decode_jwt(token)
-    deleted_shanyrak = ads_repo.delete_ad(db, id, user_id)
+async def delete_shanyrak(id: int, user_id: int = Depends(get_current_user_id), db: AsyncSession = Depends(get_db)):
+    deleted_shanyrak = await ads_repo.delete_ad(db, id, user_id)
     if not deleted_shanyrak:
         raise HTTPException(status_code=404, detail="Ad not found")
     return Response("OK", status_code=200)
 
 # Добавление комментария к объявлению -------
 @app.post("/shanyraks/{shanyrak_id}/comments", responses={404: {"description": "Ad not found"}}, tags=["Comments"])
-def add_comment(shanyrak_id: int, comment: CommentRequest, token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    user_id = decode_jwt(token)
-    if not ads_repo.get_ad_by_id(db, shanyrak_id):
+async def add_comment(shanyrak_id: int, comment: CommentRequest, user_id: int = Depends(get_current_user_id), db: AsyncSession = Depends(get_db)):
+    if not await ads_repo.get_ad_by_id(db, shanyrak_id):
         raise HTTPException(status_code=404, detail="Ad not found")
-    com_repo.add_comment(db, user_id, shanyrak_id, comment.content)
+    await com_repo.add_comment(db, user_id, shanyrak_id, comment.content)
     return Response("OK", status_code=200)
 
 # Получение списка комментариев объявления ---
-@app.get("/shanyraks/{shanyrak_id}/comments", tags=["Comments"])
-def get_comments(shanyrak_id: int, db: Session = Depends(get_db)):
-    return com_repo.get_all_comments(db, shanyrak_id)
+@app.get("/shanyraks/{shanyrak_id}/comments", response_model=CommentsPage, responses={304: {"description": "Not modified"}, 400: {"description": "Invalid cursor"}}, tags=["Comments"])
+async def get_comments(
+    shanyrak_id: int,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_read_db),
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    order: Literal["asc", "desc"] = "asc"
+):
+    headers = {}
+    version = await ads_repo.get_ad_version(db, shanyrak_id)
+    if version is not None and version.updated_at is not None:
+        # one tag per page: the thread version plus the paging parameters
+        page = hashlib.sha1(str(request.query_params).encode()).hexdigest()[:8]
+        headers = validators(make_etag(shanyrak_id, version.comments_version, page), version.updated_at)
+        if is_not_modified(request.headers, headers["ETag"], version.updated_at):
+            return Response(status_code=304, headers=headers)
+    try:
+        result = fast_json(await com_repo.get_all_comments(db, shanyrak_id, limit, before, after, order))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if isinstance(result, Response):
+        result.headers.update(headers)
+    else:
+        response.headers.update(headers)
+    return result
 
 # Изменение текста комментария ---------------
 @app.patch("/shanyraks/{shanyrak_id}/comments/{comment_id}", responses={404: {"description": "Ad not found"}}, tags=["Comments"])
-def update_comment(shanyrak_id: int, comment: CommentRequest, comment_id: int, token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    user_id = decode_jwt(token)
-    shanyrak = ads_repo.get_ad_by_id(db, shanyrak_id)
+async def update_comment(shanyrak_id: int, comment: CommentRequest, comment_id: int, user_id: int = Depends(get_current_user_id), db: AsyncSession = Depends(get_db)):
+    shanyrak = await ads_repo.get_ad_by_id(db, shanyrak_id)
     if not shanyrak:
         raise HTTPException(status_code=404, detail="Ad not found")
-    updated_comment = com_repo.update_comment(db, comment_id, user_id, **comment.model_dump(exclude_unset=True))
+    updated_comment = await com_repo.update_comment(db, comment_id, user_id, **comment.model_dump(exclude_unset=True))
     if not updated_comment:
         raise HTTPException(status_code=404, detail="Comment not found")
     return Response("OK", status_code=200)
 
 # Удаление комментария -----------------------
 @app.delete("/shanyraks/{shanyrak_id}/comments/{comment_id}", responses={404: {"description": "Ad not found"}}, tags=["Comments"])
-def delete_comment(shanyrak_id: int, comment_id: int, token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    user_id = decode_jwt(token)
-
-    shanyrak = ads_repo.get_ad_by_id(db, shanyrak_id)
+async def delete_comment(shanyrak_id: int, comment_id: int, user_id: int = Depends(get_current_user_id), db: AsyncSession = Depends(get_db)):
+    shanyrak = await ads_repo.get_ad_by_id(db, shanyrak_id)
     if not shanyrak:
         raise HTTPException(status_code=404, detail="Ad not found")
-    deleted_comment = com_repo.delete_comment(db, comment_id, user_id)
+    deleted_comment = await com_repo.delete_comment(db, comment_id, user_id)
     if not deleted_comment:
         raise HTTPException(status_code=404, detail="Comment not found")
     return Response("OK", status_code=200)
 
 # Добавление объявления в избранное ---------
 @app.post("/auth/users/favorites/{shanyrak_id}", responses={404: {"description": "Ad not found"}}, tags=["Favorites"])
-def add_favorite(shanyrak_id: int, token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    user_id = decode_jwt(token)
-    if not ads_repo.get_ad_by_id(db, shanyrak_id):
+async def add_favorite(shanyrak_id: int, user_id: int = Depends(get_current_user_id), db: AsyncSession = Depends(get_db)):
+    if not await ads_repo.get_ad_by_id(db, shanyrak_id):
         raise HTTPException(status_code=404, detail="Ad not found")
-    user_repo.add_favorite(db, user_id, shanyrak_id)
+    await user_repo.add_favorite(db, user_id, shanyrak_id)
     return Response("OK", status_code=200)
 
 # Получение списка избранных ----------------
-@app.get("/auth/users/favorites", tags=["Favorites"])
-def get_favorites(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    user_id = decode_jwt(token)
-    return user_repo.get_favorites(db, user_id)
+@app.get("/auth/users/favorites", response_model=FavoritesResponse, tags=["Favorites"])
+async def get_favorites(user_id: int = Depends(get_current_user_id), db: AsyncSession = Depends(get_read_db)):
+    return fast_json(await user_repo.get_favorites(db, user_id))
 
 # Удаление из избранного --------------------
 @app.delete("/auth/users/favorites/{shanyrak_id}", responses={404: {"description": "Ad not found"}}, tags=["Favorites"])
-def delete_favorites(shanyrak_id: int, token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    user_id = decode_jwt(token)
-    if not ads_repo.get_ad_by_id(db, shanyrak_id):
+async def delete_favorites(shanyrak_id: int, user_id: int = Depends(get_current_user_id), db: AsyncSession = Depends(get_db)):
+    if not await ads_repo.get_ad_by_id(db, shanyrak_id):
         raise HTTPException(status_code=404, detail="Ad not found")
-    user_repo.delete_favorite(db, user_id, shanyrak_id)
+    await user_repo.delete_favorite(db, user_id, shanyrak_id)
     return Response("OK", status_code=200)
 
+# Пакетное добавление в избранное -----------
+@app.post("/auth/users/favorites", tags=["Favorites"])
+async def add_favorites(input: FavoritesBatchRequest, user_id: int = Depends(get_current_user_id), db: AsyncSession = Depends(get_db)):
+    added = await user_repo.add_favorites(db, user_id, input.ids)
+    return {"added": added}
+
+# Пакетное удаление из избранного -----------
+@app.delete("/auth/users/favorites", tags=["Favorites"])
+async def delete_favorites_batch(input: FavoritesBatchRequest, user_id: int = Depends(get_current_user_id), db: AsyncSession = Depends(get_db)):
+    deleted = await user_repo.delete_favorites(db, user_id, input.ids)
+    return {"deleted": deleted}
+
+# Статистика кэша --------------------------
+@app.get("/cache/stats", tags=["Service"])
+async def cache_stats():
+    return {
+        "ad_detail": ad_detail_cache.stats(),
+        "users": user_cache.stats(),
+        "ad_counts": {"size": len(ads_repo.count_cache), "evictions": ads_repo.count_cache.evictions},
+        "ad_index": ad_index.stats() if ad_index is not None else {"enabled": False},
+    }
+
+# Метрики (Prometheus) ---------------------
+@app.get("/metrics", response_class=PlainTextResponse, tags=["Service"])
+async def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 # Получение объявлений с поиском и пагинацией - 
-@app.get("/shanyraks/", tags=["Ad"])
-def search_shanyraks(
-    db: Session = Depends(get_db),
-    limit: int = Query(10, ge=1),
+@app.get("/shanyraks/", response_model=AdSearchResponse, tags=["Ad"])
+async def search_shanyraks(
+    db: AsyncSession = Depends(get_read_db),
+    limit: int = Query(10, ge=1, le=MAX_SEARCH_LIMIT),
     offset: int = Query(0, ge=0),
     ad_type: Optional[str] = None,
     rooms_count: Optional[int] = None,
     price_from: Optional[int] = None,
-    price_until: Optional[int] = None
+    price_until: Optional[int] = None,
+    cursor: Optional[str] = None,
+    count: Literal["exact", "approx", "none"] = "exact",
+    q: Optional[str] = None,
+    bbox: Optional[str] = Query(None, description="min_lon,min_lat,max_lon,max_lat"),
+    near: Optional[str] = Query(None, description="lat,lon"),
+    radius: Optional[float] = Query(None, gt=0, description="meters around near, 1000 by default"),
+    sort: Literal["newest", "price", "-price", "area", "-area", "price_per_sqm"] = "newest"
 ):
-    print("DEBUG:", db, limit, offset, ad_type, rooms_count, price_from, price_until)
-    return ads_repo.search_shanyrak(
-        db,
-        limit,
-        offset,
-        ad_type,
-        rooms_count,
-        price_from,
-        price_until)
+    logger.debug("search limit=%s offset=%s ad_type=%s rooms_count=%s price_from=%s price_until=%s cursor=%s count=%s q=%s bbox=%s near=%s radius=%s sort=%s",
+                 limit, offset, ad_type, rooms_count, price_from, price_until, cursor, count, q, bbox, near, radius, sort)
+    try:
+        return fast_json(await ads_repo.search_shanyrak(
+            db,
+            limit,
+            offset,
+            ad_type,
+            rooms_count,
+            price_from,
+            price_until,
+            cursor,
+            count,
+            q,
+            bbox,
+            near,
+            radius,
+            sort))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 
@@ -0,0 +1,203 @@
+import logging
+import os
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from threading import Lock
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100)
+# requests issuing more queries than this are logged and counted, which is
+# how N+1 loops show up
+QUERY_WARN_THRESHOLD = int(os.getenv("METRICS_QUERY_THRESHOLD", "10"))
+
+# [queries, db seconds, asgi scope] of the request being served; None outside requests
+_request_sql: ContextVar = ContextVar("request_sql", default=None)
+
+
+def current_route():
+    """(method, route template) of the request being served, or None."""
+    stats = _request_sql.get()
+    if stats is None:
+        return None
+    route = stats[2].get("route")
+    return stats[2]["method"], route.path if route is not None else stats[2]["path"]
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values = {}
+        self.lock = Lock()
+
+    def inc(self, labels=(), amount: float = 1):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self, kind: str = "counter"):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {kind}"]
+        for labels, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{_labels(self.labels, labels)} {_number(value)}")
+        return lines
+
+
+class Gauge(Counter):
+    def set(self, value: float, labels=()):
+        with self.lock:
+            self.values[labels] = value
+
+    def render(self, kind: str = "gauge"):
+        return super().render(kind)
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        # labels -> [per-bucket counts (+Inf last), sum, count]
+        self.values = {}
+        self.lock = Lock()
+
+    def observe(self, value: float, labels=()):
+        with self.lock:
+            series = self.values.get(labels)
+            if series is None:
+                series = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total, count) in sorted(self.values.items()):
+            cumulative = 0
+            for bound, bucket in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket
+                le = "+Inf" if bound == float("inf") else _number(bound)
+                lines.append(f"{self.name}_bucket{_labels(self.labels + ('le',), labels + (le,))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labels, labels)} {count}")
+        return lines
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+REQUESTS = Counter("http_requests_total", "HTTP requests by route and status code", ("method", "route", "status"))
+REQUEST_LATENCY = Histogram("http_request_duration_seconds", "HTTP request latency", ("method", "route"))
+IN_FLIGHT = Gauge("http_requests_in_progress", "HTTP requests currently being served")
+REQUEST_QUERIES = Histogram("http_request_db_queries", "SQL statements issued per request", ("method", "route"), QUERY_COUNT_BUCKETS)
+REQUEST_DB_TIME = Histogram("http_request_db_seconds", "Time spent in SQL per request", ("method", "route"))
+QUERY_HEAVY = Counter("http_requests_query_heavy_total", f"Requests issuing more than {QUERY_WARN_THRESHOLD} SQL statements", ("method", "route"))
+DB_QUERIES = Counter("db_queries_total", "SQL statements executed")
+DB_TIME = Counter("db_query_seconds_total", "Time spent executing SQL statements")
+
+WRITE_BATCH_SIZE = Histogram("write_batch_size", "Writes committed per group-commit batch", buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256))
+WRITE_QUEUE_WAIT = Histogram("write_queue_wait_seconds", "Time a write waited in the group-commit queue before its batch started")
+WRITE_BATCH_RETRIES = Counter("write_batch_retries_total", "Batches rolled back and replayed one write per transaction")
+
+READ_SESSIONS = Counter("db_read_sessions_total", "Read-only request sessions by target database and routing reason", ("target", "reason"))
+REPLICA_LAG = Gauge("db_replica_lag_seconds", "Replication lag measured by the last replica probe")
+REPLICA_UP = Gauge("db_replica_up", "1 if the last replica probe succeeded within the lag limit")
+
+REJECTED = Counter("http_requests_rejected_total", "Requests turned away by admission control", ("method", "route", "reason"))
+ADMISSION_IN_FLIGHT = Gauge("admission_in_flight_cost", "Cost units of admitted requests currently in flight")
+
+REGISTRY = (REQUESTS, REQUEST_LATENCY, IN_FLIGHT, REQUEST_QUERIES, REQUEST_DB_TIME, QUERY_HEAVY, DB_QUERIES, DB_TIME,
+            WRITE_BATCH_SIZE, WRITE_QUEUE_WAIT, WRITE_BATCH_RETRIES, READ_SESSIONS, REPLICA_LAG, REPLICA_UP,
+            REJECTED, ADMISSION_IN_FLIGHT)
+
+
+def render_metrics() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # the slow-query log's own EXPLAIN statements are not the request's work
+    if conn.info.get("explaining") or context is None:
+        return
+    # kept on the statement's execution context rather than a per-connection
+    # stack: a statement that raises never reaches after_cursor_execute
+    context._metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_metrics_started", None)
+    if started is None or conn.info.get("explaining"):
+        return
+    elapsed = time.perf_counter() - started
+    DB_QUERIES.inc()
+    DB_TIME.inc(amount=elapsed)
+    stats = _request_sql.get()
+    if stats is not None:
+        stats[0] += 1
+        stats[1] += elapsed
+
+
+def instrument_engine(sync_engine):
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware, so the request body and streaming responses pass
+    through untouched and the SQL counters share the request's context."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = 500
+        stats = [0, 0.0, scope]
+        token = _request_sql.set(stats)
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        IN_FLIGHT.inc(amount=1)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            IN_FLIGHT.inc(amount=-1)
+            _request_sql.reset(token)
+            # label by route template, not the raw path, to keep cardinality bounded
+            route = scope.get("route")
+            labels = (scope["method"], route.path if route is not None else "unmatched")
+            REQUESTS.inc(labels + (str(status),))
+            REQUEST_LATENCY.observe(elapsed, labels)
+            REQUEST_QUERIES.observe(stats[0], labels)
+            REQUEST_DB_TIME.observe(stats[1], labels)
+            if stats[0] > QUERY_WARN_THRESHOLD:
+                QUERY_HEAVY.inc(labels)
+                logger.warning("%s %s issued %d SQL statements (%.1f ms in db)", labels[0], scope["path"], stats[0], stats[1] * 1000)
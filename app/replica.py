@@ -0,0 +1,111 @@
+import asyncio
+import logging
+import os
+import time
+
+from sqlalchemy import text
+
+from .cache import LRUCache
+from .database import AsyncSessionLocal, ReadSessionLocal, read_engine
+from .metrics import READ_SESSIONS, REPLICA_LAG, REPLICA_UP
+
+logger = logging.getLogger(__name__)
+
+# a user's reads stay on the primary this long after their own write
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+# reads fall back to the primary while the replica is further behind than this
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "10"))
+REPLICA_CHECK_INTERVAL = float(os.getenv("REPLICA_CHECK_INTERVAL", "5"))
+REPLICA_PROBE_TIMEOUT = float(os.getenv("REPLICA_PROBE_TIMEOUT", "1"))
+
+# seconds of replay lag; 0 when the standby has replayed everything it received,
+# so an idle primary doesn't read as lag. SQLite has no replication to ask about:
+# the probe only checks that the replica file answers and has the schema
+LAG_SQL = {
+    "postgresql": (
+        "SELECT CASE WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+        "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+    ),
+}
+
+
+class ReadRouter:
+    """Chooses the session factory for read-only requests.
+
+    Reads go to the replica unless there is none, the user wrote within
+    READ_YOUR_WRITES_SECONDS (tracked per process), or the last probe found
+    the replica down or lagging. The probe runs at most every check_interval,
+    inline with the request that finds the result stale.
+    """
+
+    def __init__(self, primary=AsyncSessionLocal, replica=ReadSessionLocal, replica_engine=read_engine,
+                 window: float = READ_YOUR_WRITES_SECONDS, max_lag: float = REPLICA_MAX_LAG_SECONDS,
+                 check_interval: float = REPLICA_CHECK_INTERVAL):
+        self.primary = primary
+        self.replica = replica
+        self.replica_engine = replica_engine
+        self.window = window
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.recent_writes = LRUCache(maxsize=100_000)
+        self.state = "ok"
+        self.checked_at = None
+        self.probing = False
+
+    def note_write(self, user_id):
+        if user_id is not None and self.replica is not None:
+            self.recent_writes.set(user_id, time.monotonic())
+
+    def replica_failed(self, error):
+        # reads stay on the primary until the next probe says otherwise
+        logger.warning("read replica failed, falling back to the primary: %s", error)
+        self.state = "replica_down"
+        self.checked_at = time.monotonic()
+        REPLICA_UP.set(0)
+
+    async def sessions(self, user_id=None):
+        if self.replica is None:
+            return self._route(self.primary, "primary", "no_replica")
+        if user_id is not None:
+            wrote_at = self.recent_writes.get(user_id)
+            if wrote_at is not None and time.monotonic() - wrote_at < self.window:
+                return self._route(self.primary, "primary", "recent_write")
+        if self.checked_at is None or time.monotonic() - self.checked_at >= self.check_interval:
+            await self._check()
+        if self.state != "ok":
+            return self._route(self.primary, "primary", self.state)
+        return self._route(self.replica, "replica", "ok")
+
+    @staticmethod
+    def _route(factory, target: str, reason: str):
+        READ_SESSIONS.inc((target, reason))
+        return factory
+
+    async def _check(self):
+        if self.probing:
+            return
+        self.probing = True
+        try:
+            lag = await asyncio.wait_for(self._probe(), REPLICA_PROBE_TIMEOUT)
+        except Exception as e:
+            if self.state != "replica_down":
+                logger.warning("read replica unavailable, reading from the primary: %s", e)
+            self.state = "replica_down"
+        else:
+            REPLICA_LAG.set(lag)
+            state = "replica_lag" if lag > self.max_lag else "ok"
+            if state != self.state:
+                logger.warning("read replica %s (lag %.1f s)", "back in use" if state == "ok" else "lagging, reading from the primary", lag)
+            self.state = state
+        finally:
+            REPLICA_UP.set(1 if self.state == "ok" else 0)
+            self.checked_at = time.monotonic()
+            self.probing = False
+
+    async def _probe(self) -> float:
+        async with self.replica_engine.connect() as conn:
+            lag = await conn.scalar(text(LAG_SQL.get(conn.dialect.name, "SELECT 0 FROM ads LIMIT 1")))
+        return float(lag or 0)
+
+
+read_router = ReadRouter()
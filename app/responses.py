@@ -0,0 +1,36 @@
+import json
+import os
+from datetime import date, datetime
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# list endpoints return FastJSONResponse directly when enabled, which skips
+# response_model validation and jsonable_encoder
+FAST_JSON = os.environ.get("FAST_JSON", "1" if orjson else "0") == "1"
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class FastJSONResponse(JSONResponse):
+    """Renders plain dicts/lists of JSON-native values (datetimes allowed) with orjson,
+    or compact stdlib json when orjson isn't installed."""
+
+    def render(self, content) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(content)
+        return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+
+def fast_json(content):
+    if FAST_JSON:
+        return FastJSONResponse(content)
+    return content
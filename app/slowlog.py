@@ -0,0 +1,131 @@
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import time
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler
+
+from sqlalchemy import event
+
+from .cache import LRUCache
+from .metrics import current_route
+
+# statements slower than this are written to the slow-query log; negative disables it
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+SLOW_QUERY_LOG = os.getenv("SLOW_QUERY_LOG", "slow_queries.log")
+SLOW_QUERY_LOG_MAX_BYTES = int(os.getenv("SLOW_QUERY_LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+SLOW_QUERY_LOG_BACKUPS = int(os.getenv("SLOW_QUERY_LOG_BACKUPS", "5"))
+# the first slow run of a statement is always explained, later ones at this rate
+SLOW_QUERY_EXPLAIN_SAMPLE = float(os.getenv("SLOW_QUERY_EXPLAIN_SAMPLE", "0.05"))
+
+slow_logger = logging.getLogger("sanyraq.slow_queries")
+explained = LRUCache(maxsize=1024)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"\$\d+|%\(\w+\)s|%s|(?<!:):\w+")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE = re.compile(r"\s+")
+
+
+def normalize_sql(statement: str) -> str:
+    sql = _STRING.sub("?", statement)
+    sql = _PLACEHOLDER.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    # IN lists of different lengths are the same statement
+    sql = _IN_LIST.sub("(?, ...)", sql)
+    return _SPACE.sub(" ", sql).strip()
+
+
+def fingerprint(sql: str) -> str:
+    return hashlib.sha1(sql.encode("utf-8")).hexdigest()[:12]
+
+
+def parameter_shape(parameters, executemany: bool):
+    # types only, never values: the log must not leak user data
+    if executemany:
+        rows = list(parameters or ())
+        return {"executemany": len(rows), "row": parameter_shape(rows[0], False) if rows else None}
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    return [type(value).__name__ for value in parameters or ()]
+
+
+def _explain(conn, statement: str, parameters):
+    if conn.dialect.name == "postgresql":
+        prefix = "EXPLAIN (ANALYZE, BUFFERS) "
+    elif conn.dialect.name == "sqlite":
+        prefix = "EXPLAIN QUERY PLAN "
+    else:
+        prefix = "EXPLAIN "
+    # a savepoint keeps a failing EXPLAIN from aborting the caller's transaction
+    conn.info["explaining"] = True
+    try:
+        conn.exec_driver_sql("SAVEPOINT slow_query_explain")
+        try:
+            rows = conn.exec_driver_sql(prefix + statement, parameters).all()
+        except Exception as e:
+            conn.exec_driver_sql("ROLLBACK TO SAVEPOINT slow_query_explain")
+            return [f"explain failed: {e}"]
+        finally:
+            conn.exec_driver_sql("RELEASE SAVEPOINT slow_query_explain")
+    except Exception as e:
+        return [f"explain failed: {e}"]
+    finally:
+        conn.info["explaining"] = False
+    return [" ".join(str(value) for value in row) for row in rows]
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # per execution context, like app.metrics; _explain runs in a context of its own
+    if context is not None:
+        context._slow_query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_slow_query_started", None)
+    if started is None:
+        return
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    if elapsed_ms < SLOW_QUERY_MS or conn.info.get("explaining"):
+        return
+    sql = normalize_sql(statement)
+    key = fingerprint(sql)
+    route = current_route()
+    record = {
+        "ts": datetime.now(timezone.utc).isoformat(),
+        "duration_ms": round(elapsed_ms, 2),
+        "fingerprint": key,
+        "sql": sql,
+        "params": parameter_shape(parameters, executemany),
+        "route": " ".join(route) if route else None,
+    }
+    # only reads are explained: EXPLAIN ANALYZE runs the statement again. Streamed
+    # results still hold the connection's cursor, so those are skipped too
+    streaming = context is not None and context.execution_options.get("stream_results")
+    if not executemany and not streaming and sql.split(" ", 1)[0].upper() in ("SELECT", "WITH"):
+        if explained.get(key) is None or random.random() < SLOW_QUERY_EXPLAIN_SAMPLE:
+            explained.set(key, True)
+            record["plan"] = _explain(conn, statement, parameters)
+    slow_logger.warning(json.dumps(record))
+
+
+def configure_slow_log():
+    if slow_logger.handlers:
+        return
+    handler = RotatingFileHandler(SLOW_QUERY_LOG, maxBytes=SLOW_QUERY_LOG_MAX_BYTES, backupCount=SLOW_QUERY_LOG_BACKUPS, delay=True)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    slow_logger.addHandler(handler)
+    slow_logger.setLevel(logging.WARNING)
+    slow_logger.propagate = False
+
+
+def instrument_slow_queries(sync_engine):
+    if SLOW_QUERY_MS < 0:
+        return
+    configure_slow_log()
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
@@ -1,4 +1,18 @@
 import jwt 
+import base64
+import codecs
+import csv
+import hashlib
+import json
+import os
+import time
+from collections import deque
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from .cache import LRUCache
+
+# verified tokens: sha256(token) -> (user_id, exp or None)
+token_cache = LRUCache(maxsize=int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "10000")))
 
 def create_jwt(user_id: int) -> str:
     body = {"user_id": user_id}
@@ -8,3 +22,111 @@ def create_jwt(user_id: int) -> str:
 def decode_jwt(token: str) -> int:
     data = jwt.decode(token, "jeangoujan", algorithms=["HS256"])
     return data["user_id"]
+
+def decode_jwt_cached(token: str) -> int:
+    key = hashlib.sha256(token.encode()).digest()
+    cached = token_cache.get(key)
+    if cached is not None:
+        user_id, exp = cached
+        if exp is None or exp > time.time():
+            return user_id
+        token_cache.pop(key)
+    data = jwt.decode(token, "jeangoujan", algorithms=["HS256"])
+    token_cache.set(key, (data["user_id"], data.get("exp")))
+    return data["user_id"]
+
+def bearer_user_id(authorization: str):
+    # optional auth: a missing or invalid token just means an anonymous caller
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        return decode_jwt_cached(token)
+    except jwt.InvalidTokenError:
+        return None
+
+def encode_cursor(value) -> str:
+    raw = json.dumps(value, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        return json.loads(raw)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid cursor")
+
+async def iter_lines(chunks):
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending.rstrip("\r")
+
+class _LineFeed:
+    # the csv reader pulls physical lines from here; it is only asked for a
+    # record once the queued lines close every quoted field
+    def __init__(self):
+        self.lines = deque()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if not self.lines:
+            raise StopIteration
+        return self.lines.popleft()
+
+async def iter_csv_records(lines):
+    """Yields CSV records from an async stream of lines, with quoted fields
+    allowed to span lines. Blank records are skipped."""
+    feed = _LineFeed()
+    reader = csv.reader(feed)
+    quotes = 0
+    async for line in lines:
+        feed.lines.append(line + "\n")
+        # "" inside a quoted field adds two, so odd means a field is still open
+        quotes += line.count('"')
+        if quotes % 2:
+            continue
+        quotes = 0
+        record = next(reader, None)
+        if record:
+            yield record
+    if feed.lines:
+        # unterminated quote: the reader returns what it has at end of input
+        record = next(reader, None)
+        if record:
+            yield record
+
+def utcnow() -> datetime:
+    # naive UTC, the form DateTime columns store on both SQLite and Postgres
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def make_etag(*parts) -> str:
+    return '"' + "-".join(str(part) for part in parts) + '"'
+
+def http_date(value: datetime) -> str:
+    return format_datetime(value.replace(tzinfo=timezone.utc), usegmt=True)
+
+def is_not_modified(headers, etag: str, last_modified: datetime = None) -> bool:
+    # If-None-Match wins over If-Modified-Since when both are sent (RFC 9110 13.2.2)
+    if_none_match = headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags or f"W/{etag}" in tags
+    if_modified_since = headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        return last_modified.replace(tzinfo=timezone.utc, microsecond=0) <= since
+    return False
@@ -0,0 +1,112 @@
+# Filtered search through the in-memory columnar index (app.adindex) against
+# the SQL path, on the same seeded database.
+#
+# Run from the project root (needs numpy):
+#   python -m benchmarks.ad_index --ads 1000000
+#   python -m benchmarks.ad_index --reuse          # keep the last generated database
+#
+# Both paths go through AdRepository.search_shanyrak with an exact total, and
+# the count cache is cleared before every SQL call so each one pays for its
+# COUNT like a cold filter combination would.
+import argparse
+import asyncio
+import logging
+import os
+import tempfile
+import time
+
+from benchmarks.datagen import generate
+from benchmarks.load import percentile
+
+BENCH_DB = os.path.join(tempfile.gettempdir(), "sanyraq_index_bench.db")
+
+CASES = (
+    ("newest page", {}),
+    ("type", {"ad_type": "rent"}),
+    ("type + rooms", {"ad_type": "sell", "rooms_count": 2}),
+    ("price range", {"price_from": 20_000_000, "price_until": 40_000_000}),
+    ("all filters", {"ad_type": "rent", "rooms_count": 3, "price_from": 150_000, "price_until": 400_000}),
+    ("rare match", {"ad_type": "sell", "rooms_count": 5, "price_from": 95_000_000}),
+)
+
+
+async def timed(call, repeat: int):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await call()
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+async def run(repeat: int):
+    from app.ShanyraqRepository import AdRepository
+    from app.CommentRepository import CommentDB
+    from app.UserRepository import UserDB
+    from app.database import AsyncSessionLocal, async_engine
+    from app.adindex import ad_index
+
+    repo = AdRepository()
+    async with AsyncSessionLocal() as db:
+        started = time.perf_counter()
+        rows = await repo.load_ad_index(db)
+        stats = ad_index.stats()
+        print(f"index: {rows} ads, {stats['bytes'] / 2**20:.1f} MiB, loaded in {time.perf_counter() - started:.1f} s")
+        print(f"{'case':>14}  {'sql p50':>9} {'sql p95':>9}  {'index p50':>9} {'index p95':>9}  speedup")
+
+        for name, filters in CASES:
+            async def sql():
+                repo.count_cache.clear()
+                return await repo.search_shanyrak(db, 20, 0, **filters)
+
+            async def index():
+                return await repo.search_shanyrak(db, 20, 0, **filters)
+
+            ad_index.ready = False
+            expected = await sql()
+            sql_ms = await timed(sql, repeat)
+            ad_index.ready = True
+            assert await index() == expected, f"{name}: index and SQL results differ"
+            index_ms = await timed(index, repeat)
+            print(f"{name:>14}  {percentile(sql_ms, 50):7.2f}ms {percentile(sql_ms, 95):7.2f}ms  "
+                  f"{percentile(index_ms, 50):7.2f}ms {percentile(index_ms, 95):7.2f}ms  "
+                  f"{percentile(sql_ms, 50) / percentile(index_ms, 50):6.1f}x")
+
+        # the index alone, without loading the page rows from the database;
+        # "cold" recounts the total, "warm" takes it from the index's cache
+        print("filter + page ids only (no hydration):")
+        print(f"{'case':>14}  {'cold p50':>9} {'cold p95':>9}  {'warm p50':>9} {'warm p95':>9}")
+        for name, filters in CASES:
+            results = []
+            for cold in (True, False):
+                samples = []
+                for _ in range(repeat):
+                    if cold:
+                        ad_index.totals.clear()
+                    started = time.perf_counter()
+                    ad_index.search(20, 0, **filters)
+                    samples.append((time.perf_counter() - started) * 1000)
+                results += [percentile(samples, 50), percentile(samples, 95)]
+            print(f"{name:>14}  " + "  ".join(f"{a:7.3f}ms {b:7.3f}ms" for a, b in zip(results[::2], results[1::2])))
+    await async_engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="columnar ad index vs SQL search")
+    parser.add_argument("--ads", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=5)
+    parser.add_argument("--reuse", action="store_true", help="skip generation if the database exists")
+    args = parser.parse_args()
+
+    url = f"sqlite:///{BENCH_DB}"
+    os.environ["DATABASE_URL"] = url
+    os.environ.setdefault("SLOW_QUERY_MS", "-1")
+    logging.getLogger("app").setLevel(logging.WARNING)
+    if not (args.reuse and os.path.exists(BENCH_DB)):
+        print(generate(url, args.ads, max(args.ads // 20, 10), 0.0, 0, 4.0, args.seed))
+    asyncio.run(run(args.repeat))
+
+
+if __name__ == "__main__":
+    main()
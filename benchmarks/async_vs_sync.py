@@ -0,0 +1,175 @@
+# Compares the async request path against the old sync one (def handlers on a
+# blocking Session, run in Starlette's threadpool) on the same seeded database.
+#
+# Run from the project root:
+#   python -m benchmarks.async_vs_sync --clients 500 --requests 20000
+#
+# Each app is served by its own uvicorn process and driven over HTTP, so the
+# client never shares an event loop with the server under test. Both apps run
+# behind the same middleware on the same engines, with the ad detail cache off,
+# so the numbers compare request paths rather than cache hit rates.
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DB = os.environ.get("BENCH_DB", os.path.join(tempfile.gettempdir(), "sanyraq_bench.db"))
+
+# app.database builds its engines from the environment at import time (and
+# app.main runs create_all), so point everything at BENCH_DB first; the uvicorn
+# subprocesses inherit the same settings
+os.environ["DATABASE_URL"] = f"sqlite:///{BENCH_DB}"
+os.environ.pop("ASYNC_DATABASE_URL", None)
+os.environ.pop("READ_DATABASE_URL", None)
+os.environ["AD_CACHE_SIZE"] = "0"
+os.environ["AD_INDEX"] = "0"
+os.environ["WRITE_BATCHING"] = "0"
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import httpx
+from fastapi import Depends, FastAPI, HTTPException, Query
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.admission import AdmissionMiddleware
+from app.database import Base, SessionLocal, engine
+from app.main import app as async_app
+from app.metrics import MetricsMiddleware
+from app.ShanyraqRepository import AdsDB
+from app.UserRepository import UserDB
+from app.CommentRepository import CommentDB
+
+sync_app = FastAPI()
+
+
+def get_sync_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@sync_app.get("/shanyraks/{id}/")
+def sync_get_shanyrak(id: int, db: Session = Depends(get_sync_db)):
+    ad = db.query(AdsDB).filter(AdsDB.id == id).first()
+    if ad is None:
+        raise HTTPException(status_code=404, detail="Ad not found")
+    return {"id": ad.id, "type": ad.type, "price": ad.price, "address": ad.address, "area": ad.area,
+            "rooms_count": ad.rooms_count, "description": ad.description, "user_id": ad.user_id,
+            "total_comments": ad.comments_count}
+
+
+@sync_app.get("/shanyraks/")
+def sync_search_shanyraks(db: Session = Depends(get_sync_db), limit: int = Query(10, ge=1), offset: int = Query(0, ge=0)):
+    ads = db.query(AdsDB).order_by(AdsDB.id.desc()).offset(offset).limit(limit).all()
+    return {"objects": [{"_id": ad.id, "type": ad.type, "price": ad.price, "address": ad.address,
+                         "area": ad.area, "rooms_count": ad.rooms_count} for ad in ads]}
+
+
+# same stack as async_app: admission control inside request metrics
+sync_app.add_middleware(AdmissionMiddleware, routes=sync_app.router.routes)
+sync_app.add_middleware(MetricsMiddleware)
+
+
+def seed(ads: int):
+    # pooled connections would keep writing to the unlinked file
+    engine.dispose()
+    for path in (BENCH_DB, BENCH_DB + "-wal", BENCH_DB + "-shm"):
+        if os.path.exists(path):
+            os.remove(path)
+    Base.metadata.create_all(bind=engine)
+    rng = random.Random(42)
+    with engine.begin() as conn:
+        conn.execute(insert(UserDB), [{"username": "bench@sanyraq.kz", "phone": "+77000000000", "password": "bench123",
+                                      "name": "Bench", "city": "Almaty"}])
+        rows = [{"type": rng.choice(["sell", "rent"]), "price": rng.randint(50_000, 90_000_000),
+                 "address": f"Almaty, Abay ave {i}", "area": rng.uniform(20, 250), "rooms_count": rng.randint(1, 6),
+                 "description": "benchmark listing", "user_id": 1} for i in range(ads)]
+        conn.execute(insert(AdsDB), rows)
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def drive(base_url: str, paths, clients: int, total: int):
+    latencies = []
+    errors = 0
+    queue = iter(range(total))
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        async def worker():
+            nonlocal errors
+            for i in queue:
+                started = time.perf_counter()
+                response = await client.get(paths[i % len(paths)])
+                latencies.append(time.perf_counter() - started)
+                if response.status_code != 200:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(clients)))
+        elapsed = time.perf_counter() - started
+    return {"rps": total / elapsed, "p50_ms": percentile(latencies, 50) * 1000,
+            "p99_ms": percentile(latencies, 99) * 1000, "errors": errors}
+
+
+def wait_until_up(base_url: str, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(base_url + "/shanyraks/?limit=1")
+            return
+        except httpx.TransportError:
+            time.sleep(0.2)
+    raise RuntimeError(f"server at {base_url} did not start")
+
+
+def run(target: str, port: int, paths, args):
+    env = dict(os.environ, BENCH_DB=BENCH_DB)
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", f"benchmarks.async_vs_sync:{target}", "--port", str(port),
+         "--log-level", "warning", "--backlog", str(args.clients * 2)],
+        env=env,
+    )
+    try:
+        base_url = f"http://127.0.0.1:{port}"
+        wait_until_up(base_url)
+        asyncio.run(drive(base_url, paths, min(args.clients, 50), min(args.requests, 1000)))  # warm-up
+        return asyncio.run(drive(base_url, paths, args.clients, args.requests))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="async vs sync request path benchmark")
+    parser.add_argument("--ads", type=int, default=10_000)
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--route", choices=["detail", "search"], default="detail")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    seed(args.ads)
+    rng = random.Random(7)
+    if args.route == "detail":
+        paths = [f"/shanyraks/{rng.randint(1, args.ads)}/" for _ in range(1000)]
+    else:
+        paths = [f"/shanyraks/?limit=20&offset={rng.randint(0, 200) * 20}&count=none" for _ in range(1000)]
+
+    print(f"{args.route}: {args.clients} clients, {args.requests} requests, {args.ads} ads")
+    for name, target in (("sync", "sync_app"), ("async", "async_app")):
+        result = run(target, args.port, paths, args)
+        print(f"{name:>6}: {result['rps']:8.0f} req/s  p50 {result['p50_ms']:7.1f} ms  "
+              f"p99 {result['p99_ms']:7.1f} ms  errors {result['errors']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+# Seeded synthetic data for benchmarks: users, ads, comments and favorites.
+#
+# Run from the project root:
+#   python -m benchmarks.datagen --scale small            # 10k ads
+#   python -m benchmarks.datagen --scale large            # 1M ads
+#   python -m benchmarks.datagen --ads 250000 --url postgresql://...
+#
+# The same --seed always produces the same rows, so results from different
+# commits are comparable. Comments are Zipf-skewed: a handful of ads get most
+# of the discussion, which is what the comment-thread and detail routes see in
+# production.
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, insert, text
+
+SCALES = {"small": 10_000, "medium": 100_000, "large": 1_000_000}
+DEFAULT_DB = os.path.join(tempfile.gettempdir(), "sanyraq_bench.db")
+CHUNK = 10_000
+EPOCH = datetime(2025, 1, 1)
+
+# centre of Almaty and roughly the city's extent in degrees
+CITY_LAT, CITY_LON, CITY_SPREAD = 43.238, 76.945, 0.12
+STREETS = ("Abay ave", "Dostyk ave", "Al-Farabi ave", "Tole bi st", "Satpayev st", "Zhandosov st", "Rozybakiev st", "Nauryzbay batyr st")
+WORDS = ("bright", "renovated", "quiet", "spacious", "near metro", "park view", "new building", "furnished", "balcony", "parking")
+
+
+def chunks(rows, size: int = CHUNK):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def user_rows(users: int):
+    for i in range(1, users + 1):
+        yield {"id": i, "username": f"user{i}@bench.sanyraq.kz", "phone": f"+7700{i:07d}",
+               "password": "bench1234", "name": f"User {i}", "city": "Almaty"}
+
+
+def ad_rows(rng: random.Random, ads: int, users: int, comments_count: Counter):
+    for i in range(1, ads + 1):
+        rooms = min(1 + int(rng.expovariate(0.7)), 6)
+        area = round(rng.uniform(18, 35) * rooms, 1)
+        ad_type = "rent" if rng.random() < 0.6 else "sell"
+        price = int(area * (rng.uniform(3_000, 9_000) if ad_type == "rent" else rng.uniform(350_000, 900_000)))
+        yield {
+            "id": i, "type": ad_type, "price": price,
+            "address": f"Almaty, {rng.choice(STREETS)} {rng.randint(1, 300)}",
+            "area": area, "rooms_count": rooms,
+            "description": " ".join(rng.sample(WORDS, 3)),
+            "user_id": rng.randint(1, users), "comments_count": comments_count[i],
+            "lat": round(CITY_LAT + rng.gauss(0, CITY_SPREAD / 2), 6),
+            "lon": round(CITY_LON + rng.gauss(0, CITY_SPREAD / 2), 6),
+        }
+
+
+def skewed_id(rng: random.Random, n: int, skew: float) -> int:
+    # power-law pick over 1..n: low ids are the "hot" ads
+    return min(int(n * rng.random() ** skew) + 1, n)
+
+
+def comment_targets(rng: random.Random, ads: int, comments: int, skew: float):
+    return [skewed_id(rng, ads, skew) for _ in range(comments)]
+
+
+def comment_rows(rng: random.Random, targets, users: int):
+    # spread over one fixed year so reruns produce identical timestamps
+    step = timedelta(days=365) / max(len(targets), 1)
+    for i, ad_id in enumerate(targets, start=1):
+        yield {"id": i, "content": f"comment {i}: " + " ".join(rng.sample(WORDS, 2)),
+               "created_at": EPOCH + i * step, "author_id": rng.randint(1, users), "shanyrak_id": ad_id}
+
+
+def favorite_rows(rng: random.Random, users: int, ads: int, per_user: int, skew: float):
+    for user_id in range(1, users + 1):
+        picked = {skewed_id(rng, ads, skew) for _ in range(rng.randint(0, per_user * 2))}
+        for ad_id in sorted(picked):
+            yield {"user_id": user_id, "shanyrak_id": ad_id}
+
+
+def generate(url: str, ads: int, users: int, comments_per_ad: float, favorites_per_user: int, skew: float, seed: int):
+    if url.startswith("sqlite:///"):
+        path = url[len("sqlite:///"):]
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+    # imported here so benchmarks.load can point DATABASE_URL at the bench
+    # database before anything in app builds its engines
+    from app.database import Base, make_engine
+    from app.ShanyraqRepository import AdsDB, facet_rebuild_statements
+    from app.CommentRepository import CommentDB
+    from app.UserRepository import UserDB, FavoriteDB
+
+    engine = make_engine(url)
+    Base.metadata.create_all(bind=engine)
+    rng = random.Random(seed)
+
+    targets = comment_targets(rng, ads, int(ads * comments_per_ad), skew)
+    comments_count = Counter(targets)
+
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        for table in (FavoriteDB, CommentDB, AdsDB, UserDB):
+            conn.execute(delete(table))
+        for model, rows in (
+            (UserDB, user_rows(users)),
+            (AdsDB, ad_rows(rng, ads, users, comments_count)),
+            (CommentDB, comment_rows(rng, targets, users)),
+            (FavoriteDB, favorite_rows(rng, users, ads, favorites_per_user, skew)),
+        ):
+            for batch in chunks(rows):
+                conn.execute(insert(model), batch)
+        # ads went in behind the repository's back, so recount the facet aggregate
+        for stmt in facet_rebuild_statements():
+            conn.execute(stmt)
+        if engine.dialect.name == "postgresql":
+            # ids were inserted explicitly, so move the serial sequences past them
+            for table in ("users", "ads", "comments", "favorites"):
+                conn.execute(text(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), COALESCE(MAX(id), 1)) FROM {table}"))
+    engine.dispose()
+
+    summary = {"url": url, "seed": seed, "users": users, "ads": ads, "comments": len(targets),
+               "hottest_ad_comments": comments_count.most_common(1)[0][1] if targets else 0,
+               "seconds": round(time.perf_counter() - started, 1)}
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="generate a seeded benchmark database")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--ads", type=int, help="overrides --scale")
+    parser.add_argument("--users", type=int, help="ads / 20 by default")
+    parser.add_argument("--comments-per-ad", type=float, default=3.0)
+    parser.add_argument("--favorites-per-user", type=int, default=5)
+    parser.add_argument("--skew", type=float, default=4.0, help="power-law exponent for comment and favorite targets")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--url", default=os.environ.get("BENCH_DATABASE_URL", f"sqlite:///{DEFAULT_DB}"))
+    args = parser.parse_args()
+
+    ads = args.ads or SCALES[args.scale]
+    users = args.users or max(ads // 20, 10)
+    summary = generate(args.url, ads, users, args.comments_per_ad, args.favorites_per_user, args.skew, args.seed)
+    print(json.dumps(summary))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+# Load driver: replays a weighted mix of realistic requests against the real
+# app and reports throughput and p50/p95/p99 latency per route.
+#
+# Run from the project root against a database made by benchmarks.datagen:
+#   python -m benchmarks.load --mix browse --requests 20000 --concurrency 100
+#   python -m benchmarks.load --mode uvicorn --mix mixed --out results/head.json
+#   python -m benchmarks.load --mix browse --compare results/base.json
+#
+# --mode inprocess drives the ASGI app directly (no sockets, cheapest way to
+# see server-side cost); --mode uvicorn starts a separate server process so
+# the client never shares an event loop with the app under test.
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+
+import httpx
+from sqlalchemy import create_engine, func, select, text
+
+from benchmarks.datagen import DEFAULT_DB, WORDS, CITY_LAT, CITY_LON, skewed_id
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+# each route builds (method, path, json body, needs auth) from the rng and the dataset size
+def ad_detail(rng, ads):
+    return "GET", f"/shanyraks/{skewed_id(rng, ads, 2.0)}/", None, False
+
+
+def ad_search(rng, ads):
+    params = ["limit=20", "count=approx"]
+    if rng.random() < 0.7:
+        params.append(f"ad_type={rng.choice(['rent', 'sell'])}")
+    if rng.random() < 0.5:
+        params.append(f"rooms_count={rng.randint(1, 4)}")
+    if rng.random() < 0.3:
+        params.append(f"price_until={rng.choice([200_000, 500_000, 50_000_000])}")
+    if rng.random() < 0.2:
+        params.append(f"offset={rng.randint(1, 10) * 20}")
+    return "GET", "/shanyraks/?" + "&".join(params), None, False
+
+
+def ad_text_search(rng, ads):
+    return "GET", f"/shanyraks/?limit=20&count=approx&q={rng.choice(WORDS).split()[0]}", None, False
+
+
+def ad_geo_search(rng, ads):
+    lat = CITY_LAT + rng.uniform(-0.05, 0.05)
+    lon = CITY_LON + rng.uniform(-0.05, 0.05)
+    return "GET", f"/shanyraks/?limit=20&count=approx&near={lat:.5f},{lon:.5f}&radius={rng.choice([500, 1000, 2000])}", None, False
+
+
+def ad_batch(rng, ads):
+    ids = ",".join(str(skewed_id(rng, ads, 2.0)) for _ in range(rng.randint(10, 50)))
+    return "GET", f"/shanyraks/batch?ids={ids}", None, False
+
+
+def comment_thread(rng, ads):
+    return "GET", f"/shanyraks/{skewed_id(rng, ads, 4.0)}/comments?limit=20", None, False
+
+
+def favorites_list(rng, ads):
+    return "GET", "/auth/users/favorites", None, True
+
+
+def comment_create(rng, ads):
+    return "POST", f"/shanyraks/{skewed_id(rng, ads, 4.0)}/comments", {"content": "load test " + rng.choice(WORDS)}, True
+
+
+def favorite_create(rng, ads):
+    return "POST", f"/auth/users/favorites/{skewed_id(rng, ads, 2.0)}", None, True
+
+
+ROUTES = {
+    "GET /shanyraks/{id}/": ad_detail,
+    "GET /shanyraks/": ad_search,
+    "GET /shanyraks/?q=": ad_text_search,
+    "GET /shanyraks/?near=": ad_geo_search,
+    "GET /shanyraks/batch": ad_batch,
+    "GET /shanyraks/{id}/comments": comment_thread,
+    "GET /auth/users/favorites": favorites_list,
+    "POST /shanyraks/{id}/comments": comment_create,
+    "POST /auth/users/favorites/{id}": favorite_create,
+}
+
+# route name -> weight
+MIXES = {
+    "browse": {
+        "GET /shanyraks/{id}/": 40, "GET /shanyraks/": 25, "GET /shanyraks/{id}/comments": 15,
+        "GET /shanyraks/batch": 5, "GET /shanyraks/?q=": 5, "GET /shanyraks/?near=": 5, "GET /auth/users/favorites": 5,
+    },
+    "search": {"GET /shanyraks/": 50, "GET /shanyraks/?q=": 25, "GET /shanyraks/?near=": 25},
+    "mixed": {
+        "GET /shanyraks/{id}/": 35, "GET /shanyraks/": 20, "GET /shanyraks/{id}/comments": 15,
+        "GET /shanyraks/batch": 5, "GET /shanyraks/?q=": 5, "GET /auth/users/favorites": 5,
+        "POST /shanyraks/{id}/comments": 10, "POST /auth/users/favorites/{id}": 5,
+    },
+}
+
+
+def plan(mix: str, total: int, ads: int, users: int, seed: int):
+    rng = random.Random(seed)
+    names = list(MIXES[mix])
+    weights = [MIXES[mix][name] for name in names]
+    requests = []
+    for name in rng.choices(names, weights, k=total):
+        method, path, body, auth = ROUTES[name](rng, ads)
+        requests.append((name, method, path, body, rng.randint(1, users) if auth else None))
+    return requests
+
+
+async def drive(client: httpx.AsyncClient, requests, concurrency: int, tokens):
+    samples = defaultdict(list)
+    errors = defaultdict(int)
+    queue = iter(requests)
+
+    async def worker():
+        for name, method, path, body, user_id in queue:
+            headers = {"Authorization": f"Bearer {tokens[user_id]}"} if user_id else None
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, path, json=body, headers=headers)
+                failed = response.status_code >= 400
+            except httpx.TransportError:
+                failed = True
+            samples[name].append(time.perf_counter() - started)
+            if failed:
+                errors[name] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return samples, errors, time.perf_counter() - started
+
+
+def summarize(samples, errors, elapsed: float):
+    def stats(values, errs):
+        return {"requests": len(values), "errors": errs, "rps": round(len(values) / elapsed, 1),
+                "p50_ms": round(percentile(values, 50) * 1000, 2), "p95_ms": round(percentile(values, 95) * 1000, 2),
+                "p99_ms": round(percentile(values, 99) * 1000, 2)}
+
+    routes = {name: stats(values, errors[name]) for name, values in sorted(samples.items())}
+    everything = [value for values in samples.values() for value in values]
+    routes["ALL"] = stats(everything, sum(errors.values()))
+    return routes
+
+
+def dataset_size(url: str):
+    engine = create_engine(url)
+    with engine.connect() as conn:
+        ads = conn.scalar(select(func.max(text("id"))).select_from(text("ads"))) or 0
+        users = conn.scalar(select(func.max(text("id"))).select_from(text("users"))) or 0
+    engine.dispose()
+    if not ads or not users:
+        raise SystemExit(f"{url} has no ads or users, run python -m benchmarks.datagen first")
+    return ads, users
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def wait_until_up(base_url: str, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(base_url + "/shanyraks/?limit=1&count=none")
+            return
+        except httpx.TransportError:
+            time.sleep(0.2)
+    raise RuntimeError(f"server at {base_url} did not start")
+
+
+async def run_inprocess(requests, args, tokens):
+    from app.main import app
+
+    # app errors come back as 500s and are counted, like they would over HTTP
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        await drive(client, requests[:min(len(requests), 500)], min(args.concurrency, 50), tokens)  # warm-up
+        return await drive(client, requests, args.concurrency, tokens)
+
+
+async def run_uvicorn(requests, args, tokens):
+    env = dict(os.environ, DATABASE_URL=args.url)
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(args.port),
+         "--log-level", "warning", "--backlog", str(args.concurrency * 2)],
+        env=env, stdout=subprocess.DEVNULL,
+    )
+    try:
+        base_url = f"http://127.0.0.1:{args.port}"
+        await asyncio.to_thread(wait_until_up, base_url)
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+            await drive(client, requests[:min(len(requests), 500)], min(args.concurrency, 50), tokens)  # warm-up
+            return await drive(client, requests, args.concurrency, tokens)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def print_report(routes, baseline=None):
+    print(f"{'route':<34}{'reqs':>7}{'err':>6}{'rps':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for name, row in routes.items():
+        line = (f"{name:<34}{row['requests']:>7}{row['errors']:>6}{row['rps']:>9.1f}"
+                f"{row['p50_ms']:>9.2f}{row['p95_ms']:>9.2f}{row['p99_ms']:>9.2f}")
+        old = (baseline or {}).get(name)
+        if old:
+            line += (f"   p50 {_delta(old['p50_ms'], row['p50_ms'])}  p99 {_delta(old['p99_ms'], row['p99_ms'])}"
+                     f"  rps {_delta(old['rps'], row['rps'])}")
+        print(line)
+
+
+def _delta(old: float, new: float):
+    if not old:
+        return "   n/a"
+    return f"{(new - old) / old * 100:+6.1f}%"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="load test the API with a realistic request mix")
+    parser.add_argument("--url", default=os.environ.get("BENCH_DATABASE_URL", f"sqlite:///{DEFAULT_DB}"))
+    parser.add_argument("--mode", choices=["inprocess", "uvicorn"], default="inprocess")
+    parser.add_argument("--mix", choices=sorted(MIXES), default="browse")
+    parser.add_argument("--requests", type=int, default=10_000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--out", help="write results as JSON to this path")
+    parser.add_argument("--compare", help="JSON results of an earlier run to diff against")
+    args = parser.parse_args()
+
+    # the app picks its database up from the environment at import time
+    os.environ["DATABASE_URL"] = args.url
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    from app.tools import create_jwt
+
+    ads, users = dataset_size(args.url)
+    requests = plan(args.mix, args.requests, ads, users, args.seed)
+    tokens = {user_id: create_jwt(user_id) for user_id in {r[4] for r in requests if r[4]}}
+
+    runner = run_inprocess if args.mode == "inprocess" else run_uvicorn
+    samples, errors, elapsed = asyncio.run(runner(requests, args, tokens))
+    routes = summarize(samples, errors, elapsed)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["routes"]
+    print(f"{args.mix} mix, {args.mode}, {args.requests} requests, concurrency {args.concurrency}, {ads} ads")
+    print_report(routes, baseline)
+
+    if args.out:
+        result = {
+            "meta": {"revision": git_revision(), "timestamp": datetime.now(timezone.utc).isoformat(),
+                     "python": platform.python_version(), "ads": ads, "users": users, "elapsed_s": round(elapsed, 2),
+                     **{key: value for key, value in vars(args).items() if key not in ("out", "compare")}},
+            "routes": routes,
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
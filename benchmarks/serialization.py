@@ -0,0 +1,101 @@
+# Per-page serialization cost of the list endpoints: the old path (ORM entities
+# -> dicts -> jsonable_encoder -> stdlib json) against the fast one (Row tuples
+# -> dicts -> FastJSONResponse).
+#
+# Run from the project root:
+#   python -m benchmarks.serialization --page 100 --repeat 200
+#
+# Everything runs in-process against an in-memory SQLite database, so the
+# numbers are query + serialization time without any HTTP overhead.
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import Session
+
+from app.database import Base
+from app.ShanyraqRepository import AdsDB, AD_LIST_COLUMNS
+from app.CommentRepository import CommentDB
+from app.UserRepository import UserDB
+from app.responses import FastJSONResponse, orjson
+
+
+def seed(engine, ads: int, comments: int):
+    Base.metadata.create_all(engine)
+    now = datetime(2025, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(insert(UserDB), [{"username": "bench@example.com", "phone": "+77000000000", "password": "x", "name": "bench", "city": "Almaty"}])
+        conn.execute(insert(AdsDB), [
+            {"type": "rent" if i % 2 else "sell", "price": 100_000 + i, "address": f"Abai street {i}", "area": 40.0 + i % 60,
+             "rooms_count": 1 + i % 4, "description": "bench", "user_id": 1}
+            for i in range(ads)
+        ])
+        conn.execute(insert(CommentDB), [
+            {"content": f"comment {i} " + "x" * 80, "created_at": now + timedelta(seconds=i), "author_id": 1, "shanyrak_id": 1}
+            for i in range(comments)
+        ])
+
+
+def ads_before(db: Session, page: int):
+    ads = db.scalars(select(AdsDB).order_by(AdsDB.id.desc()).limit(page)).all()
+    content = {"total": None, "next_cursor": None, "objects": [
+        {"_id": ad.id, "type": ad.type, "price": ad.price, "address": ad.address, "area": ad.area, "rooms_count": ad.rooms_count}
+        for ad in ads
+    ]}
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+def ads_after(db: Session, page: int):
+    ads = db.execute(select(*AD_LIST_COLUMNS).order_by(AdsDB.id.desc()).limit(page)).all()
+    return FastJSONResponse({"total": None, "next_cursor": None, "objects": [ad._asdict() for ad in ads]}).body
+
+
+def comments_before(db: Session, page: int):
+    comments = db.scalars(select(CommentDB).where(CommentDB.shanyrak_id == 1).order_by(CommentDB.created_at, CommentDB.id).limit(page)).all()
+    content = {"next_cursor": None, "comments": [
+        {"id": comment.id, "content": comment.content, "created_at": comment.created_at, "author_id": comment.author_id}
+        for comment in comments
+    ]}
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+def comments_after(db: Session, page: int):
+    comments = db.execute(
+        select(CommentDB.id, CommentDB.content, CommentDB.created_at, CommentDB.author_id)
+        .where(CommentDB.shanyrak_id == 1).order_by(CommentDB.created_at, CommentDB.id).limit(page)
+    ).all()
+    return FastJSONResponse({"next_cursor": None, "comments": [comment._asdict() for comment in comments]}).body
+
+
+def timed(fn, engine, page: int, repeat: int):
+    with Session(engine) as db:
+        fn(db, page)
+        start = time.perf_counter()
+        for _ in range(repeat):
+            fn(db, page)
+            # drop the identity map so every page materialises fresh entities
+            db.expunge_all()
+        return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--page", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    engine = create_engine("sqlite://")
+    seed(engine, max(args.page, 1000), max(args.page, 1000))
+    print(f"page={args.page} repeat={args.repeat} renderer={'orjson' if orjson else 'json'}")
+    for name, before, after in (("ads", ads_before, ads_after), ("comments", comments_before, comments_after)):
+        assert before(Session(engine), args.page) == after(Session(engine), args.page)
+        t_before = timed(before, engine, args.page, args.repeat)
+        t_after = timed(after, engine, args.page, args.repeat)
+        print(f"{name:<10} before {t_before * 1000:8.3f} ms/page   after {t_after * 1000:8.3f} ms/page   x{t_before / t_after:.1f}")
+
+
+if __name__ == "__main__":
+    main()
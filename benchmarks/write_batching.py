@@ -0,0 +1,87 @@
+# Writes/sec under contention with and without group commit (app.batcher).
+#
+# Run from the project root:
+#   python -m benchmarks.write_batching --writers 200 --writes 5000
+#
+# Many concurrent clients post comments to a few hot listings and toggle
+# favorites, all in-process against a freshly generated SQLite database.
+# Errors are mostly "database is locked" from writers colliding on SQLite.
+import argparse
+import asyncio
+import logging
+import os
+import random
+import tempfile
+
+import httpx
+
+from benchmarks.datagen import generate, skewed_id
+from benchmarks.load import drive, summarize
+
+BENCH_DB = os.path.join(tempfile.gettempdir(), "sanyraq_write_bench.db")
+
+
+def plan(writes: int, ads: int, users: int, seed: int):
+    rng = random.Random(seed)
+    requests = []
+    for i in range(writes):
+        user_id = rng.randint(1, users)
+        if rng.random() < 0.7:
+            # hot listings: most comments land on a handful of ads
+            path = f"/shanyraks/{skewed_id(rng, ads, 6.0)}/comments"
+            requests.append(("POST /shanyraks/{id}/comments", "POST", path, {"content": f"burst {i}"}, user_id))
+        else:
+            method = rng.choice(["POST", "DELETE"])
+            path = f"/auth/users/favorites/{skewed_id(rng, ads, 2.0)}"
+            requests.append((f"{method} /auth/users/favorites/{{id}}", method, path, None, user_id))
+    return requests
+
+
+async def run(app, write_batcher, async_engine, enabled: bool, requests, writers: int, tokens):
+    write_batcher.enabled = enabled
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        result = await drive(client, requests, writers, tokens)
+    await write_batcher.close()
+    # the next round regenerates the database file under the pool
+    await async_engine.dispose()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="group commit vs per-request commit under write contention")
+    parser.add_argument("--writers", type=int, default=100)
+    parser.add_argument("--writes", type=int, default=3000)
+    parser.add_argument("--ads", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=11)
+    args = parser.parse_args()
+
+    url = f"sqlite:///{BENCH_DB}"
+    os.environ["DATABASE_URL"] = url
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    from app.main import app
+    from app.batcher import write_batcher
+    from app.database import async_engine
+    from app.metrics import WRITE_BATCH_SIZE
+    from app.tools import create_jwt
+
+    users = max(args.ads // 20, 10)
+    requests = plan(args.writes, args.ads, users, args.seed)
+    tokens = {user_id: create_jwt(user_id) for user_id in range(1, users + 1)}
+
+    print(f"{args.writers} concurrent writers, {args.writes} writes")
+    for name, enabled in (("per-request commit", False), ("group commit", True)):
+        generate(url, args.ads, users, 1.0, 2, 4.0, args.seed)
+        WRITE_BATCH_SIZE.values.clear()
+        samples, errors, elapsed = asyncio.run(run(app, write_batcher, async_engine, enabled, requests, args.writers, tokens))
+        total = summarize(samples, errors, elapsed)["ALL"]
+        line = (f"{name:>20}: {total['rps']:8.1f} writes/s  p50 {total['p50_ms']:7.1f} ms  "
+                f"p99 {total['p99_ms']:7.1f} ms  errors {total['errors']}")
+        series = WRITE_BATCH_SIZE.values.get(())
+        if series:
+            line += f"  mean batch {series[1] / series[2]:.1f}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,9 @@
 : "${HOST:=0.0.0.0}"
 : "${PORT:=8000}"
 
+# Bring the database schema up to date before serving
+alembic upgrade head
+
 # Start uvicorn with live-reload
 uvicorn \
     --proxy-headers \
@@ -0,0 +1,17 @@
+# Recomputes ads.comments_count from the comments table.
+# Run from the project root: python -m scripts.rebuild_comments_count
+import asyncio
+
+from app.database import AsyncSessionLocal
+from app.UserRepository import UserDB
+from app.CommentRepository import CommentRepository
+
+
+async def main():
+    async with AsyncSessionLocal() as db:
+        updated = await CommentRepository().rebuild_comments_count(db)
+        print(f"comments_count rebuilt for {updated} ads")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
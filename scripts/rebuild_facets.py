@@ -0,0 +1,18 @@
+# Recomputes the ad_facets aggregate behind GET /shanyraks/facets from the ads table.
+# Run from the project root: python -m scripts.rebuild_facets
+import asyncio
+
+from app.database import AsyncSessionLocal
+from app.UserRepository import UserDB
+from app.CommentRepository import CommentDB
+from app.ShanyraqRepository import AdRepository
+
+
+async def main():
+    async with AsyncSessionLocal() as db:
+        rows = await AdRepository().rebuild_facets(db)
+        print(f"ad_facets rebuilt: {rows} rows")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
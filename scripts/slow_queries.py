@@ -0,0 +1,82 @@
+# Summarizes the slow-query log written by app.slowlog, worst statements first.
+# Run from the project root:
+#   python -m scripts.slow_queries
+#   python -m scripts.slow_queries --sort max --top 5 --plans
+#   python -m scripts.slow_queries --route "GET /shanyraks/"
+import argparse
+import glob
+import json
+import os
+from collections import Counter, defaultdict
+
+from app.slowlog import SLOW_QUERY_LOG
+
+
+def read_records(path: str):
+    # oldest rotated file first, so the newest plan wins per statement
+    backups = [p for p in glob.glob(glob.escape(path) + ".*") if p.rsplit(".", 1)[1].isdigit()]
+    backups.sort(key=lambda p: int(p.rsplit(".", 1)[1]), reverse=True)
+    for name in backups + [path]:
+        if not os.path.exists(name):
+            continue
+        with open(name, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+
+def summarize(records, route=None):
+    groups = defaultdict(lambda: {"durations": [], "routes": Counter(), "sql": None, "params": None, "plan": None})
+    for record in records:
+        if route and record.get("route") != route:
+            continue
+        group = groups[record["fingerprint"]]
+        group["durations"].append(record["duration_ms"])
+        group["routes"][record.get("route") or "-"] += 1
+        group["sql"] = record["sql"]
+        group["params"] = record.get("params")
+        if record.get("plan"):
+            group["plan"] = record["plan"]
+    rows = []
+    for key, group in groups.items():
+        durations = sorted(group["durations"])
+        rows.append({
+            "fingerprint": key, "count": len(durations), "total_ms": sum(durations),
+            "p95_ms": durations[min(len(durations) - 1, int(len(durations) * 0.95))], "max_ms": durations[-1],
+            "routes": group["routes"].most_common(3), "sql": group["sql"], "params": group["params"], "plan": group["plan"],
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="summarize the slow-query log")
+    parser.add_argument("--log", default=SLOW_QUERY_LOG)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--sort", choices=["total", "count", "p95", "max"], default="total")
+    parser.add_argument("--route", help='only statements issued by this route, e.g. "GET /shanyraks/"')
+    parser.add_argument("--plans", action="store_true", help="print the captured query plans")
+    args = parser.parse_args()
+
+    rows = summarize(read_records(args.log), args.route)
+    if not rows:
+        print(f"no slow queries in {args.log}")
+        return
+    sort_key = {"total": "total_ms", "count": "count", "p95": "p95_ms", "max": "max_ms"}[args.sort]
+    rows.sort(key=lambda row: row[sort_key], reverse=True)
+
+    for row in rows[:args.top]:
+        print(f"{row['fingerprint']}  count {row['count']}  total {row['total_ms']:.0f} ms  "
+              f"p95 {row['p95_ms']:.0f} ms  max {row['max_ms']:.0f} ms")
+        print(f"  routes: {', '.join(f'{name} ({n})' for name, n in row['routes'])}")
+        print(f"  params: {json.dumps(row['params'])}")
+        print(f"  {row['sql']}")
+        if args.plans and row["plan"]:
+            for line in row["plan"]:
+                print(f"    | {line}")
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+# Copies the SQLite primary into the read replica file, for trying the
+# READ_DATABASE_URL routing locally without a Postgres standby.
+# Run from the project root:
+#   READ_DATABASE_URL=sqlite:///./replica.db python -m scripts.sync_replica
+#   READ_DATABASE_URL=sqlite:///./replica.db python -m scripts.sync_replica --interval 3
+# With --interval the copy repeats, so the replica trails the primary by up to
+# that many seconds, like a lagging standby.
+import argparse
+import os
+import sqlite3
+import time
+
+from sqlalchemy.engine import make_url
+
+from app.database import SQLALCHEMY_DATABASE_URL
+
+
+def sqlite_path(url: str) -> str:
+    parsed = make_url(url)
+    if parsed.get_backend_name() != "sqlite" or not parsed.database or parsed.database == ":memory:":
+        raise SystemExit(f"not a SQLite file URL: {url}")
+    return parsed.database
+
+
+def sync(primary: str, replica: str) -> float:
+    started = time.perf_counter()
+    source = sqlite3.connect(primary)
+    target = sqlite3.connect(replica)
+    try:
+        # online backup: consistent snapshot while the app keeps writing
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="copy the SQLite primary to the read replica file")
+    parser.add_argument("--primary", default=SQLALCHEMY_DATABASE_URL)
+    parser.add_argument("--replica", default=os.getenv("READ_DATABASE_URL"))
+    parser.add_argument("--interval", type=float, help="repeat every N seconds")
+    args = parser.parse_args()
+    if not args.replica:
+        raise SystemExit("set READ_DATABASE_URL or pass --replica")
+
+    primary, replica = sqlite_path(args.primary), sqlite_path(args.replica)
+    while True:
+        print(f"{primary} -> {replica} in {sync(primary, replica) * 1000:.0f} ms")
+        if not args.interval:
+            break
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
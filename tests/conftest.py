@@ -0,0 +1,73 @@
+import os
+import tempfile
+
+# the app builds its engines from the environment at import time, so the test
+# database has to be configured before anything from app is imported
+TEST_DIR = tempfile.mkdtemp(prefix="sanyraq-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(TEST_DIR, 'test.db')}"
+os.environ.pop("ASYNC_DATABASE_URL", None)
+os.environ.pop("READ_DATABASE_URL", None)
+os.environ["SLOW_QUERY_MS"] = "-1"
+os.environ["LOG_LEVEL"] = "WARNING"
+os.environ["AD_INDEX"] = "0"
+os.environ["WRITE_BATCHING"] = "0"
+os.environ["RATE_LIMIT_RPS"] = "0"
+os.environ["ADMISSION_MAX_IN_FLIGHT"] = "0"
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.database import Base, engine
+from app.main import app, ads_repo
+from app.ShanyraqRepository import ad_detail_cache
+from app.UserRepository import user_cache
+from app.adindex import ad_index
+from app.metrics import REQUEST_QUERIES
+from app.replica import read_router
+from app.tools import token_cache
+
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(app) as c:
+        yield c
+
+
+@pytest.fixture(autouse=True)
+def clean_state():
+    with engine.begin() as conn:
+        for table in reversed(Base.metadata.sorted_tables):
+            conn.execute(table.delete())
+    ads_repo.count_cache.clear()
+    token_cache.clear()
+    read_router.recent_writes.clear()
+    for cache in (ad_detail_cache, user_cache):
+        cache._entries.clear()
+    if ad_index is not None:
+        ad_index.ready = False
+    yield
+
+
+def register(client, username: str = "owner@sanyraq.kz", phone: str = "+77000000001") -> dict:
+    """Creates a user and returns Authorization headers for it."""
+    response = client.post("/auth/users", json={"username": username, "phone": phone, "password": "secret123",
+                                                "name": "Test", "city": "Almaty"})
+    assert response.status_code == 200, response.text
+    response = client.post("/auth/users/login", data={"username": username, "password": "secret123"})
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def create_ad(client, headers: dict, **fields) -> int:
+    body = {"type": "rent", "price": 100_000, "address": "Abai 1", "area": 50.0, "rooms_count": 2,
+            "description": "flat"}
+    body.update(fields)
+    response = client.post("/shanyraks/", json=body, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+
+def sql_statements(method: str, route: str) -> int:
+    """SQL statements recorded so far for a route; diff it around a request."""
+    series = REQUEST_QUERIES.values.get((method, route))
+    return int(series[1]) if series else 0
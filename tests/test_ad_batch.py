@@ -0,0 +1,85 @@
+import pytest
+
+from app.ShanyraqRepository import MAX_AD_BATCH
+from tests.conftest import create_ad, register, sql_statements
+
+
+@pytest.fixture
+def ads(client):
+    headers = register(client)
+    return headers, [create_ad(client, headers, price=100_000 * (i + 1), address=f"Abai {i}") for i in range(5)]
+
+
+def get_batch(client, ids):
+    response = client.get("/shanyraks/batch", params={"ids": ids})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def post_batch(client, ids):
+    response = client.post("/shanyraks/batch", json={"ids": ids})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_found_and_missing_keep_request_order(client, ads):
+    _, ids = ads
+    wanted = [ids[3], 999_999, ids[0], ids[4], -1]
+    for page in (get_batch(client, ",".join(map(str, wanted))), post_batch(client, wanted)):
+        assert [ad["id"] for ad in page["shanyraks"]] == [ids[3], ids[0], ids[4]]
+        assert page["missing"] == [999_999, -1]
+        detail = client.get(f"/shanyraks/{ids[3]}/").json()
+        assert page["shanyraks"][0] == detail
+
+
+def test_duplicate_ids(client, ads):
+    _, ids = ads
+    page = post_batch(client, [ids[1], ids[1], 424242, ids[2], 424242])
+    # found follows the requested ids; missing lists each absent id once
+    assert [ad["id"] for ad in page["shanyraks"]] == [ids[1], ids[1], ids[2]]
+    assert page["missing"] == [424242]
+    page = get_batch(client, f"{ids[1]}, {ids[1]},,{ids[2]}")
+    assert [ad["id"] for ad in page["shanyraks"]] == [ids[1], ids[1], ids[2]]
+
+
+def test_one_query_for_uncached_ids(client, ads):
+    _, ids = ads
+    before = sql_statements("POST", "/shanyraks/batch")
+    post_batch(client, ids)
+    assert sql_statements("POST", "/shanyraks/batch") - before == 1
+    # the rows are in the detail cache now
+    before = sql_statements("POST", "/shanyraks/batch")
+    post_batch(client, ids)
+    assert sql_statements("POST", "/shanyraks/batch") == before
+
+
+def test_batch_sees_updates(client, ads):
+    headers, ids = ads
+    post_batch(client, ids)
+    assert client.patch(f"/shanyraks/{ids[0]}", json={"price": 1}, headers=headers).status_code == 200
+    assert client.delete(f"/shanyraks/{ids[1]}", headers=headers).status_code == 200
+    page = post_batch(client, ids[:2])
+    assert [ad["price"] for ad in page["shanyraks"]] == [1]
+    assert page["missing"] == [ids[1]]
+
+
+@pytest.mark.parametrize("ids", ["", ",", "1,two", "1.5", ",".join(["1"] * (MAX_AD_BATCH + 1))])
+def test_get_rejects_malformed_ids(client, ids):
+    response = client.get("/shanyraks/batch", params={"ids": ids})
+    assert response.status_code == 400
+    assert response.json()["detail"] == f"ids must be 1 to {MAX_AD_BATCH} comma-separated integers"
+
+
+def test_get_requires_ids(client):
+    assert client.get("/shanyraks/batch").status_code == 422
+
+
+@pytest.mark.parametrize("body", [{}, {"ids": []}, {"ids": ["x"]}, {"ids": list(range(MAX_AD_BATCH + 1))}])
+def test_post_rejects_malformed_ids(client, body):
+    assert client.post("/shanyraks/batch", json=body).status_code == 422
+
+
+def test_limit_is_inclusive(client, ads):
+    _, ids = ads
+    page = post_batch(client, list(range(1, MAX_AD_BATCH + 1)))
+    assert len(page["shanyraks"]) + len(page["missing"]) == MAX_AD_BATCH
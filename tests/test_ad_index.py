@@ -0,0 +1,100 @@
+import random
+
+import pytest
+from sqlalchemy import insert
+
+pytest.importorskip("numpy")
+
+from app import adindex
+from app.database import AsyncSessionLocal, engine
+from app.main import ads_repo
+from app.ShanyraqRepository import AdsDB
+from tests.conftest import create_ad, register
+
+FILTERS = [
+    {},
+    {"ad_type": "rent"},
+    {"ad_type": "sell", "rooms_count": 2},
+    {"price_from": 200_000, "price_until": 600_000},
+    {"ad_type": "rent", "rooms_count": 3, "price_from": 100_000},
+    {"rooms_count": 4, "price_until": 150_000},
+    {"ad_type": "nonexistent"},
+]
+
+
+@pytest.fixture
+def indexed(client, monkeypatch):
+    rng = random.Random(22)
+    rows = [{"type": rng.choice(["rent", "sell", "daily", None]),
+             "rooms_count": rng.choice([1, 2, 3, 4, None]),
+             "price": rng.choice([rng.randrange(50_000, 900_000), None]),
+             "area": rng.choice([rng.uniform(20, 150), None]),
+             "address": f"Abai {i}", "description": "flat"} for i in range(600)]
+    with engine.begin() as conn:
+        conn.execute(insert(AdsDB), rows)
+
+    async def load():
+        async with AsyncSessionLocal() as db:
+            return await ads_repo.load_ad_index(db)
+
+    assert client.portal.call(load) == 600
+    # small chunks so a page walks several of them
+    monkeypatch.setattr(adindex, "AD_INDEX_CHUNK", 16)
+    yield
+    adindex.ad_index.ready = False
+
+
+def walk(client, filters, limit=25, pages=4):
+    """First pages by offset and by cursor, from the live path."""
+    results = []
+    for offset in (0, 7, 590):
+        results.append(client.get("/shanyraks/", params={"limit": limit, "offset": offset, **filters}).json())
+    cursor = None
+    for _ in range(pages):
+        params = {"limit": limit, "count": "none", **filters}
+        if cursor:
+            params["cursor"] = cursor
+        page = client.get("/shanyraks/", params=params).json()
+        results.append(page)
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    return results
+
+
+def both_paths(client, filters):
+    adindex.ad_index.ready = False
+    ads_repo.count_cache.clear()
+    sql = walk(client, filters)
+    adindex.ad_index.ready = True
+    return sql, walk(client, filters)
+
+
+@pytest.mark.parametrize("filters", FILTERS)
+def test_index_matches_sql(client, indexed, filters):
+    sql, index = both_paths(client, filters)
+    assert index == sql
+    if filters != {"ad_type": "nonexistent"}:
+        assert sql[0]["objects"] and len(sql[0]["objects"]) == min(sql[0]["total"], 25)
+
+
+def test_index_follows_writes(client, indexed):
+    headers = register(client)
+    created = [create_ad(client, headers, type="rent", rooms_count=3, price=300_000 + i) for i in range(5)]
+    client.patch(f"/shanyraks/{created[0]}", json={"type": "sell", "rooms_count": 2}, headers=headers)
+    client.delete(f"/shanyraks/{created[1]}", headers=headers)
+    client.post("/shanyraks/bulk", content=b'{"type": "rent", "price": 310000, "address": "a", "area": 40, "rooms_count": 3, "description": "d"}\n',
+                headers={**headers, "Content-Type": "application/x-ndjson"})
+    for filters in FILTERS:
+        sql, index = both_paths(client, filters)
+        assert index == sql, filters
+
+
+def test_index_is_used(client, indexed, monkeypatch):
+    calls = []
+    search = adindex.ad_index.search
+    monkeypatch.setattr(adindex.ad_index, "search", lambda *args, **kwargs: calls.append(1) or search(*args, **kwargs))
+    client.get("/shanyraks/", params={"ad_type": "rent"})
+    # full-text and geo filters stay on SQL
+    client.get("/shanyraks/", params={"q": "flat"})
+    assert len(calls) == 1
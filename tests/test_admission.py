@@ -0,0 +1,126 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import admission
+from app.admission import AdmissionMiddleware, TokenBuckets
+from app.main import app
+from app.metrics import REJECTED, REQUESTS, MetricsMiddleware
+from app.tools import create_jwt
+
+
+@pytest.fixture
+def limited(client):
+    # the app's own middleware is built with limits off; wrap it in one with limits
+    return TestClient(AdmissionMiddleware(app, app.router.routes, rate=1, burst=10, max_in_flight=0))
+
+
+def test_search_limit_is_capped(client):
+    assert client.get("/shanyraks/", params={"limit": 100}).status_code == 200
+    assert client.get("/shanyraks/", params={"limit": 101}).status_code == 422
+
+
+def test_burst_then_429_with_retry_after(limited):
+    # search costs 4: two fit in a burst of 10, the third doesn't
+    assert limited.get("/shanyraks/").status_code == 200
+    assert limited.get("/shanyraks/").status_code == 200
+    before = REJECTED.values.get(("GET", "/shanyraks/", "rate_limited"), 0)
+    response = limited.get("/shanyraks/")
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "2"
+    assert response.json() == {"detail": "Too many requests"}
+    assert REJECTED.values[("GET", "/shanyraks/", "rate_limited")] == before + 1
+    # a cost-1 route still fits in what's left
+    assert limited.get("/shanyraks/1/").status_code == 404
+
+
+def test_rejections_are_counted_under_their_route(client):
+    # the order main.py builds: metrics outside admission
+    stack = TestClient(MetricsMiddleware(AdmissionMiddleware(_slow_app, app.router.routes, rate=1, burst=4)))
+    before = REQUESTS.values.get(("GET", "/shanyraks/", "429"), 0)
+    unmatched = REQUESTS.values.get(("GET", "unmatched", "429"), 0)
+    assert stack.get("/shanyraks/").status_code == 200
+    assert stack.get("/shanyraks/").status_code == 429
+    assert REQUESTS.values[("GET", "/shanyraks/", "429")] == before + 1
+    assert REQUESTS.values.get(("GET", "unmatched", "429"), 0) == unmatched
+    # a path no route matches is still unmatched
+    unmatched = REQUESTS.values.get(("GET", "unmatched", "200"), 0)
+    stack.get("/nowhere")
+    assert REQUESTS.values[("GET", "unmatched", "200")] == unmatched + 1
+
+
+def test_buckets_are_per_caller(limited):
+    for _ in range(2):
+        limited.get("/shanyraks/")
+    assert limited.get("/shanyraks/").status_code == 429
+    user = {"Authorization": f"Bearer {create_jwt(1)}"}
+    assert limited.get("/shanyraks/", headers=user).status_code == 200
+    # a bad token is an anonymous caller, so it shares the IP's empty bucket
+    assert limited.get("/shanyraks/", headers={"Authorization": "Bearer junk"}).status_code == 429
+
+
+def test_exempt_and_unknown_paths_are_not_limited(limited):
+    for _ in range(20):
+        assert limited.get("/metrics").status_code == 200
+        assert limited.get("/no-such-route").status_code == 404
+
+
+def test_tokens_refill_over_time(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(admission.time, "monotonic", lambda: now[0])
+    buckets = TokenBuckets(rate=2, burst=4)
+    assert buckets.take("a", 4) == 0
+    assert buckets.take("a", 1) == 0.5
+    now[0] += 0.5
+    assert buckets.take("a", 1) == 0
+    # a request costing more than the bucket gets through once it's full
+    now[0] += 10
+    assert buckets.take("a", 20) == 0
+    assert buckets.take("a", 20) > 0
+
+
+async def _slow_app(scope, receive, send):
+    await asyncio.sleep(0.2)
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def _call(middleware, path):
+    result = {}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            result["status"] = message["status"]
+            result["headers"] = dict(message["headers"])
+
+    scope = {"type": "http", "method": "GET", "path": path, "root_path": "", "query_string": b"",
+             "headers": [], "client": ("10.0.0.1", 1234)}
+    await middleware(scope, None, send)
+    return result
+
+
+def test_overload_is_shed_with_503():
+    middleware = AdmissionMiddleware(_slow_app, app.router.routes, rate=0, max_in_flight=5, queue_ms=50)
+
+    async def scenario():
+        # search (4) is admitted; another search or an export (20) would exceed 5
+        results = await asyncio.gather(_call(middleware, "/shanyraks/"), _call(middleware, "/shanyraks/"),
+                                       _call(middleware, "/shanyraks/export"))
+        assert [result["status"] for result in results] == [200, 503, 503]
+        assert results[1]["headers"][b"retry-after"] == b"1"
+        assert middleware.in_flight == 0
+        # an idle server admits even a request costing more than the cap
+        assert (await _call(middleware, "/shanyraks/export"))["status"] == 200
+
+    asyncio.run(scenario())
+
+
+def test_queued_request_is_admitted_when_room_frees_up():
+    middleware = AdmissionMiddleware(_slow_app, app.router.routes, rate=0, max_in_flight=5, queue_ms=500)
+
+    async def scenario():
+        results = await asyncio.gather(_call(middleware, "/shanyraks/"), _call(middleware, "/shanyraks/"))
+        assert [result["status"] for result in results] == [200, 200]
+
+    asyncio.run(scenario())
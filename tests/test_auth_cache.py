@@ -0,0 +1,45 @@
+import time
+
+import jwt
+import pytest
+
+from app import tools
+from app.UserRepository import user_cache
+from tests.conftest import register
+
+
+def test_verified_token_is_decoded_once(monkeypatch):
+    token = tools.create_jwt(7)
+    calls = []
+    decode = jwt.decode
+    monkeypatch.setattr(tools.jwt, "decode", lambda *args, **kwargs: calls.append(1) or decode(*args, **kwargs))
+    assert tools.decode_jwt_cached(token) == 7
+    assert tools.decode_jwt_cached(token) == 7
+    assert len(calls) == 1
+
+
+def test_cached_token_is_dropped_after_exp():
+    exp = int(time.time()) + 1
+    token = jwt.encode({"user_id": 7, "exp": exp}, "jeangoujan", algorithm="HS256")
+    assert tools.decode_jwt_cached(token) == 7
+    time.sleep(exp - time.time() + 0.05)
+    with pytest.raises(jwt.ExpiredSignatureError):
+        tools.decode_jwt_cached(token)
+    assert len(tools.token_cache) == 0
+
+
+def test_invalid_token_is_401(client):
+    response = client.get("/auth/users/me", headers={"Authorization": "Bearer not-a-token"})
+    assert response.status_code == 401
+    assert response.headers["www-authenticate"] == "Bearer"
+
+
+def test_profile_is_cached_and_invalidated_on_update(client):
+    headers = register(client)
+    assert client.get("/auth/users/me", headers=headers).json()["name"] == "Test"
+    hits = user_cache.hits
+    assert client.get("/auth/users/me", headers=headers).json()["name"] == "Test"
+    assert user_cache.hits == hits + 1
+
+    assert client.patch("/auth/users/me", json={"name": "Renamed"}, headers=headers).status_code == 200
+    assert client.get("/auth/users/me", headers=headers).json()["name"] == "Renamed"
@@ -0,0 +1,39 @@
+import asyncio
+
+import pytest
+
+from app.cache import CacheBackend, LRUCache, TTLCache
+
+
+def test_incomplete_backend_fails_at_construction():
+    class GetOnly(CacheBackend):
+        async def get(self, key):
+            return None
+
+    with pytest.raises(TypeError):
+        GetOnly()
+
+
+def test_ttl_cache_expires_entries():
+    async def scenario():
+        cache = TTLCache(maxsize=10, ttl=0.05)
+        await cache.set("a", 1)
+        assert await cache.get("a") == 1
+        await asyncio.sleep(0.06)
+        assert await cache.get("a") is None
+        await cache.set("b", 2)
+        await cache.delete("b")
+        assert await cache.get("b") is None
+        return cache.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["hits"] == 1 and stats["misses"] == 2 and stats["expirations"] == 1
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None and cache.get("a") == 1 and cache.evictions == 1
@@ -0,0 +1,57 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import insert
+
+from app.CommentRepository import CommentDB
+from app.database import engine
+from tests.conftest import create_ad, register
+
+
+def seed_thread(client):
+    headers = register(client)
+    ad_id = create_ad(client, headers)
+    other_ad = create_ad(client, headers)
+    author_id = client.get("/auth/users/me", headers=headers).json()["id"]
+    start = datetime(2026, 1, 1, 12, 0, 0)
+    # five comments share each timestamp, and ids don't follow time order
+    rows = [{"content": f"c{i}", "created_at": start + timedelta(seconds=(i * 3) % 5),
+             "author_id": author_id, "shanyrak_id": ad_id} for i in range(25)]
+    rows.append({"content": "elsewhere", "created_at": start, "author_id": author_id, "shanyrak_id": other_ad})
+    with engine.begin() as conn:
+        conn.execute(insert(CommentDB), rows)
+    return ad_id
+
+
+def walk(client, ad_id, order, limit):
+    pages, cursor = [], None
+    direction = "after" if order == "asc" else "before"
+    while True:
+        params = {"limit": limit, "order": order}
+        if cursor:
+            params[direction] = cursor
+        page = client.get(f"/shanyraks/{ad_id}/comments", params=params).json()
+        pages.append([comment["id"] for comment in page["comments"]])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return pages
+
+
+@pytest.mark.parametrize("order", ["asc", "desc"])
+@pytest.mark.parametrize("limit", [1, 4, 5, 7])
+def test_pages_cover_the_thread_once_with_tied_timestamps(client, order, limit):
+    ad_id = seed_thread(client)
+    everything = client.get(f"/shanyraks/{ad_id}/comments", params={"order": order}).json()["comments"]
+    expected = [comment["id"] for comment in everything]
+    assert len(expected) == 25
+    keys = [(comment["created_at"], comment["id"]) for comment in everything]
+    assert keys == sorted(keys, reverse=order == "desc")
+
+    pages = walk(client, ad_id, order, limit)
+    assert all(len(page) <= limit for page in pages)
+    assert [comment_id for page in pages for comment_id in page] == expected
+
+
+def test_bad_cursor_is_400(client):
+    ad_id = seed_thread(client)
+    assert client.get(f"/shanyraks/{ad_id}/comments", params={"after": "nonsense"}).status_code == 400
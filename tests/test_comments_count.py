@@ -0,0 +1,68 @@
+from sqlalchemy import func, select, update
+
+from app.CommentRepository import CommentDB
+from app.database import engine
+from app.ShanyraqRepository import AdsDB
+from scripts import rebuild_comments_count
+from tests.conftest import create_ad, register
+
+
+def stored_counts():
+    with engine.connect() as conn:
+        return dict(conn.execute(select(AdsDB.id, AdsDB.comments_count)).all())
+
+
+def actual_counts():
+    counted = select(AdsDB.id, func.count(CommentDB.id)).outerjoin(CommentDB, CommentDB.shanyrak_id == AdsDB.id).group_by(AdsDB.id)
+    with engine.connect() as conn:
+        return dict(conn.execute(counted).all())
+
+
+def comment_ids(client, ad_id):
+    return [comment["id"] for comment in client.get(f"/shanyraks/{ad_id}/comments").json()["comments"]]
+
+
+def test_count_follows_add_and_delete(client):
+    owner = register(client)
+    reader = register(client, "reader@sanyraq.kz", "+77000000002")
+    ad_id, other_ad = create_ad(client, owner), create_ad(client, owner)
+    for i in range(3):
+        assert client.post(f"/shanyraks/{ad_id}/comments", json={"content": f"c{i}"}, headers=reader).status_code == 200
+    assert client.post(f"/shanyraks/{other_ad}/comments", json={"content": "x"}, headers=owner).status_code == 200
+    assert client.get(f"/shanyraks/{ad_id}/").json()["total_comments"] == 3
+    assert stored_counts() == actual_counts() == {ad_id: 3, other_ad: 1}
+
+    first, second, _ = comment_ids(client, ad_id)
+    # the author and the ad owner may delete, anyone else gets 403 and nothing moves
+    stranger = register(client, "stranger@sanyraq.kz", "+77000000003")
+    assert client.delete(f"/shanyraks/{ad_id}/comments/{first}", headers=stranger).status_code == 403
+    assert client.delete(f"/shanyraks/{ad_id}/comments/{first}", headers=reader).status_code == 200
+    assert client.delete(f"/shanyraks/{ad_id}/comments/{second}", headers=owner).status_code == 200
+    assert client.delete(f"/shanyraks/{ad_id}/comments/{second}", headers=owner).status_code == 404
+    assert client.get(f"/shanyraks/{ad_id}/").json()["total_comments"] == 1
+    assert stored_counts() == actual_counts() == {ad_id: 1, other_ad: 1}
+
+
+def test_edit_keeps_count(client):
+    headers = register(client)
+    ad_id = create_ad(client, headers)
+    client.post(f"/shanyraks/{ad_id}/comments", json={"content": "before"}, headers=headers)
+    comment_id = comment_ids(client, ad_id)[0]
+    assert client.patch(f"/shanyraks/{ad_id}/comments/{comment_id}", json={"content": "after"}, headers=headers).status_code == 200
+    assert stored_counts() == {ad_id: 1}
+
+
+def test_rebuild_repairs_drift(client, capsys):
+    headers = register(client)
+    ads = [create_ad(client, headers) for _ in range(3)]
+    for i, ad_id in enumerate(ads):
+        for _ in range(i):
+            client.post(f"/shanyraks/{ad_id}/comments", json={"content": "c"}, headers=headers)
+    with engine.begin() as conn:
+        conn.execute(update(AdsDB).values(comments_count=7))
+    assert stored_counts() != actual_counts()
+
+    # the script's own entry point, run on the app's event loop
+    client.portal.call(rebuild_comments_count.main)
+    assert "comments_count rebuilt for 3 ads" in capsys.readouterr().out
+    assert stored_counts() == actual_counts() == {ads[0]: 0, ads[1]: 1, ads[2]: 2}
@@ -0,0 +1,136 @@
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import select, update
+
+from app.database import engine
+from app.main import ad_validators
+from app.ShanyraqRepository import AdsDB, ad_detail_cache
+from app.tools import http_date, utcnow
+from tests.conftest import create_ad, register
+
+
+@pytest.fixture
+def ad(client):
+    headers = register(client)
+    return headers, create_ad(client, headers, price=100_000)
+
+
+def detail(client, ad_id, **headers):
+    return client.get(f"/shanyraks/{ad_id}/", headers=headers)
+
+
+def comments(client, ad_id, params=None, **headers):
+    return client.get(f"/shanyraks/{ad_id}/comments", params=params or {}, headers=headers)
+
+
+def test_detail_validators(client, ad):
+    _, ad_id = ad
+    response = detail(client, ad_id)
+    assert response.status_code == 200
+    with engine.connect() as conn:
+        updated_at = conn.scalar(select(AdsDB.updated_at).where(AdsDB.id == ad_id))
+    assert response.headers["etag"] == ad_validators(ad_id, updated_at)["ETag"]
+    assert response.headers["last-modified"] == http_date(updated_at)
+    assert response.headers["cache-control"] == "no-cache"
+
+
+def test_detail_304(client, ad):
+    _, ad_id = ad
+    first = detail(client, ad_id)
+    etag, last_modified = first.headers["etag"], first.headers["last-modified"]
+    for headers in ({"If-None-Match": etag}, {"If-None-Match": f'"other", W/{etag}'}, {"If-None-Match": "*"},
+                    {"If-Modified-Since": last_modified}):
+        response = detail(client, ad_id, **headers)
+        assert response.status_code == 304, headers
+        assert response.content == b""
+        assert response.headers["etag"] == etag
+    assert detail(client, ad_id, **{"If-None-Match": '"other"'}).status_code == 200
+    earlier = http_date(utcnow() - timedelta(days=1))
+    assert detail(client, ad_id, **{"If-Modified-Since": earlier}).status_code == 200
+    # If-None-Match wins over If-Modified-Since
+    assert detail(client, ad_id, **{"If-None-Match": '"other"', "If-Modified-Since": last_modified}).status_code == 200
+    assert detail(client, ad_id, **{"If-Modified-Since": "yesterday"}).status_code == 200
+
+
+def test_detail_changes_after_writes(client, ad):
+    headers, ad_id = ad
+    etag = detail(client, ad_id).headers["etag"]
+    assert client.patch(f"/shanyraks/{ad_id}", json={"price": 120_000}, headers=headers).status_code == 200
+    response = detail(client, ad_id, **{"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["price"] == 120_000
+    assert response.headers["etag"] != etag
+
+    # a new comment moves the ad's version too
+    etag = response.headers["etag"]
+    client.post(f"/shanyraks/{ad_id}/comments", json={"content": "hi"}, headers=headers)
+    response = detail(client, ad_id, **{"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["total_comments"] == 1
+    assert detail(client, ad_id, **{"If-None-Match": response.headers["etag"]}).status_code == 304
+
+
+def test_stale_cache_entry_is_not_served_on_revalidation(client, ad):
+    _, ad_id = ad
+    old = detail(client, ad_id)
+    assert old.json()["price"] == 100_000
+    # another worker's write: the row moves, this process's cache entry doesn't
+    with engine.begin() as conn:
+        conn.execute(update(AdsDB).where(AdsDB.id == ad_id).values(price=999, updated_at=utcnow() + timedelta(seconds=1)))
+    assert ad_detail_cache._entries.get(ad_id) is not None
+
+    response = detail(client, ad_id, **{"If-None-Match": old.headers["etag"]})
+    assert response.status_code == 200
+    assert response.json()["price"] == 999
+    # the tag describes the body that was sent
+    assert response.headers["etag"] != old.headers["etag"]
+    assert detail(client, ad_id, **{"If-None-Match": response.headers["etag"]}).status_code == 304
+    # and the refreshed entry is what plain reads get now
+    assert detail(client, ad_id).json()["price"] == 999
+
+
+def test_detail_missing_ad(client):
+    assert detail(client, 424242).status_code == 404
+    assert detail(client, 424242, **{"If-None-Match": '"1-2"'}).status_code == 404
+
+
+def test_comments_validators_and_304(client, ad):
+    headers, ad_id = ad
+    client.post(f"/shanyraks/{ad_id}/comments", json={"content": "first"}, headers=headers)
+    response = comments(client, ad_id)
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    assert response.headers["cache-control"] == "no-cache"
+    assert comments(client, ad_id, **{"If-None-Match": etag}).status_code == 304
+    assert comments(client, ad_id, **{"If-Modified-Since": response.headers["last-modified"]}).status_code == 304
+
+    # each page has a tag of its own
+    paged = comments(client, ad_id, {"limit": 1})
+    assert paged.headers["etag"] != etag
+    assert comments(client, ad_id, {"limit": 1}, **{"If-None-Match": etag}).status_code == 200
+    assert comments(client, ad_id, {"limit": 1}, **{"If-None-Match": paged.headers["etag"]}).status_code == 304
+
+
+@pytest.mark.parametrize("change", ["add", "edit", "delete"])
+def test_comments_tag_follows_thread_writes(client, ad, change):
+    headers, ad_id = ad
+    client.post(f"/shanyraks/{ad_id}/comments", json={"content": "first"}, headers=headers)
+    response = comments(client, ad_id)
+    etag, comment_id = response.headers["etag"], response.json()["comments"][0]["id"]
+    if change == "add":
+        client.post(f"/shanyraks/{ad_id}/comments", json={"content": "second"}, headers=headers)
+    elif change == "edit":
+        client.patch(f"/shanyraks/{ad_id}/comments/{comment_id}", json={"content": "edited"}, headers=headers)
+    else:
+        client.delete(f"/shanyraks/{ad_id}/comments/{comment_id}", headers=headers)
+    response = comments(client, ad_id, **{"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+
+def test_comments_of_missing_ad_carry_no_validators(client):
+    response = comments(client, 424242, **{"If-None-Match": "*"})
+    assert response.status_code == 200
+    assert response.json()["comments"] == []
+    assert "etag" not in response.headers
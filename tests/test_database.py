@@ -0,0 +1,41 @@
+import asyncio
+
+from sqlalchemy import text
+
+from app.database import POOL_SETTINGS, SQLITE_PRAGMAS, async_engine, async_url, engine, engine_options
+
+
+def test_sqlite_pragmas_applied_on_connect():
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+        assert conn.exec_driver_sql("PRAGMA busy_timeout").scalar() == SQLITE_PRAGMAS["busy_timeout"]
+        assert conn.exec_driver_sql("PRAGMA synchronous").scalar() == 1  # NORMAL
+        assert conn.exec_driver_sql("PRAGMA temp_store").scalar() == 2  # MEMORY
+
+
+async def _async_pragmas(*names):
+    try:
+        async with async_engine.connect() as conn:
+            return [await conn.scalar(text(f"PRAGMA {name}")) for name in names]
+    finally:
+        # pooled aiosqlite connections belong to this event loop
+        await async_engine.dispose()
+
+
+def test_async_engine_gets_the_same_pragmas():
+    assert asyncio.run(_async_pragmas("journal_mode", "busy_timeout")) == ["wal", SQLITE_PRAGMAS["busy_timeout"]]
+
+
+def test_async_url_picks_the_async_driver():
+    assert async_url("sqlite:///./x.db") == "sqlite+aiosqlite:///./x.db"
+    assert async_url("postgresql://u:p@db/sanyraq") == "postgresql+asyncpg://u:p@db/sanyraq"
+    # an explicit driver is left alone
+    assert async_url("postgresql+psycopg://u:p@db/sanyraq") == "postgresql+psycopg://u:p@db/sanyraq"
+
+
+def test_engine_options():
+    assert engine_options("postgresql://u:p@db/sanyraq") == POOL_SETTINGS
+    file_options = engine_options("sqlite:///./x.db")
+    assert file_options["pool_size"] == POOL_SETTINGS["pool_size"] and file_options["pool_pre_ping"] is False
+    # :memory: keeps SQLAlchemy's single-connection pool
+    assert "pool_size" not in engine_options("sqlite://")
@@ -0,0 +1,97 @@
+import csv
+import io
+import json
+
+import pytest
+
+from app import ShanyraqRepository
+from app.ShanyraqRepository import AD_EXPORT_COLUMNS
+from tests.conftest import create_ad, register
+
+
+@pytest.fixture
+def listings(client):
+    headers = register(client)
+    ads = [
+        create_ad(client, headers, type="rent", rooms_count=2, price=150_000, address="Алматы, Абая 10",
+                  description="уютная квартира, 2 комнаты", lat=43.238, lon=76.889),
+        create_ad(client, headers, type="sell", rooms_count=3, price=45_000_000, address="Astana, Mangilik El 5",
+                  description='corner flat, "new" building'),
+        create_ad(client, headers, type="rent", rooms_count=1, price=90_000, address="Almaty, Dostyk 1",
+                  description="studio\nwith balcony"),
+        create_ad(client, headers, type="rent", rooms_count=2, price=300_000, address="Алматы, Абая 52",
+                  description="вид на горы"),
+    ]
+    return ads
+
+
+def export(client, **params):
+    response = client.get("/shanyraks/export", params=params)
+    assert response.status_code == 200, response.text
+    return response
+
+
+def ndjson_rows(response):
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def csv_rows(response):
+    reader = csv.reader(io.StringIO(response.text, newline=""))
+    header = next(reader)
+    assert header == list(AD_EXPORT_COLUMNS)
+    return [dict(zip(header, row)) for row in reader]
+
+
+def test_ndjson_export(client, listings):
+    response = export(client)
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert response.headers["content-disposition"] == 'attachment; filename="shanyraks.ndjson"'
+    # non-ASCII text goes out as UTF-8, not \u escapes
+    assert "Алматы, Абая 10" in response.content.decode("utf-8")
+    rows = ndjson_rows(response)
+    assert [row["id"] for row in rows] == sorted(listings)
+    assert list(rows[0]) == list(AD_EXPORT_COLUMNS)
+    assert rows[0]["description"] == "уютная квартира, 2 комнаты"
+    assert rows[0]["lat"] == 43.238 and rows[1]["lat"] is None
+    assert rows[2]["description"] == "studio\nwith balcony"
+    assert rows[0]["comments_count"] == 0
+
+
+def test_csv_export(client, listings):
+    response = export(client, format="csv")
+    assert response.headers["content-type"] == "text/csv; charset=utf-8"
+    assert response.headers["content-disposition"] == 'attachment; filename="shanyraks.csv"'
+    rows = csv_rows(response)
+    assert [int(row["id"]) for row in rows] == sorted(listings)
+    assert rows[0]["address"] == "Алматы, Абая 10"
+    assert rows[1]["description"] == 'corner flat, "new" building'
+    assert rows[2]["description"] == "studio\nwith balcony"
+    # missing coordinates are empty cells
+    assert rows[1]["lat"] == rows[1]["lon"] == ""
+
+
+@pytest.mark.parametrize("fmt", ["ndjson", "csv"])
+@pytest.mark.parametrize("params, expected", [
+    ({"ad_type": "rent"}, [0, 2, 3]),
+    ({"ad_type": "rent", "rooms_count": 2}, [0, 3]),
+    ({"price_from": 100_000, "price_until": 1_000_000}, [0, 3]),
+    ({"q": "абая"}, [0, 3]),
+    ({"q": "balcony", "ad_type": "rent"}, [2]),
+    ({"bbox": "76,43,77,44"}, [0]),
+    ({"ad_type": "daily"}, []),
+])
+def test_export_applies_search_filters(client, listings, fmt, params, expected):
+    response = export(client, format=fmt, **params)
+    rows = csv_rows(response) if fmt == "csv" else ndjson_rows(response)
+    assert [int(row["id"]) for row in rows] == [listings[i] for i in expected]
+
+
+def test_export_streams_more_than_one_batch(client, listings, monkeypatch):
+    monkeypatch.setattr(ShanyraqRepository, "EXPORT_BATCH_SIZE", 1)
+    assert [int(row["id"]) for row in csv_rows(export(client, format="csv"))] == sorted(listings)
+    assert [row["id"] for row in ndjson_rows(export(client))] == sorted(listings)
+
+
+def test_invalid_export_filter(client):
+    assert client.get("/shanyraks/export", params={"bbox": "1,2"}).status_code == 400
+    assert client.get("/shanyraks/export", params={"format": "xml"}).status_code == 422
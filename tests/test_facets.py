@@ -0,0 +1,129 @@
+import json
+from collections import Counter
+
+import pytest
+from sqlalchemy import func, select, update
+
+from app.database import engine
+from app.ShanyraqRepository import AdFacetDB, AdsDB, PRICE_BUCKETS, ROOMS_FACET_MAX, facet_columns
+from scripts import rebuild_facets
+from tests.conftest import create_ad, register
+
+FILTERS = [{}, {"ad_type": "rent"}, {"rooms_count": 2}, {"ad_type": "sell", "rooms_count": 3}]
+
+
+def grouped_sql():
+    """(type, rooms, bucket) -> count straight from ads, the way rebuild_facets computes it."""
+    key = facet_columns()
+    with engine.connect() as conn:
+        return {tuple(row[:3]): row[3] for row in conn.execute(select(*key, func.count()).group_by(*key))}
+
+
+def stored_aggregate():
+    query = select(AdFacetDB.type, AdFacetDB.rooms_count, AdFacetDB.price_bucket, AdFacetDB.count).where(AdFacetDB.count != 0)
+    with engine.connect() as conn:
+        return {tuple(row[:3]): row[3] for row in conn.execute(query)}
+
+
+def expected_facets(ad_type=None, rooms_count=None):
+    query = select(AdsDB.type, AdsDB.rooms_count, AdsDB.price)
+    if ad_type:
+        query = query.where(AdsDB.type == ad_type)
+    if rooms_count:
+        query = query.where(AdsDB.rooms_count == rooms_count)
+    with engine.connect() as conn:
+        rows = conn.execute(query).all()
+    types, rooms, prices = Counter(), Counter(), Counter()
+    for row_type, row_rooms, price in rows:
+        if row_type is not None:
+            types[row_type] += 1
+        if row_rooms is not None:
+            rooms[str(row_rooms) if row_rooms < ROOMS_FACET_MAX else f"{ROOMS_FACET_MAX}+"] += 1
+        if price is not None:
+            bucket = max(i for i, edge in enumerate(PRICE_BUCKETS) if price >= edge)
+            prices[bucket] += 1
+    return {
+        "total": len(rows),
+        "type": dict(types),
+        "rooms_count": dict(rooms),
+        "price": {i: count for i, count in prices.items()},
+    }
+
+
+def assert_in_sync(client):
+    assert stored_aggregate() == grouped_sql()
+    for filters in FILTERS:
+        response = client.get("/shanyraks/facets", params=filters)
+        assert response.status_code == 200, response.text
+        facets = response.json()
+        assert facets["source"] == "aggregate"
+        expected = expected_facets(**filters)
+        assert facets["total"] == expected["total"], filters
+        assert facets["type"] == expected["type"], filters
+        assert facets["rooms_count"] == expected["rooms_count"], filters
+        assert {PRICE_BUCKETS.index(price["min"]): price["count"] for price in facets["price"]} == expected["price"], filters
+
+
+@pytest.fixture
+def headers(client):
+    return register(client)
+
+
+def seed(client, headers):
+    prices = [0, 49_999, 50_000, 150_000, 999_999, 1_000_000, 30_000_000, 150_000_000]
+    return [create_ad(client, headers, type=("rent", "sell", "daily")[i % 3], rooms_count=1 + i % 6, price=price)
+            for i, price in enumerate(prices)]
+
+
+def test_create_keeps_facets_in_sync(client, headers):
+    seed(client, headers)
+    assert_in_sync(client)
+
+
+def test_update_keeps_facets_in_sync(client, headers):
+    ids = seed(client, headers)
+    for ad_id, change in zip(ids, [{"price": 2_000_000}, {"type": "sell"}, {"rooms_count": 7},
+                                   {"type": "rent", "rooms_count": 2, "price": 75_000}, {"address": "Abai 2"}]):
+        assert client.patch(f"/shanyraks/{ad_id}", json=change, headers=headers).status_code == 200
+        assert_in_sync(client)
+
+
+def test_delete_keeps_facets_in_sync(client, headers):
+    ids = seed(client, headers)
+    for ad_id in ids[::2]:
+        assert client.delete(f"/shanyraks/{ad_id}", headers=headers).status_code == 200
+        assert_in_sync(client)
+    # deleted groups are left at zero and hidden
+    with engine.connect() as conn:
+        assert conn.scalar(select(func.count()).select_from(AdFacetDB).where(AdFacetDB.count < 0)) == 0
+
+
+def test_bulk_import_keeps_facets_in_sync(client, headers):
+    seed(client, headers)
+    records = [{"type": ("rent", "sell")[i % 2], "price": 40_000 * i, "address": f"Abai {i}", "area": 40.0,
+                "rooms_count": 1 + i % 4, "description": "flat"} for i in range(50)]
+    records.append({"type": "rent", "price": -1, "address": "bad", "area": 1.0, "rooms_count": 1, "description": "x"})
+    body = "\n".join(json.dumps(record) for record in records)
+    response = client.post("/shanyraks/bulk", params={"batch_size": 16}, content=body,
+                           headers={**headers, "Content-Type": "application/x-ndjson"})
+    assert response.status_code == 200, response.text
+    assert response.json()["created"] == 50
+    assert_in_sync(client)
+
+
+def test_filtered_facets_come_from_a_query(client, headers):
+    seed(client, headers)
+    facets = client.get("/shanyraks/facets", params={"price_from": 50_000, "price_until": 1_000_000}).json()
+    assert facets["source"] == "query"
+    assert facets["total"] == 4
+    assert client.get("/shanyraks/facets", params={"q": "abai"}).json()["total"] == 8
+
+
+def test_rebuild_repairs_drift(client, headers, capsys):
+    seed(client, headers)
+    with engine.begin() as conn:
+        conn.execute(update(AdFacetDB).values(count=AdFacetDB.count + 5))
+    assert stored_aggregate() != grouped_sql()
+    client.portal.call(rebuild_facets.main)
+    assert "ad_facets rebuilt" in capsys.readouterr().out
+    assert_in_sync(client)
@@ -0,0 +1,52 @@
+from tests.conftest import create_ad, register, sql_statements
+
+
+def favorites(client, headers):
+    return [item["_id"] for item in client.get("/auth/users/favorites", headers=headers).json()["shanyraks"]]
+
+
+def favorites_queries(client, headers) -> int:
+    before = sql_statements("GET", "/auth/users/favorites")
+    assert client.get("/auth/users/favorites", headers=headers).status_code == 200
+    return sql_statements("GET", "/auth/users/favorites") - before
+
+
+def test_favorites_read_does_not_grow_with_the_list(client):
+    owner = register(client)
+    ids = [create_ad(client, owner, address=f"Abai {i}") for i in range(30)]
+    fan = register(client, "fan@sanyraq.kz", "+77000000002")
+
+    client.post(f"/auth/users/favorites/{ids[0]}", headers=fan)
+    one = favorites_queries(client, fan)
+    assert one > 0
+    client.post("/auth/users/favorites", json={"ids": ids}, headers=fan)
+    assert favorites_queries(client, fan) == one
+
+    items = client.get("/auth/users/favorites", headers=fan).json()["shanyraks"]
+    assert [item["_id"] for item in items] == ids
+    assert items[5]["address"] == "Abai 5"
+
+
+def test_batch_add_skips_duplicates_and_missing_ads(client):
+    owner = register(client)
+    ids = [create_ad(client, owner) for _ in range(3)]
+    assert client.post("/auth/users/favorites", json={"ids": ids[:2]}, headers=owner).json() == {"added": 2}
+    # one new, one already saved, one that doesn't exist
+    assert client.post("/auth/users/favorites", json={"ids": [ids[1], ids[2], 999_999]}, headers=owner).json() == {"added": 1}
+    assert client.post(f"/auth/users/favorites/{ids[0]}", headers=owner).status_code == 200
+    assert favorites(client, owner) == ids
+
+
+def test_batch_delete(client):
+    owner = register(client)
+    ids = [create_ad(client, owner) for _ in range(4)]
+    client.post("/auth/users/favorites", json={"ids": ids}, headers=owner)
+    response = client.request("DELETE", "/auth/users/favorites", json={"ids": [ids[0], ids[2], 999_999]}, headers=owner)
+    assert response.json() == {"deleted": 2}
+    assert favorites(client, owner) == [ids[1], ids[3]]
+
+
+def test_batch_size_is_validated(client):
+    owner = register(client)
+    assert client.post("/auth/users/favorites", json={"ids": []}, headers=owner).status_code == 422
+    assert client.post("/auth/users/favorites", json={"ids": list(range(501))}, headers=owner).status_code == 422
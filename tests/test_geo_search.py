@@ -0,0 +1,119 @@
+import math
+
+import pytest
+
+from tests.conftest import create_ad, register
+
+CENTER = (43.2380, 76.8890)
+METERS_PER_DEGREE = 111_320
+
+
+def offset(north_m: float, east_m: float):
+    lat, lon = CENTER
+    return lat + north_m / METERS_PER_DEGREE, lon + east_m / (METERS_PER_DEGREE * math.cos(math.radians(lat)))
+
+
+def search(client, **params):
+    response = client.get("/shanyraks/", params={"limit": 100, **params})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def found(client, **params):
+    return {ad["_id"] for ad in search(client, **params)["objects"]}
+
+
+@pytest.fixture
+def places(client):
+    headers = register(client)
+    points = {
+        "center": CENTER,
+        "north_500": offset(500, 0),
+        "east_900": offset(0, 900),
+        "north_1500": offset(1500, 0),
+        # inside the 1 km bounding box, but 1.13 km away along the diagonal
+        "corner": offset(800, 800),
+        "astana": (51.1694, 71.4491),
+    }
+    ads = {name: create_ad(client, headers, lat=lat, lon=lon) for name, (lat, lon) in points.items()}
+    ads["nowhere"] = create_ad(client, headers)
+    return headers, ads
+
+
+def near(point=CENTER):
+    return f"{point[0]},{point[1]}"
+
+
+def test_radius_keeps_the_circle_not_the_box(client, places):
+    _, ads = places
+    assert found(client, near=near()) == {ads["center"], ads["north_500"], ads["east_900"]}
+    assert found(client, near=near(), radius=2000) == {ads["center"], ads["north_500"], ads["east_900"],
+                                                       ads["north_1500"], ads["corner"]}
+    assert found(client, near=near(), radius=400) == {ads["center"]}
+    assert search(client, near=near(), limit=1)["total"] == 3
+
+
+def test_radius_is_capped(client, places):
+    _, ads = places
+    # Astana is ~970 km away, past the 100 km cap
+    assert ads["astana"] not in found(client, near=near(), radius=5_000_000)
+    assert found(client, near=near((51.1694, 71.4491)), radius=100) == {ads["astana"]}
+
+
+def test_bbox(client, places):
+    _, ads = places
+    south, west = offset(-100, -100)
+    north, east = offset(900, 1000)
+    assert found(client, bbox=f"{west},{south},{east},{north}") == {ads["center"], ads["north_500"], ads["east_900"],
+                                                                    ads["corner"]}
+    # edges are inclusive
+    lat, lon = CENTER
+    assert found(client, bbox=f"{lon},{lat},{lon},{lat}") == {ads["center"]}
+    assert found(client, bbox="0,0,1,1") == set()
+
+
+def test_ads_without_coordinates(client, places):
+    _, ads = places
+    assert ads["nowhere"] in found(client)
+    assert ads["nowhere"] not in found(client, bbox="-180,-90,180,90")
+    assert found(client, bbox="-180,-90,180,90") == set(ads.values()) - {ads["nowhere"]}
+
+
+def test_moving_an_ad_moves_it_in_the_index(client, places):
+    headers, ads = places
+    lat, lon = offset(300, 0)
+    assert client.patch(f"/shanyraks/{ads['astana']}", json={"lat": lat, "lon": lon}, headers=headers).status_code == 200
+    assert ads["astana"] in found(client, near=near())
+    assert client.patch(f"/shanyraks/{ads['center']}", json={"lat": None, "lon": None}, headers=headers).status_code == 200
+    assert ads["center"] not in found(client, near=near())
+    assert client.delete(f"/shanyraks/{ads['north_500']}", headers=headers).status_code == 200
+    assert found(client, near=near()) == {ads["astana"], ads["east_900"]}
+
+
+def test_geo_search_pages_by_cursor(client, places):
+    _, ads = places
+    everything = [ad["_id"] for ad in search(client, near=near(), radius=2000)["objects"]]
+    walked, cursor = [], None
+    while True:
+        params = {"near": near(), "radius": 2000, "limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        page = search(client, **params)
+        walked.extend(ad["_id"] for ad in page["objects"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert walked == everything
+    assert len(walked) == 5
+
+
+@pytest.mark.parametrize("params, status", [
+    ({"radius": 500}, 400),
+    ({"near": "43.2"}, 400),
+    ({"near": "north,south"}, 400),
+    ({"near": "43.2,76.9", "radius": 0}, 422),
+    ({"bbox": "1,2,3"}, 400),
+    ({"bbox": "1,2,3,nan"}, 400),
+])
+def test_invalid_geo_parameters(client, params, status):
+    assert client.get("/shanyraks/", params=params).status_code == status
@@ -0,0 +1,136 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app import main
+from app.database import AsyncSessionLocal, engine, make_engine
+from app.metrics import READ_SESSIONS
+from app.replica import ReadRouter
+from scripts.sync_replica import sync
+from tests.conftest import create_ad, register
+
+
+def replica_router(url: str, **options):
+    replica_engine = make_engine(url, is_async=True)
+    sessions = async_sessionmaker(replica_engine, autoflush=False, expire_on_commit=False, info={"replica": True})
+    return ReadRouter(primary=AsyncSessionLocal, replica=sessions, replica_engine=replica_engine, **options)
+
+
+@pytest.fixture
+def replica_path(tmp_path):
+    return str(tmp_path / "replica.db")
+
+
+@pytest.fixture
+def use_router(client, monkeypatch):
+    routers = []
+
+    def use(router):
+        routers.append(router)
+        monkeypatch.setattr(main, "read_router", router)
+        return router
+
+    yield use
+    for router in routers:
+        client.portal.call(router.replica_engine.dispose)
+
+
+def listed(client, headers=None):
+    # the listing isn't cached, so it shows which database answered
+    page = client.get("/shanyraks/", params={"count": "none"}, headers=headers or {}).json()
+    return {ad["_id"] for ad in page["objects"]}
+
+
+def reads(target, reason):
+    return READ_SESSIONS.values.get((target, reason), 0)
+
+
+@pytest.fixture
+def split(client, replica_path, use_router):
+    """One ad on both databases, a second one only on the primary."""
+    headers = register(client)
+    shared = create_ad(client, headers, address="shared")
+    sync(engine.url.database, replica_path)
+    router = use_router(replica_router(f"sqlite:///{replica_path}", window=60, check_interval=3600))
+    primary_only = create_ad(client, headers, address="primary only")
+    # that write pinned its author; an anonymous reader is not pinned
+    return router, headers, shared, primary_only
+
+
+def test_reads_go_to_the_replica(client, split):
+    _, _, shared, primary_only = split
+    before = reads("replica", "ok")
+    assert client.get(f"/shanyraks/{shared}/").json()["address"] == "shared"
+    assert client.get(f"/shanyraks/{primary_only}/").status_code == 404
+    assert [ad["_id"] for ad in client.get("/shanyraks/").json()["objects"]] == [shared]
+    assert reads("replica", "ok") == before + 3
+
+
+def test_writes_go_to_the_primary(client, split, replica_path):
+    _, headers, shared, _ = split
+    assert client.patch(f"/shanyraks/{shared}", json={"address": "moved"}, headers=headers).status_code == 200
+    with make_engine(f"sqlite:///{replica_path}").connect() as conn:
+        assert conn.scalar(text("SELECT address FROM ads WHERE id = :id"), {"id": shared}) == "shared"
+
+
+def test_writer_reads_own_writes_from_the_primary(client, split):
+    router, headers, shared, primary_only = split
+    before = reads("primary", "recent_write")
+    assert listed(client, headers) == {shared, primary_only}
+    assert reads("primary", "recent_write") == before + 1
+    # someone else still reads the replica
+    other = register(client, "other@sanyraq.kz", "+77000000002")
+    assert listed(client, other) == {shared}
+
+    # once the window has passed, the writer is back on the replica
+    router.window = 0
+    assert listed(client, headers) == {shared}
+
+
+def test_unreachable_replica_falls_back_to_the_primary(client, tmp_path, use_router):
+    headers = register(client)
+    ad_id = create_ad(client, headers)
+    use_router(replica_router(f"sqlite:///{tmp_path}/missing/replica.db", check_interval=3600))
+    before = reads("primary", "replica_down")
+    assert client.get(f"/shanyraks/{ad_id}/").status_code == 200
+    assert client.get("/shanyraks/").json()["total"] == 1
+    assert reads("primary", "replica_down") == before + 2
+    assert main.read_router.state == "replica_down"
+
+
+def test_replica_failing_mid_request_switches_to_the_primary(client, split, replica_path):
+    router, _, shared, _ = split
+    assert client.get(f"/shanyraks/{shared}/").status_code == 200
+    assert router.state == "ok"
+    with make_engine(f"sqlite:///{replica_path}").begin() as conn:
+        conn.execute(text("DROP TABLE ads"))
+
+    # the request on the broken replica fails, the ones after it use the primary
+    with pytest.raises(OperationalError):
+        client.get("/shanyraks/", params={"count": "none"})
+    assert router.state == "replica_down"
+    assert client.get("/shanyraks/", params={"count": "none"}).status_code == 200
+
+
+def test_lagging_replica_is_skipped_until_it_catches_up(client, split, monkeypatch):
+    router, _, shared, primary_only = split
+    lag = [30.0]
+
+    async def probe():
+        return lag[0]
+
+    monkeypatch.setattr(router, "_probe", probe)
+    router.max_lag, router.check_interval, router.checked_at = 10, 0, None
+    assert listed(client) == {shared, primary_only}
+    assert router.state == "replica_lag"
+
+    lag[0] = 0.5
+    assert listed(client) == {shared}
+    assert router.state == "ok"
+
+
+def test_no_replica_configured(client):
+    before = reads("primary", "no_replica")
+    assert client.get("/shanyraks/").status_code == 200
+    assert reads("primary", "no_replica") == before + 1
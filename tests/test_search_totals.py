@@ -0,0 +1,55 @@
+from sqlalchemy import func, select
+
+from app.database import engine
+from app.ShanyraqRepository import AdsDB
+from tests.conftest import create_ad, register
+
+FILTERS = [{}, {"ad_type": "rent"}, {"ad_type": "sell", "rooms_count": 3}, {"price_from": 150_000, "price_until": 400_000}]
+
+
+def sql_count(ad_type=None, rooms_count=None, price_from=None, price_until=None):
+    query = select(func.count()).select_from(AdsDB)
+    if ad_type:
+        query = query.where(AdsDB.type == ad_type)
+    if rooms_count:
+        query = query.where(AdsDB.rooms_count == rooms_count)
+    if price_from:
+        query = query.where(AdsDB.price >= price_from)
+    if price_until:
+        query = query.where(AdsDB.price <= price_until)
+    with engine.connect() as conn:
+        return conn.scalar(query)
+
+
+def assert_totals_match(client):
+    for filters in FILTERS:
+        # twice: the second answer comes from the count cache
+        for _ in range(2):
+            total = client.get("/shanyraks/", params={"limit": 1, **filters}).json()["total"]
+            assert total == sql_count(**filters), filters
+
+
+def test_cached_total_follows_create_update_delete(client):
+    headers = register(client)
+    ids = [create_ad(client, headers, type=("rent", "sell")[i % 2], rooms_count=1 + i % 3, price=100_000 * (i + 1))
+           for i in range(8)]
+    assert_totals_match(client)
+
+    assert client.patch(f"/shanyraks/{ids[0]}", json={"type": "sell", "rooms_count": 3, "price": 200_000},
+                        headers=headers).status_code == 200
+    assert_totals_match(client)
+
+    for ad_id in ids[1:4]:
+        assert client.delete(f"/shanyraks/{ad_id}", headers=headers).status_code == 200
+    assert_totals_match(client)
+
+    create_ad(client, headers, type="sell", rooms_count=3, price=300_000)
+    assert_totals_match(client)
+
+
+def test_count_none_and_approx(client):
+    headers = register(client)
+    for _ in range(3):
+        create_ad(client, headers)
+    assert client.get("/shanyraks/", params={"count": "none"}).json()["total"] is None
+    assert client.get("/shanyraks/", params={"count": "approx"}).json()["total"] == 3
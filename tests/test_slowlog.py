@@ -0,0 +1,78 @@
+import json
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import OperationalError
+
+from app import metrics, slowlog
+from app.database import async_engine
+from tests.conftest import create_ad, register, sql_statements
+
+COMMENTS_ROUTE = "/shanyraks/{shanyrak_id}/comments"
+
+
+def comments_queries(client, ad_id) -> int:
+    before = sql_statements("GET", COMMENTS_ROUTE)
+    assert client.get(f"/shanyraks/{ad_id}/comments").status_code == 200
+    return sql_statements("GET", COMMENTS_ROUTE) - before
+
+
+def test_explain_is_not_counted_against_the_request(client, monkeypatch, tmp_path):
+    headers = register(client)
+    ad_id = create_ad(client, headers)
+    for i in range(3):
+        client.post(f"/shanyraks/{ad_id}/comments", json={"content": f"c{i}"}, headers=headers)
+    without_log = comments_queries(client, ad_id)
+
+    # log and explain every statement from here on
+    log_file = tmp_path / "slow.log"
+    monkeypatch.setattr(slowlog, "SLOW_QUERY_MS", 0)
+    monkeypatch.setattr(slowlog, "SLOW_QUERY_LOG", str(log_file))
+    monkeypatch.setattr(slowlog, "SLOW_QUERY_EXPLAIN_SAMPLE", 1.0)
+    handlers = list(slowlog.slow_logger.handlers)
+    slowlog.slow_logger.handlers.clear()
+    sync_engine = async_engine.sync_engine
+    slowlog.instrument_slow_queries(sync_engine)
+    try:
+        with_log = comments_queries(client, ad_id)
+    finally:
+        event.remove(sync_engine, "before_cursor_execute", slowlog._before_cursor_execute)
+        event.remove(sync_engine, "after_cursor_execute", slowlog._after_cursor_execute)
+        for handler in slowlog.slow_logger.handlers:
+            handler.close()
+        slowlog.slow_logger.handlers[:] = handlers
+
+    assert with_log == without_log
+    records = [json.loads(line) for line in log_file.read_text().splitlines()]
+    assert any("plan" in record for record in records)
+    assert all(record["route"] == f"GET {COMMENTS_ROUTE}" for record in records)
+
+
+def test_failed_statements_leave_no_timers(monkeypatch, tmp_path):
+    monkeypatch.setattr(slowlog, "SLOW_QUERY_MS", 0)
+    monkeypatch.setattr(slowlog, "SLOW_QUERY_LOG", str(tmp_path / "slow.log"))
+    handlers = list(slowlog.slow_logger.handlers)
+    slowlog.slow_logger.handlers.clear()
+    engine = create_engine("sqlite://")
+    metrics.instrument_engine(engine)
+    slowlog.instrument_slow_queries(engine)
+    clock = [100.0]
+    monkeypatch.setattr(metrics.time, "perf_counter", lambda: clock[0])
+    try:
+        with engine.connect() as conn:
+            for _ in range(3):
+                with pytest.raises(OperationalError):
+                    conn.exec_driver_sql("SELECT * FROM no_such_table")
+            # nothing is parked on the pooled connection
+            assert not conn.info.get("query_started") and not conn.info.get("slow_query_started")
+
+            # a later statement is timed from its own start, not a failed one's
+            before = metrics.DB_TIME.values.get((), 0)
+            clock[0] += 1
+            conn.exec_driver_sql("SELECT 1")
+            assert metrics.DB_TIME.values[()] == before
+    finally:
+        engine.dispose()
+        for handler in slowlog.slow_logger.handlers:
+            handler.close()
+        slowlog.slow_logger.handlers[:] = handlers
@@ -0,0 +1,70 @@
+import pytest
+from sqlalchemy import insert
+
+from app.database import engine
+from app.ShanyraqRepository import AD_SORTS, AdsDB
+from tests.conftest import create_ad, register
+
+SORT_KEYS = {"price": "price", "-price": "price", "area": "area", "-area": "area", "price_per_sqm": "price_per_sqm"}
+
+
+@pytest.fixture
+def tied_ads(client):
+    headers = register(client)
+    # four prices and three areas over 30 ads, so every sort key has long runs of ties
+    for i in range(30):
+        create_ad(client, headers, price=100_000 * (1 + (i * 7) % 4), area=40.0 * (1 + i % 3))
+    # no per-m² price without an area, and legacy rows without a price or area
+    create_ad(client, headers, area=0)
+    with engine.begin() as conn:
+        conn.execute(insert(AdsDB), [{"type": "rent", "price": None, "area": 50.0, "address": "a", "description": "d"},
+                                     {"type": "rent", "price": 200_000, "area": None, "address": "a", "description": "d"}])
+
+
+def walk(client, sort, limit):
+    seen, cursor = [], None
+    while True:
+        params = {"sort": sort, "limit": limit, "count": "none"}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/shanyraks/", params=params)
+        assert response.status_code == 200, response.text
+        page = response.json()
+        assert len(page["objects"]) <= limit
+        seen.extend(page["objects"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return seen
+
+
+@pytest.mark.parametrize("sort", list(AD_SORTS))
+@pytest.mark.parametrize("limit", [1, 4, 7])
+def test_cursor_pages_neither_overlap_nor_skip(client, tied_ads, sort, limit):
+    listing = client.get("/shanyraks/", params={"sort": sort, "limit": 100}).json()
+    key = SORT_KEYS[sort]
+    ordered = [(ad[key], ad["_id"]) for ad in listing["objects"]]
+    assert ordered == sorted(ordered, reverse=sort.startswith("-"))
+    assert all(value is not None for value, _ in ordered)
+    assert listing["total"] == len(ordered)
+
+    walked = [ad["_id"] for ad in walk(client, sort, limit)]
+    assert walked == [ad_id for _, ad_id in ordered]
+
+
+def test_sorted_totals_leave_out_ads_without_the_key(client, tied_ads):
+    everything = client.get("/shanyraks/", params={"limit": 1}).json()["total"]
+    assert everything == 33
+    assert client.get("/shanyraks/", params={"sort": "price", "limit": 1}).json()["total"] == 32
+    assert client.get("/shanyraks/", params={"sort": "area", "limit": 1}).json()["total"] == 32
+    assert client.get("/shanyraks/", params={"sort": "price_per_sqm", "limit": 1}).json()["total"] == 30
+
+
+def test_sort_with_filter(client, tied_ads):
+    listing = client.get("/shanyraks/", params={"sort": "-price", "price_until": 250_000, "limit": 100}).json()
+    prices = [ad["price"] for ad in listing["objects"]]
+    assert prices and max(prices) <= 250_000 and prices == sorted(prices, reverse=True)
+
+
+@pytest.mark.parametrize("cursor", ["nonsense", "WzFd", "WyJ4IiwxXQ"])
+def test_bad_sort_cursor_is_400(client, cursor):
+    assert client.get("/shanyraks/", params={"sort": "price", "cursor": cursor}).status_code == 400
@@ -0,0 +1,95 @@
+import pytest
+
+from tests.conftest import create_ad, register
+
+
+def search(client, **params):
+    response = client.get("/shanyraks/", params=params)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def ids(page):
+    return [ad["_id"] for ad in page["objects"]]
+
+
+@pytest.fixture
+def listings(client):
+    headers = register(client)
+    ads = {
+        "abai_park": create_ad(client, headers, address="Almaty, Abai ave 10", description="view of the park", price=300_000),
+        "abai_metro": create_ad(client, headers, address="Almaty, Abai ave 52", description="near metro", price=200_000),
+        "dostyk": create_ad(client, headers, address="Almaty, Dostyk 5", description="quiet, near Abai ave", price=250_000),
+        "satpaev": create_ad(client, headers, address="Astana, Satpaev 3", description="новостройка у парка", price=150_000),
+    }
+    for i in range(7):
+        ads[f"abai_{i}"] = create_ad(client, headers, address=f"Abai {i}", description="flat", price=100_000 + i * 10_000)
+    return headers, ads
+
+
+def test_terms_match_address_and_description(client, listings):
+    _, ads = listings
+    assert set(ids(search(client, q="metro", limit=100))) == {ads["abai_metro"]}
+    # every term has to match, each as a prefix, in either column
+    assert set(ids(search(client, q="abai park", limit=100))) == {ads["abai_park"]}
+    assert set(ids(search(client, q="DOST", limit=100))) == {ads["dostyk"]}
+    assert set(ids(search(client, q="парк", limit=100))) == {ads["satpaev"]}
+    assert search(client, q="nowhere")["objects"] == []
+    page = search(client, q="abai", limit=100)
+    assert page["total"] == len(page["objects"]) == 10
+
+
+def test_text_search_combines_with_filters(client, listings):
+    _, ads = listings
+    page = search(client, q="abai", price_from=200_000, limit=100)
+    assert set(ids(page)) == {ads["abai_park"], ads["abai_metro"], ads["dostyk"]}
+    assert page["total"] == 3
+
+
+def test_ranked_results_page_by_offset_without_cursor(client, listings):
+    everything = ids(search(client, q="abai", limit=100))
+    pages, offset = [], 0
+    while True:
+        page = search(client, q="abai", limit=3, offset=offset)
+        # relevance order has no keyset, so even a full page offers no cursor
+        assert page["next_cursor"] is None
+        if not page["objects"]:
+            break
+        pages.extend(ids(page))
+        offset += 3
+    assert pages == everything
+
+
+def test_cursor_with_q_is_rejected(client, listings):
+    cursor = search(client, limit=2)["next_cursor"]
+    assert cursor is not None
+    response = client.get("/shanyraks/", params={"q": "abai", "cursor": cursor})
+    assert response.status_code == 400
+
+
+def test_sorted_text_search_pages_by_cursor(client, listings):
+    everything = ids(search(client, q="abai", sort="price", limit=100))
+    walked, cursor = [], None
+    while True:
+        params = {"q": "abai", "sort": "price", "limit": 4}
+        if cursor:
+            params["cursor"] = cursor
+        page = search(client, **params)
+        walked.extend(ids(page))
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert walked == everything
+    assert len(walked) == 10
+
+
+def test_index_follows_updates_and_deletes(client, listings):
+    headers, ads = listings
+    assert client.patch(f"/shanyraks/{ads['abai_metro']}", json={"description": "sunny balcony"},
+                        headers=headers).status_code == 200
+    assert ids(search(client, q="metro")) == []
+    assert ids(search(client, q="balcony")) == [ads["abai_metro"]]
+    assert client.delete(f"/shanyraks/{ads['abai_metro']}", headers=headers).status_code == 200
+    assert ids(search(client, q="balcony")) == []
+    # a write drops the cached total for text queries
+    assert search(client, q="abai", limit=1)["total"] == 9
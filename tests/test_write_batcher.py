@@ -0,0 +1,172 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+
+from app import CommentRepository as comments_module
+from app.batcher import WriteBatcher
+from app.CommentRepository import CommentDB, CommentRepository
+from app.database import AsyncSessionLocal, engine
+from app.metrics import WRITE_BATCH_RETRIES
+from app.ShanyraqRepository import AdsDB
+from tests.conftest import create_ad, register
+
+com_repo = CommentRepository()
+
+
+@pytest.fixture
+def batcher(client, monkeypatch):
+    sessions = []
+
+    def session_factory():
+        sessions.append(True)
+        return AsyncSessionLocal()
+
+    # a long window so everything gathered below lands in one batch
+    batcher = WriteBatcher(session_factory=session_factory, enabled=True, max_ops=64, max_delay_ms=200)
+    batcher.sessions = sessions
+    monkeypatch.setattr(comments_module, "write_batcher", batcher)
+    yield batcher
+    client.portal.call(batcher.close)
+
+
+@pytest.fixture
+def thread(client):
+    owner = register(client)
+    reader = register(client, "reader@sanyraq.kz", "+77000000002")
+    ad_id = create_ad(client, owner)
+    owner_id = client.get("/auth/users/me", headers=owner).json()["id"]
+    reader_id = client.get("/auth/users/me", headers=reader).json()["id"]
+    return ad_id, owner_id, reader_id
+
+
+def add_comment(ad_id, user_id, content):
+    async def call():
+        async with AsyncSessionLocal() as db:
+            return await com_repo.add_comment(db, user_id, ad_id, content)
+    return call()
+
+
+def update_comment(comment_id, user_id, content):
+    async def call():
+        async with AsyncSessionLocal() as db:
+            return await com_repo.update_comment(db, comment_id, user_id, content=content)
+    return call()
+
+
+def stored(ad_id):
+    with engine.connect() as conn:
+        count = conn.scalar(select(AdsDB.comments_count).where(AdsDB.id == ad_id))
+        contents = conn.scalars(select(CommentDB.content).where(CommentDB.shanyrak_id == ad_id).order_by(CommentDB.id)).all()
+    return count, contents
+
+
+def test_concurrent_writes_share_one_commit(client, batcher, thread):
+    ad_id, owner_id, _ = thread
+
+    async def scenario():
+        return await asyncio.gather(*(add_comment(ad_id, owner_id, f"c{i}") for i in range(10)))
+
+    comments = client.portal.call(scenario)
+    assert len(batcher.sessions) == 1
+    assert len({comment.id for comment in comments}) == 10
+    count, contents = stored(ad_id)
+    assert count == 10
+    assert sorted(contents) == sorted(f"c{i}" for i in range(10))
+
+
+def test_a_failed_check_only_fails_its_caller(client, batcher, thread):
+    ad_id, owner_id, reader_id = thread
+    first = client.portal.call(add_comment, ad_id, reader_id, "mine")
+    batcher.sessions.clear()
+
+    async def scenario():
+        return await asyncio.gather(
+            add_comment(ad_id, owner_id, "a"),
+            update_comment(first.id, owner_id, "not yours"),
+            add_comment(ad_id, owner_id, "b"),
+            return_exceptions=True,
+        )
+
+    added, forbidden, also_added = client.portal.call(scenario)
+    assert isinstance(forbidden, HTTPException) and forbidden.status_code == 403
+    assert added.content == "a" and also_added.content == "b"
+    # a check failure writes nothing, so the batch commits without a replay
+    assert len(batcher.sessions) == 1
+    assert stored(ad_id) == (3, ["mine", "a", "b"])
+
+
+def test_database_error_replays_each_write_alone(client, batcher, thread):
+    ad_id, owner_id, _ = thread
+
+    async def broken(session):
+        session.add(CommentDB(author_id=owner_id, shanyrak_id=ad_id, content=None))
+        await session.flush()
+
+    async def scenario():
+        return await asyncio.gather(
+            add_comment(ad_id, owner_id, "a"),
+            batcher.submit(broken),
+            add_comment(ad_id, owner_id, "b"),
+            return_exceptions=True,
+        )
+
+    retries = WRITE_BATCH_RETRIES.values.get((), 0)
+    added, failed, also_added = client.portal.call(scenario)
+    assert isinstance(failed, IntegrityError)
+    assert added.content == "a" and also_added.content == "b"
+    assert WRITE_BATCH_RETRIES.values[()] == retries + 1
+    # the batch, then one session per write
+    assert len(batcher.sessions) == 4
+    assert stored(ad_id) == (2, ["a", "b"])
+
+
+def test_close_drains_the_queue(client, thread):
+    ad_id, owner_id, _ = thread
+    flushing = asyncio.Event()
+
+    async def slow(session):
+        flushing.set()
+        # close() arrives while this batch is mid-flush
+        await asyncio.sleep(0.1)
+        session.add(CommentDB(author_id=owner_id, shanyrak_id=ad_id, content="slow"))
+        await session.flush()
+        return "slow"
+
+    async def quick(session, i):
+        session.add(CommentDB(author_id=owner_id, shanyrak_id=ad_id, content=f"q{i}"))
+        await session.flush()
+        return i
+
+    async def scenario():
+        batcher = WriteBatcher(enabled=True, max_ops=4, max_delay_ms=1)
+        pending = [asyncio.ensure_future(batcher.submit(slow))]
+        await asyncio.sleep(0)
+        pending += [asyncio.ensure_future(batcher.submit(lambda session, i=i: quick(session, i))) for i in range(10)]
+        await flushing.wait()
+        await asyncio.wait_for(batcher.close(), 5)
+        assert all(task.done() for task in pending)
+        assert batcher.worker is None
+        # a write after close starts a fresh worker
+        late = await asyncio.wait_for(batcher.submit(lambda session: quick(session, 99)), 5)
+        await batcher.close()
+        return [task.result() for task in pending] + [late]
+
+    assert client.portal.call(scenario) == ["slow"] + list(range(10)) + [99]
+    with engine.connect() as conn:
+        assert conn.scalar(select(func.count()).select_from(CommentDB)) == 12
+
+
+def test_app_writes_through_the_batcher(client, monkeypatch, thread):
+    ad_id, _, _ = thread
+    headers = register(client, "writer@sanyraq.kz", "+77000000003")
+    batcher = WriteBatcher(enabled=True, max_delay_ms=1)
+    monkeypatch.setattr(comments_module, "write_batcher", batcher)
+    try:
+        for i in range(3):
+            assert client.post(f"/shanyraks/{ad_id}/comments", json={"content": f"c{i}"}, headers=headers).status_code == 200
+        assert client.get(f"/shanyraks/{ad_id}/").json()["total_comments"] == 3
+    finally:
+        client.portal.call(batcher.close)